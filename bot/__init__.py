@@ -7,6 +7,16 @@ from utils.videoclient import VideoClient
 
 if TYPE_CHECKING:
     from bot.bot import Bot
+
+_videoclient: Optional[VideoClient] = None
+
+def shared_videoclient() -> VideoClient:
+    """VideoClient unique du processus : main et chaque plugin partagent son pool et son cache ffprobe."""
+    global _videoclient
+    if _videoclient is None:
+        _videoclient = VideoClient("test", out_pth="data_encode", trd=100)
+        _videoclient.start()
+    return _videoclient
     
 class Dependencies:
     
@@ -16,8 +26,8 @@ class Dependencies:
         self.db = BotDB(self.config.MONGO_URI, "video_encoder")
         
         # self.user_manager = UserManager(self.mongo)  
-        self.videoclient = VideoClient("test", out_pth="data_encode", trd=100)  
-        self.videoclient.start()
+        self.videoclient = shared_videoclient()
+        self.hwaccel = self.config.HWACCEL or None
         
         self.bot: Optional['Bot'] = None
     
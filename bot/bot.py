@@ -39,6 +39,8 @@ class Bot:
             api_id=config.API_ID,
             api_hash=config.API_HASH,
             bot_token=config.BOT_TOKEN,
+            workers=config.WORKERS,
+            max_concurrent_transmissions=config.MAX_CONCURRENT_TRANSMISSIONS,
             plugins={"root": "plugins"}
         )
 
@@ -12,6 +12,12 @@ class Config:
     API_HASH = os.getenv("API_HASH", "")
     BOT_TOKEN = os.getenv("BOT_TOKEN", "")
 
+    # Pyrogram : handlers concurrents et transferts (download/upload) simultanés.
+    # Au-delà de 4 à 8 transferts, Telegram répond vite par des FLOOD_WAIT ;
+    # au moins 1, sans quoi le sémaphore de Pyrogram bloquerait tout transfert.
+    WORKERS = int(os.getenv("WORKERS", 16))
+    MAX_CONCURRENT_TRANSMISSIONS = max(1, int(os.getenv("MAX_CONCURRENT_TRANSMISSIONS", 4)))
+
     # MongoDB
     MONGO_URI = os.getenv("MONGO_URI", "")
 
@@ -19,6 +25,15 @@ class Config:
     ADMIN_IDS = [int(id) for id in os.getenv("ADMIN_IDS", "").split(",") if id.strip().isdigit()]
 
 
+    # Accélération matérielle ffmpeg (-hwaccel), vide pour désactiver
+    HWACCEL = os.getenv("HWACCEL", "auto")
+
+    # Dossier de travail temporaire (tmpfs de préférence)
+    TMP_DIR = os.getenv("VIDEOBOT_TMP", "/dev/shm/videobot")
+
+    # Taille max (Mo) des médias sources gardés pour les opérations suivantes, 0 pour désactiver
+    SOURCE_CACHE_MB = int(os.getenv("SOURCE_CACHE_MB", 2048))
+
     # Mode webhook (True/False)
     WEBHOOK = os.getenv("WEBHOOK", "False").lower() == "true"
 
@@ -362,7 +362,7 @@ class BotDB:
                 )
             return None
         except Exception as e:
-            print(f"Erreur find_existing: {str(e)}")
+            log.error("Erreur find_existing: %s", e)
             return None
     
     async def get_user_tasks(self, uid: int, limit: int = 10) -> List[Task]:
@@ -1,4 +1,5 @@
 import datetime
+import logging
 from pyrogram import Client, filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from pyrogram.enums import ParseMode
@@ -6,6 +7,8 @@ from bot import Dependencies
 from data.user import Sex, SubType, User
 
 
+log = logging.getLogger(__name__)
+
 deps = Dependencies()
 
 
@@ -33,9 +36,9 @@ async def start_command(client: Client, message: Message):
                 fee = await deps.db.update_sub(user.id, SubType.FREE)
                 if fee:
                     user_info = await deps.db.get_user(user.id)
-            print(f"Nouvel utilisateur enregistré: {user.id}")
+            log.info("Nouvel utilisateur enregistré: %s", user.id)
         except Exception as e:
-            print(f"Erreur création utilisateur {user.id}: {e}")
+            log.error("Erreur création utilisateur %s: %s", user.id, e)
             await message.reply("❌ Erreur lors de la création de votre profil. Veuillez réessayer.")
             return
 
@@ -90,13 +93,13 @@ async def start_command(client: Client, message: Message):
         await deps.db.save_user(user_info)
         
     except Exception as e:
-        print(f"Erreur envoi message à {user.id}: {e}")
+        log.warning("Erreur envoi message à %s: %s", user.id, e)
         await message.reply("❌ Impossible d'afficher l'interface. Veuillez réessayer.")
     
     try:
         await deps.db.disconnect()
     except Exception as e:
-        print(f"Erreur envoi message à {user.id}: {e}")
+        log.warning("Erreur envoi message à %s: %s", user.id, e)
         await message.reply("❌ Impossible d'afficher l'interface. Veuillez réessayer.")
 
 
@@ -1,12 +1,18 @@
 import asyncio
+import atexit
+import contextlib
+import copy
 import datetime
 import json
 import logging
 import os
 import re
 import shutil
+import threading
 import time
-from typing import Dict
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
 from pyrogram import Client, filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery, KeyboardButton, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from pyrogram.enums import ParseMode
@@ -14,125 +20,496 @@ from pyrogram.errors import MessageIdInvalid
 from bot import Dependencies
 from data.user import SUB_CONFIG, SubType, User
 from utils.videoclient import AudioCodec, AudioTrack, MediaType, VideoClient
-from utils.helper import convert_to_seconds, progress_for_pyrogram, convert_to_seconds, seconds_to_timestamp
+from utils.helper import SmartStatus, convert_to_seconds, download_edges, download_media, open_upload, progress_for_pyrogram, convert_to_seconds, seconds_to_timestamp
 from pathlib import Path
 import humanize
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 log = logging.getLogger(__name__)
 
 deps = Dependencies()
 users_operations: Dict[int, dict] = {}
-SUPPORTED_MIME_TYPES = {
+# Nettoyages lancés en arrière-plan (références gardées contre le GC)
+pending_cleanups: Set[asyncio.Task] = set()
+# Confirmations en attente : id -> (user_id, future résolue par handle_confirmation)
+PENDING_CONFIRMATIONS: Dict[str, Tuple[int, asyncio.Future]] = {}
+# Réponses attendues : user_id -> [(filtre, future résolue par handle_reply)]
+PENDING_REPLIES: Dict[int, List[Tuple[Any, asyncio.Future]]] = {}
+# Infos ffprobe des médias reçus, par `file_unique_id` Telegram (LRU)
+MEDIA_INFO_CACHE: "OrderedDict[str, Any]" = OrderedDict()
+MEDIA_INFO_CACHE_SIZE = 256
+# Dossiers de travail vidés et réutilisables, par dossier de base (RAM ou disque)
+DIR_POOL: Dict[str, List[str]] = {}
+DIR_POOL_SIZE = 16
+dir_pool_lock = threading.Lock()
+
+# Dossier de travail en RAM (tmpfs), avec repli sur le disque
+FALLBACK_TMPDIR = "downloads"
+BASE_TMPDIR = deps.config.TMP_DIR
+try:
+    os.makedirs(BASE_TMPDIR, exist_ok=True)
+    if not os.access(BASE_TMPDIR, os.W_OK):
+        BASE_TMPDIR = FALLBACK_TMPDIR
+except OSError:
+    BASE_TMPDIR = FALLBACK_TMPDIR
+
+# Médias sources déjà téléchargés, par `file_unique_id` : (chemin, taille), LRU
+# borné en octets. Les fichiers vivent dans `{base}/.sources`, liés en dur
+# dans les dossiers de travail ; rien n'y survit à un redémarrage.
+SOURCE_CACHE: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+SOURCE_CACHE_MAX_BYTES = deps.config.SOURCE_CACHE_MB * 1024 * 1024
+SOURCE_CACHE_DIRNAME = ".sources"
+source_cache_lock = threading.Lock()
+# Dossiers de tâche créés par `new_user_dir` : `{user_id}_{uuid hex}`
+JOB_DIR_RE = re.compile(r"\d+_[0-9a-f]{32}")
+
+def purge_workspaces() -> None:
+    """
+    Supprime les dossiers de tâche et le cache des sources de chaque base.
+    Appelé au chargement (restes d'un arrêt brutal) et à la sortie du
+    processus, où `idle()` de Pyrogram ramène aussi SIGINT/SIGTERM.
+    """
+    for base in {BASE_TMPDIR, FALLBACK_TMPDIR}:
+        try:
+            with os.scandir(base) as entries:
+                stale = [entry.path for entry in entries
+                         if entry.name == SOURCE_CACHE_DIRNAME or JOB_DIR_RE.fullmatch(entry.name)]
+        except OSError:
+            continue
+        for path in stale:
+            shutil.rmtree(path, ignore_errors=True)
+
+purge_workspaces()
+atexit.register(purge_workspaces)
+
+# Binaire `rm` utilisé pour les nettoyages (None hors Unix)
+RM_PATH = shutil.which("rm") if os.name == "posix" else None
+
+# Opérations qui téléchargent le média dans un dossier de travail
+MEDIA_JOBS = frozenset({
+    "compress", "cut", "audio_extract", "all_info", "convert_audio", "video_trim",
+    "video_merge", "video_split", "generate_thumbnail", "merge_video_audio",
+    "remove_audio", "subtitle_extract", "subtitle_add", "force_subtitle",
+    "remove_subtitles", "choose_subtitle", "choose_subtitle_burn", "add_chapters",
+    "edit_chapter", "split_chapter", "remove_chapters", "audio_selection",
+})
+# Filtres des réponses attendues par `wait_reply`, construits une seule fois
+PLAIN_TEXT = filters.text & ~filters.command
+VIDEO_OR_TEXT = filters.video | filters.document | filters.text
+AUDIO_OR_TEXT = filters.audio | filters.document | filters.text
+DOCUMENT_OR_TEXT = filters.document | filters.text
+VIDEO_FILE = filters.video | filters.document
+SUPPORTED_MIME_TYPES = frozenset({
     'video/mp4', 'video/quicktime', 'video/x-matroska', 'video/webm', 'audio/mpeg',
     'video/x-msvideo', 'video/x-flv', 'video/3gpp', 'video/x-ms-wmv'
+})
+# Formats proposés par « Convertir l'audio » : codec et débit (kbps)
+AUDIO_FORMATS = {
+    "mp3": (AudioCodec.MP3, 192),
+    "aac": (AudioCodec.AAC, 192),
+    "ogg": (AudioCodec.OPUS, 128),
+    "wav": (AudioCodec.PCM, 0),
+}
+# Taille estimée sous laquelle une piste convertie reste en mémoire jusqu'à l'envoi
+AUDIO_IN_MEMORY_LIMIT = 64 * 1024 * 1024
+SUPPORTED_EXTENSIONS = frozenset({'.mp4', '.mkv', '.mov', '.webm', '.mp3', '.avi', '.flv', '.3gp', '.wmv'})
+LANGUAGE_NAMES = {
+    'jpn': "Japonais",
+    'eng': "Anglais",
+    'fre': "Français",
+    'spa': "Espagnol",
+    'ger': "Allemand",
+    'ita': "Italien",
+    # Ajouter d'autres langues au besoin
+}
+# Plage de découpage « [HH:]MM:SS-[HH:]MM:SS »
+TIME_RANGE_RE = re.compile(r"\s*((?:\d+:)?\d{1,2}:\d{2})\s*-\s*((?:\d+:)?\d{1,2}:\d{2})\s*")
+# Paramètres de miniature « [HH:]MM:SS [largeur] »
+THUMBNAIL_ARGS_RE = re.compile(r"\s*((?:\d+:)?\d{1,2}:\d{2})(?:\s+(\d+))?\s*")
+
+def safe_unlink(path) -> None:
+    """Supprime `path` en un seul appel système ; absent ou None est ignoré."""
+    with contextlib.suppress(FileNotFoundError, TypeError):
+        os.unlink(path)
+
+async def unlink_file(path) -> None:
+    """`safe_unlink` dans un thread : la boucle d'événements n'attend pas le disque."""
+    await asyncio.to_thread(safe_unlink, path)
+
+def tagged_filename(user_dir: str, original_filename: str, tag) -> str:
+    """`{user_dir}/{nom}_{tag}{ext}`, l'extension valant `.mp4` si le nom n'en a pas."""
+    stem, ext = os.path.splitext(original_filename)
+    return f"{user_dir}/{stem}_{tag}{ext or '.mp4'}"
+
+def is_hms(value: str) -> bool:
+    """Vrai si `value` est exactement au format HH:MM:SS (sans moteur regex)."""
+    return (len(value) == 8 and value[2] == ':' and value[5] == ':'
+            and value[:2].isdecimal() and value[3:5].isdecimal() and value[6:].isdecimal())
+
+def media_size(message) -> int:
+    """Taille annoncée du média d'un message (0 si inconnue)."""
+    media = message and (message.video or message.document or message.audio)
+    return getattr(media, "file_size", 0) or 0
+
+def media_unique_id(message) -> Optional[str]:
+    media = message and (message.video or message.document or message.audio)
+    return getattr(media, "file_unique_id", None)
+
+def cached_media_info(message):
+    """Infos déjà connues du média de `message`, sans rien télécharger (None sinon)."""
+    key = media_unique_id(message)
+    if key not in MEDIA_INFO_CACHE:
+        return None
+    MEDIA_INFO_CACHE.move_to_end(key)
+    return copy.deepcopy(MEDIA_INFO_CACHE[key])
+
+def remember_media_info(message, media_info) -> None:
+    key = media_unique_id(message)
+    if media_info is None or not key:
+        return
+    MEDIA_INFO_CACHE[key] = copy.deepcopy(media_info)
+    MEDIA_INFO_CACHE.move_to_end(key)
+    while len(MEDIA_INFO_CACHE) > MEDIA_INFO_CACHE_SIZE:
+        MEDIA_INFO_CACHE.popitem(last=False)
+
+async def source_media_info(videoclient: VideoClient, message, file_path: str):
+    """
+    `get_media_info` du média source d'une tâche, mémorisé par
+    `file_unique_id` : « Infos » puis « Compresser » ne relancent pas ffprobe.
+    """
+    media_info = cached_media_info(message)
+    if media_info is not None:
+        media_info.path = Path(file_path)
+        return media_info
+    media_info = await videoclient.get_media_info(file_path)
+    remember_media_info(message, media_info)
+    return media_info
+
+def cache_source(key: str, path: str) -> None:
+    """Garde `path` (téléchargement complet) dans `SOURCE_CACHE` par un lien dur, sans copie."""
+    size = os.path.getsize(path)
+    if size > SOURCE_CACHE_MAX_BYTES:
+        return
+    cache_dir = os.path.join(os.path.dirname(os.path.dirname(path)), SOURCE_CACHE_DIRNAME)
+    cached = os.path.join(cache_dir, key + os.path.splitext(path)[1])
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        safe_unlink(cached)
+        os.link(path, cached)
+    except OSError:
+        return
+
+    evicted = []
+    with source_cache_lock:
+        SOURCE_CACHE[key] = (cached, size)
+        SOURCE_CACHE.move_to_end(key)
+        total = sum(entry_size for _, entry_size in SOURCE_CACHE.values())
+        while total > SOURCE_CACHE_MAX_BYTES:
+            _, (old_path, old_size) = SOURCE_CACHE.popitem(last=False)
+            evicted.append(old_path)
+            total -= old_size
+    for old_path in evicted:
+        safe_unlink(old_path)
+
+def restore_source(key: str, file_name: str) -> bool:
+    """Place le média `key` en cache à `file_name` ; False s'il n'y est pas (ou plus)."""
+    with source_cache_lock:
+        entry = SOURCE_CACHE.get(key)
+        if entry:
+            SOURCE_CACHE.move_to_end(key)
+    if not entry:
+        return False
+    cached = entry[0]
+    safe_unlink(file_name)
+    try:
+        os.link(cached, file_name)
+    except FileNotFoundError:
+        return False
+    except OSError:
+        # Autre système de fichiers (RAM / disque) : copie locale, toujours
+        # plus rapide qu'un nouveau téléchargement
+        try:
+            shutil.copyfile(cached, file_name)
+        except OSError:
+            return False
+    return True
+
+async def fetch_media(client, message, file_name: str, **kwargs) -> str:
+    """`download_media`, servi depuis `SOURCE_CACHE` quand le média a déjà été téléchargé."""
+    key = media_unique_id(message) if SOURCE_CACHE_MAX_BYTES > 0 else None
+    if key and await asyncio.to_thread(restore_source, key, file_name):
+        return os.path.abspath(file_name)
+    path = await download_media(client, message, file_name, **kwargs)
+    if key:
+        await asyncio.to_thread(cache_source, key, path)
+    return path
+
+def free_space(path: str) -> int:
+    try:
+        return shutil.disk_usage(path).free
+    except OSError:
+        return 0
+
+def has_capacity(expected_size: int) -> bool:
+    """Vérifie qu'un dossier de travail (RAM ou disque) peut accueillir la tâche."""
+    if not expected_size:
+        return True
+    if BASE_TMPDIR != FALLBACK_TMPDIR and free_space(BASE_TMPDIR) >= expected_size * 3:
+        return True
+    os.makedirs(FALLBACK_TMPDIR, exist_ok=True)
+    return free_space(FALLBACK_TMPDIR) >= expected_size * 2
+
+def new_user_dir(user_id: int, expected_size: int = 0, source_base: Optional[str] = None) -> str:
+    """
+    Crée le dossier de travail d'une tâche, en RAM si la place le permet.
+    `source_base` est le dossier de base où le média source est déjà en
+    cache : s'y placer permet de le lier en dur au lieu de le copier.
+    """
+    # Source déjà présente : seules les sorties occupent de la place
+    if source_base and free_space(source_base) >= expected_size * 2:
+        base = source_base
+    else:
+        base = BASE_TMPDIR
+        if base != FALLBACK_TMPDIR and free_space(base) < expected_size * 3:
+            base = FALLBACK_TMPDIR
+    with dir_pool_lock:
+        pool = DIR_POOL.get(base)
+        path = pool.pop() if pool else None
+    if path and os.path.isdir(path):
+        return path
+    # Le préfixe garde l'utilisateur qui a créé le dossier, pas celui qui le loue
+    user_dir = f"{base}/{user_id}_{uuid.uuid4().hex}"
+    os.makedirs(user_dir)
+    return user_dir
+
+def recycle_dir(path: str) -> bool:
+    """
+    Vide `path` et le remet dans `DIR_POOL` : la tâche suivante, quel que
+    soit l'utilisateur, le reprend sans mkdir/rmdir. Pool plein : le dossier,
+    déjà vide, est supprimé dans la foulée. False si rien n'a pu être fait.
+    """
+    base = os.path.dirname(path)
+    if base not in (BASE_TMPDIR, FALLBACK_TMPDIR):
+        return False
+    # Dossier de tâche peu profond : un seul scandir (type lu sans stat),
+    # rmtree seulement pour un éventuel sous-dossier
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.unlink(entry.path)
+    except OSError:
+        return False
+    with dir_pool_lock:
+        pool = DIR_POOL.setdefault(base, [])
+        if len(pool) < DIR_POOL_SIZE:
+            pool.append(path)
+            return True
+    try:
+        os.rmdir(path)
+    except OSError:
+        return False
+    return True
+
+def cached_source_base(message) -> Optional[str]:
+    """Dossier de base (RAM ou disque) du média de `message` s'il est dans `SOURCE_CACHE`."""
+    with source_cache_lock:
+        entry = SOURCE_CACHE.get(media_unique_id(message))
+    return os.path.dirname(os.path.dirname(entry[0])) if entry else None
+
+async def prepare_user_dir(user_id: int, source=None) -> str:
+    """
+    `new_user_dir` exécuté dans un thread (statvfs et mkdir ne bloquent pas
+    la boucle), dimensionné pour le média du message `source`.
+    """
+    return await asyncio.to_thread(new_user_dir, user_id, media_size(source), cached_source_base(source))
+
+async def cleanup_dir(path: str) -> None:
+    """Recycle ou supprime le dossier de travail d'une tâche hors de la boucle d'événements."""
+    if await asyncio.to_thread(recycle_dir, path):
+        return
+    # Dossier hors des bases de travail ou suppression partielle
+    if RM_PATH:
+        # `rm -rf` parcourt l'arborescence en C, sans aller-retour Python par entrée
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                RM_PATH, "-rf", "--", path,
+                stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+            if await proc.wait() == 0:
+                return
+        except OSError:
+            pass
+    await asyncio.to_thread(shutil.rmtree, path, ignore_errors=True)
+
+def schedule_cleanup(path: str) -> None:
+    """Lance `cleanup_dir` en tâche de fond sans bloquer le handler."""
+    task = asyncio.create_task(cleanup_dir(path))
+    pending_cleanups.add(task)
+    task.add_done_callback(pending_cleanups.discard)
+
+@contextlib.asynccontextmanager
+async def job_workspace(user_id: int, source=None):
+    """Dossier de travail d'une tâche, supprimé en arrière-plan à la sortie du bloc."""
+    user_dir = await prepare_user_dir(user_id, source)
+    try:
+        yield user_dir
+    finally:
+        schedule_cleanup(user_dir)
+
+async def ask_confirmation(status_msg, user_id: int, text: str, timeout: int = 60) -> Optional[bool]:
+    """
+    Affiche `text` avec les boutons [✅ Confirmer] [❌ Annuler] et attend la
+    réponse de l'utilisateur. Renvoie True/False, ou None si le délai expire.
+    """
+    cid = uuid.uuid4().hex
+    future = asyncio.get_running_loop().create_future()
+    PENDING_CONFIRMATIONS[cid] = (user_id, future)
+    keyboard = InlineKeyboardMarkup([[
+        InlineKeyboardButton("✅ Confirmer", callback_data=f"cfm:{cid}:ok"),
+        InlineKeyboardButton("❌ Annuler", callback_data=f"cfm:{cid}:no")
+    ]])
+    try:
+        await status_msg.edit(text, reply_markup=keyboard)
+        return await asyncio.wait_for(future, timeout=timeout)
+    except asyncio.TimeoutError:
+        return None
+    finally:
+        PENDING_CONFIRMATIONS.pop(cid, None)
+
+async def wait_reply(user_id: int, reply_filter, timeout: int) -> Message:
+    """
+    Attend le prochain message privé de `user_id` accepté par `reply_filter`
+    (remplace `client.listen`). Les attentes sont rangées par utilisateur :
+    un message n'est comparé qu'aux attentes de son auteur.
+    Lève asyncio.TimeoutError après `timeout` secondes.
+    """
+    future = asyncio.get_running_loop().create_future()
+    waiters = PENDING_REPLIES.setdefault(user_id, [])
+    entry = (reply_filter, future)
+    waiters.append(entry)
+    try:
+        return await asyncio.wait_for(future, timeout=timeout)
+    finally:
+        waiters.remove(entry)
+        if not waiters and PENDING_REPLIES.get(user_id) is waiters:
+            del PENDING_REPLIES[user_id]
+
+MAIN_MENU = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("🗜 Compresser", callback_data="compress"),
+        InlineKeyboardButton("✂️ Supprimer Scene", callback_data="cut")
+    ],
+    [
+        InlineKeyboardButton("📹 Vidéo", callback_data="video_menu1"),
+        InlineKeyboardButton("🔄 Convertir", callback_data="convert")
+    ],
+    [
+        InlineKeyboardButton("🎵 Audio", callback_data="audio_menu1"),
+        InlineKeyboardButton("📝 Sous-titres", callback_data="subs_menu1")
+    ],
+    [
+        InlineKeyboardButton("📌 Chapitres", callback_data="tools_menu1"),
+        InlineKeyboardButton("ℹ️ Infos", callback_data="info_menu")
+    ],
+    [
+        InlineKeyboardButton("⚙️ Paramètres", callback_data="settings"),
+        InlineKeyboardButton("❌ Fermer", callback_data="close")
+    ]
+])
+
+VIDEO_MENU = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("🔀 Fusion Vidéo", callback_data="video_merge"),
+        InlineKeyboardButton("✂️ Découpage", callback_data="video_split")
+    ],
+    [
+        InlineKeyboardButton("📏 Tronquer", callback_data="video_trim"),
+        InlineKeyboardButton("✂️ Supprimer Scene", callback_data="cut")
+    ],
+    [
+        InlineKeyboardButton("🗜 Compression", callback_data="compress"),
+        InlineKeyboardButton("🖼 Miniature", callback_data="generate_thumbnail")
+    ],
+    [
+        InlineKeyboardButton("🔙 Retour", callback_data="main_menu")
+    ]
+])
+
+AUDIO_MENU1 = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("🎵 Extraire Audio", callback_data="audio_extract"),
+        InlineKeyboardButton("🔊 Sélection Audio", callback_data="audio_selection")
+    ],
+    [
+        InlineKeyboardButton("🔄 Convertir en Audio", callback_data="convert_audio"),
+        InlineKeyboardButton("🔇 Supprimer Audio", callback_data="remove_audio")
+    ],
+    [
+        InlineKeyboardButton("🎼 Fusion Vidéo/Audio", callback_data="merge_video_audio"),
+        InlineKeyboardButton("🌐 Langue Audio", callback_data="audio_selection")
+    ],
+    [
+        InlineKeyboardButton("🔙 Retour", callback_data="main_menu")
+    ]
+])
+
+SUBS_MENU1 = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("📝 Ajouter Sous-titres", callback_data="subtitle_add"),
+        InlineKeyboardButton("📤 Extraire Sous-titres", callback_data="subtitle_extract")
+    ],
+    [
+        InlineKeyboardButton("👁 Sélection Sous-titres", callback_data="choose_subtitle"),
+        InlineKeyboardButton("🗑 Supprimer Sous-titres", callback_data="remove_subtitles")
+    ],
+    [
+        InlineKeyboardButton("🌐 Sous-titres permanents", callback_data="choose_subtitle_burn"),
+        InlineKeyboardButton("🏷 Forcer Sous-titres", callback_data="force_subtitle")
+    ],
+    [
+        InlineKeyboardButton("🔙 Retour", callback_data="main_menu")
+    ]
+])
+
+TOOLS_MENU1 = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("➕ Ajouter Chapitres", callback_data="add_chapters"),
+        InlineKeyboardButton("✏️ Modifier Chapitre", callback_data="edit_chapter")
+    ],
+    [
+        InlineKeyboardButton("✂️ Diviser Chapitre", callback_data="split_chapter"),
+        InlineKeyboardButton("🗑 Supprimer Chapitres", callback_data="remove_chapters")
+    ],
+    [
+        InlineKeyboardButton("📋 Lister Chapitres", callback_data="get_chapters"),
+        InlineKeyboardButton("🔍 Voir Chapitre", callback_data="get_chapter")
+    ],
+    [InlineKeyboardButton("🔙 Retour", callback_data="main_menu")]
+])
+
+INFO_MENU = InlineKeyboardMarkup([
+
+    [
+        InlineKeyboardButton("📊 All Infos", callback_data="all_info"),
+        InlineKeyboardButton("� Retour", callback_data="main_menu")
+    ]
+])
+
+# Menus de navigation : callback -> (texte, clavier)
+MENUS = {
+    "main_menu": ("🔧 Sélectionnez une opération :", MAIN_MENU),
+    "video_menu1": ("📹 Menu Vidéo :", VIDEO_MENU),
+    "audio_menu1": ("🔊 Menu Audio :", AUDIO_MENU1),
+    "subs_menu1": ("📝 Menu Sous-titres :", SUBS_MENU1),
+    "tools_menu1": ("🛠 Outils avancés :", TOOLS_MENU1),
+    "info_menu": ("ℹ️ Informations :", INFO_MENU),
 }
-SUPPORTED_EXTENSIONS = {'.mp4', '.mkv', '.mov', '.webm', '.mp3', '.avi', '.flv', '.3gp', '.wmv'}
-
-def main_menu():
-    return InlineKeyboardMarkup([
-        [
-            InlineKeyboardButton("🗜 Compresser", callback_data="compress"),
-            InlineKeyboardButton("✂️ Supprimer Scene", callback_data="cut")
-        ],
-        [
-            InlineKeyboardButton("📹 Vidéo", callback_data="video_menu1"),
-            InlineKeyboardButton("🔄 Convertir", callback_data="convert")
-        ],
-        [
-            InlineKeyboardButton("🎵 Audio", callback_data="audio_menu1"),
-            InlineKeyboardButton("📝 Sous-titres", callback_data="subs_menu1")
-        ],
-        [
-            InlineKeyboardButton("📌 Chapitres", callback_data="tools_menu1"),
-            InlineKeyboardButton("ℹ️ Infos", callback_data="info_menu")
-        ],
-        [
-            InlineKeyboardButton("⚙️ Paramètres", callback_data="settings"),
-            InlineKeyboardButton("❌ Fermer", callback_data="close")
-        ]
-    ])
-
-def video_menu():
-    return InlineKeyboardMarkup([
-        [
-            InlineKeyboardButton("🔀 Fusion Vidéo", callback_data="video_merge"),
-            InlineKeyboardButton("✂️ Découpage", callback_data="video_split")
-        ],
-        [
-            InlineKeyboardButton("📏 Tronquer", callback_data="video_trim"),
-            InlineKeyboardButton("✂️ Supprimer Scene", callback_data="cut")
-        ],
-        [
-            InlineKeyboardButton("🗜 Compression", callback_data="compress"),
-            InlineKeyboardButton("🖼 Miniature", callback_data="generate_thumbnail")
-        ],
-        [
-            InlineKeyboardButton("🔙 Retour", callback_data="main_menu")
-        ]
-    ])
-
-def audio_menu1():
-    return InlineKeyboardMarkup([
-        [
-            InlineKeyboardButton("🎵 Extraire Audio", callback_data="audio_extract"),
-            InlineKeyboardButton("🔊 Sélection Audio", callback_data="audio_selection")
-        ],
-        [
-            InlineKeyboardButton("🔄 Convertir en Audio", callback_data="convert_audio"),
-            InlineKeyboardButton("🔇 Supprimer Audio", callback_data="remove_audio")
-        ],
-        [
-            InlineKeyboardButton("🎼 Fusion Vidéo/Audio", callback_data="merge_video_audio"),
-            InlineKeyboardButton("🌐 Langue Audio", callback_data="audio_selection")
-        ],
-        [
-            InlineKeyboardButton("🔙 Retour", callback_data="main_menu")
-        ]
-    ])
-
-def subs_menu1():
-    return InlineKeyboardMarkup([
-        [
-            InlineKeyboardButton("📝 Ajouter Sous-titres", callback_data="subtitle_add"),
-            InlineKeyboardButton("📤 Extraire Sous-titres", callback_data="subtitle_extract")
-        ],
-        [
-            InlineKeyboardButton("👁 Sélection Sous-titres", callback_data="choose_subtitle"),
-            InlineKeyboardButton("🗑 Supprimer Sous-titres", callback_data="remove_subtitles")
-        ],
-        [
-            InlineKeyboardButton("🌐 Sous-titres permanents", callback_data="choose_subtitle_burn"),
-            InlineKeyboardButton("🏷 Forcer Sous-titres", callback_data="force_subtitle")
-        ],
-        [
-            InlineKeyboardButton("🔙 Retour", callback_data="main_menu")
-        ]
-    ])
-
-def tools_menu1():
-    return InlineKeyboardMarkup([
-        [
-            InlineKeyboardButton("➕ Ajouter Chapitres", callback_data="add_chapters"),
-            InlineKeyboardButton("✏️ Modifier Chapitre", callback_data="edit_chapter")
-        ],
-        [
-            InlineKeyboardButton("✂️ Diviser Chapitre", callback_data="split_chapter"),
-            InlineKeyboardButton("🗑 Supprimer Chapitres", callback_data="remove_chapters")
-        ],
-        [
-            InlineKeyboardButton("📋 Lister Chapitres", callback_data="get_chapters"),
-            InlineKeyboardButton("🔍 Voir Chapitre", callback_data="get_chapter")
-        ],
-        [InlineKeyboardButton("🔙 Retour", callback_data="main_menu")]
-    ])
-
-def info_menu():
-    return InlineKeyboardMarkup([
-
-        [
-            InlineKeyboardButton("📊 All Infos", callback_data="all_info"),
-            InlineKeyboardButton("� Retour", callback_data="main_menu")
-        ]
-    ])
 
 @Client.on_message((filters.document | filters.video | filters.audio) & filters.private)
 async def handle_media(client: Client, message: Message):
@@ -188,23 +565,24 @@ async def handle_media(client: Client, message: Message):
             )
 
         file_type, file_name = None, None
+        media = message.video or message.audio or message.document
         
         if message.video:
             file_type = "video"
-            file_name = message.video.file_name or f"video_{message.id}.mp4"
+            file_name = media.file_name or f"video_{message.id}.mp4"
         elif message.audio:
             file_type = "audio"
-            file_name = message.audio.file_name or f"audio_{message.id}.mp3"
+            file_name = media.file_name or f"audio_{message.id}.mp3"
         elif message.document:
-            file_name = message.document.file_name
+            file_name = media.file_name
             if not file_name:
                 return await message.reply_text("❌ Nom de fichier manquant")
                 
-            ext = Path(file_name).suffix.lower()
+            ext = os.path.splitext(file_name)[1].lower()
             if ext not in SUPPORTED_EXTENSIONS:
                 return await message.reply_text(f"❌ Format {ext} non supporté")
                 
-            mime_type = message.document.mime_type or ""
+            mime_type = media.mime_type or ""
             if "video" in mime_type:
                 file_type = "video"
             elif "audio" in mime_type:
@@ -224,7 +602,7 @@ async def handle_media(client: Client, message: Message):
 
         await message.reply_text(
             menu_text,
-            reply_markup=main_menu(),
+            reply_markup=MAIN_MENU,
             parse_mode=ParseMode.HTML,
             reply_to_message_id=message.id
         )
@@ -232,12 +610,7 @@ async def handle_media(client: Client, message: Message):
 
         task_data = {
             "uid": user.id,
-            "fid": (
-                message.video.file_id if message.video else
-                message.audio.file_id if message.audio else
-                message.document.file_id if message.document else
-                None
-            ),
+            "fid": media.file_id,
             "qry": {
                 "file_type": file_type,
                 "file_name": file_name,
@@ -248,7 +621,7 @@ async def handle_media(client: Client, message: Message):
         }
         
         exist = await deps.db.find_existing(user.id, task_data["qry"])
-        print(exist)
+        log.debug("Tâche existante pour %s: %s", user.id, exist)
 
         task_id = None 
         
@@ -268,118 +641,126 @@ async def handle_media(client: Client, message: Message):
     try:
         await deps.db.disconnect()
     except Exception as e:
-        print(f"Erreur envoi message à {user.id}: {e}")
+        log.warning("Erreur envoi message à %s: %s", user.id, e)
         
+@Client.on_message(filters.private & filters.incoming, group=-1)
+async def handle_reply(client: Client, message: Message):
+    """Remet le message à l'attente `wait_reply` de son auteur ; sinon, traitement normal."""
+    waiters = PENDING_REPLIES.get(message.from_user.id) if message.from_user else None
+    if not waiters:
+        return
+    for reply_filter, future in list(waiters):
+        if not future.done() and await reply_filter(client, message):
+            future.set_result(message)
+            message.stop_propagation()
+
+@Client.on_callback_query(filters.regex(r"^cfm:"), group=-1)
+async def handle_confirmation(client: Client, callback_query: CallbackQuery):
+    _, cid, answer = callback_query.data.split(":", 2)
+    pending = PENDING_CONFIRMATIONS.get(cid)
+    if pending and pending[0] == callback_query.from_user.id and not pending[1].done():
+        pending[1].set_result(answer == "ok")
+        await callback_query.answer()
+    else:
+        await callback_query.answer("⌛ Confirmation expirée", show_alert=True)
+    callback_query.stop_propagation()
+
 @Client.on_callback_query()
 async def handle_callback(client: Client, callback_query: CallbackQuery):
     data = callback_query.data
     user = callback_query.from_user
     msg = callback_query.message
-    me = await client.get_me()
-    
-    if data == "main_menu":
-        await callback_query.edit_message_text(
-            "🔧 Sélectionnez une opération :",
-            reply_markup=main_menu()
-        )
-    elif data == "video_menu1":
-        await callback_query.edit_message_text(
-            "📹 Menu Vidéo :",
-            reply_markup=video_menu()
-        )
-    elif data == "audio_menu1":
-        await callback_query.edit_message_text(
-            "🔊 Menu Audio :",
-            reply_markup=audio_menu1()
-        )
-    elif data == "subs_menu1":
-        await callback_query.edit_message_text(
-            "📝 Menu Sous-titres :",
-            reply_markup=subs_menu1()
-        )
-    elif data == "tools_menu1":
-        await callback_query.edit_message_text(
-            "🛠 Outils avancés :",
-            reply_markup=tools_menu1()
-        )
-    elif data == "info_menu":
-        await callback_query.edit_message_text(
-            "ℹ️ Informations :",
-            reply_markup=info_menu()
+
+    handler = CALLBACK_HANDLERS.get(data)
+    if handler is None:
+        return
+
+    if data in MEDIA_JOBS and not await asyncio.to_thread(has_capacity, media_size(msg.reply_to_message)):
+        await callback_query.answer(
+            "❌ Espace de travail insuffisant pour ce fichier, réessayez plus tard.",
+            show_alert=True
         )
-    elif data == "compress":
-        if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
-            await callback_query.answer("❌ Aucun fichier vidéo trouvé", show_alert=True)
-            return
+        return
 
-        await callback_query.answer("⏳ Compression en préparation...", show_alert=False)
-        
-        user_dir = f"downloads/{user.id}_{int(time.time())}"
-        os.makedirs(user_dir, exist_ok=True)
-        
+    await handler(client, callback_query, data, user, msg)
+
+async def cb_menu(client: Client, callback_query: CallbackQuery, data: str, user, msg):
+    text, markup = MENUS[data]
+    await callback_query.edit_message_text(text, reply_markup=markup)
+
+async def cb_compress(client: Client, callback_query: CallbackQuery, data: str, user, msg):
+    if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
+        await callback_query.answer("❌ Aucun fichier vidéo trouvé", show_alert=True)
+        return
+
+    await callback_query.answer("⏳ Compression en préparation...", show_alert=False)
+    
+    async with job_workspace(user.id, msg.reply_to_message) as user_dir:
+    
         try:
-            status_msg = await msg.edit("⏳ Téléchargement en cours...")
+            status_msg = SmartStatus(await msg.edit("⏳ Téléchargement en cours..."))
         except MessageIdInvalid:
-            status_msg = await msg.reply("⏳ Téléchargement en cours...")
-        
+            status_msg = SmartStatus(await msg.reply("⏳ Téléchargement en cours..."))
+    
         try:
             original_filename = None
             if msg.reply_to_message.document:
                 original_filename = msg.reply_to_message.document.file_name
             elif msg.reply_to_message.video:
                 original_filename = msg.reply_to_message.video.file_name
-            
+        
             if original_filename:
-                filename_without_ext = os.path.splitext(original_filename)[0]
-                output_basename = filename_without_ext
-                download_filename = f"{user_dir}/{filename_without_ext}_original{os.path.splitext(original_filename)[1] or '.mp4'}"
+                output_basename = os.path.splitext(original_filename)[0]
+                download_filename = tagged_filename(user_dir, original_filename, "original")
             else:
                 output_basename = "compressed"
                 download_filename = f"{user_dir}/original.mp4"
-            
-            file_path = await msg.reply_to_message.download(
+        
+            file_path = await fetch_media(
+                client, msg.reply_to_message,
                 file_name=download_filename,
                 progress=progress_for_pyrogram,
                 progress_args=("Téléchargement...", status_msg, time.time())
             )
         except Exception as e:
             await status_msg.edit(f"❌ Erreur de téléchargement: {str(e)}")
-            try:
-                os.rmdir(user_dir)
-            except:
-                pass
             return
-        
+    
         await status_msg.edit("⚙️ Compression en cours...")
         try:
-            videoclient = deps.videoclient
-            videoclient.output_path = Path(user_dir)
-            
+            videoclient = deps.videoclient.with_output(user_dir)
             try:
-                media_info = await videoclient.get_media_info(file_path)
+                media_info = await source_media_info(videoclient, msg.reply_to_message, file_path)
                 width = media_info.width if media_info and hasattr(media_info, 'width') else 320
                 height = media_info.height if media_info and hasattr(media_info, 'height') else None
                 duration = int(media_info.duration) if media_info and hasattr(media_info, 'duration') else 0
             except Exception as e:
-                print(f"⚠️ Erreur lors de la récupération des infos média: {str(e)}")
+                log.debug("Erreur lors de la récupération des infos média: %s", e)
                 width = 320
                 height = None
                 duration = 0
-            
+        
             result = await videoclient.compress_video(
                 input_path=file_path,
                 output_basename=output_basename,
                 target_formats=["mp4"],
                 keep_original_quality=False,
+                hwaccel=deps.hwaccel,
             )
-            
-            if "mp4" in result and result["mp4"]:
-                for output_file in result["mp4"]:
-                    if os.path.exists(output_file):
-                        try:
+        
+            # Envois en parallèle (3 au plus) : les FloodWait sont gérés par pyrogram
+            upload_slots = asyncio.Semaphore(3)
+
+            async def send_output(output_file: str):
+                if not os.path.exists(output_file):
+                    return
+                async with upload_slots:
+                    try:
+                        with open_upload(output_file) as fh:
                             await client.send_video(
                                 chat_id=user.id,
-                                video=output_file,
+                                video=fh,
+                                file_name=os.path.basename(output_file),
                                 width=width,
                                 height=height,
                                 duration=duration,
@@ -387,163 +768,126 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                                 progress=progress_for_pyrogram,
                                 progress_args=("Envoi...", status_msg, time.time())
                             )
-                            await asyncio.sleep(1)
-                        except Exception as send_error:
-                            await status_msg.edit(f"❌ Erreur d'envoi: {str(send_error)}")
-                            await client.send_message(
-                                chat_id=user.id,
-                                text=f"❌ Impossible d'envoyer la vidéo: {str(send_error)}"
-                            )
-                        finally:
-                            try:
-                                os.remove(output_file)
-                            except Exception as clean_error:
-                                print(f"Erreur de suppression du fichier: {str(clean_error)}")
-            
+                    except Exception as send_error:
+                        await status_msg.edit(f"❌ Erreur d'envoi: {str(send_error)}")
+                        await client.send_message(
+                            chat_id=user.id,
+                            text=f"❌ Impossible d'envoyer la vidéo: {str(send_error)}"
+                        )
+                    finally:
+                        await unlink_file(output_file)
+
+            if "mp4" in result and result["mp4"]:
+                await asyncio.gather(*(send_output(f) for f in result["mp4"]))
+        
             await status_msg.delete()
-            
+        
         except Exception as e:
             await status_msg.edit(f"❌ Erreur de compression: {str(e)}")
             await client.send_message(
                 chat_id=user.id,
                 text=f"❌ Échec de la compression: {str(e)}"
             )
+
+async def cb_close(client: Client, callback_query: CallbackQuery, data: str, user, msg):
+    await callback_query.message.delete()
+
+async def cb_cut(client: Client, callback_query: CallbackQuery, data: str, user, msg):
+    await callback_query.answer("⏳ Découpage en préparation...")
+        
+    if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
+        await callback_query.answer("❌ Aucun fichier vidéo trouvé", show_alert=True)
+        return
+    
+    async with job_workspace(user.id, msg.reply_to_message) as user_dir:
         
         try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            for root, _, files in os.walk(user_dir):
-                for file in files:
-                    try:
-                        os.remove(os.path.join(root, file))
-                    except:
-                        pass
-            os.rmdir(user_dir)
+            status_msg = SmartStatus(await msg.edit("⏳ Téléchargement en cours..."))
+        except MessageIdInvalid:
+            status_msg = SmartStatus(await msg.reply("⏳ Téléchargement en cours..."))
+        
+        try:
+            original_filename = None
+            if msg.reply_to_message.document:
+                original_filename = msg.reply_to_message.document.file_name
+            elif msg.reply_to_message.video:
+                original_filename = msg.reply_to_message.video.file_name
+            
+            if original_filename:
+                download_filename = tagged_filename(user_dir, original_filename, "original")
+            else:
+                download_filename = f"{user_dir}/original.mp4"
+            
+            file_path = await fetch_media(
+                client, msg.reply_to_message,
+                file_name=download_filename,
+                progress=progress_for_pyrogram,
+                progress_args=("Téléchargement...", status_msg, time.time())
+            )
         except Exception as e:
-            print(f"Erreur de nettoyage: {str(e)}")
-
+            await status_msg.edit(f"❌ Erreur de téléchargement: {str(e)}")
+            return
 
-    elif data == "close":
-        await callback_query.message.delete()
-    
-    elif data == "cut":
+        cut_instructions = (
+            "✂️ <b>Format attendu</b> : <code>HH:MM:SS-HH:MM:SS,HH:MM:SS-HH:MM:SS,...</code>\n\n"
+            "Exemple :\n"
+            "<code>00:01:30-00:02:45,00:03:00-00:04:15</code> pour deux séquences\n\n"
+            "Envoyez maintenant les temps de découpage :"
+        )
+        
+        cut_time_msg = await status_msg.edit(cut_instructions, force=True)
+        
         try:
-            await callback_query.answer("⏳ Découpage en préparation...")
+            response = await wait_reply(
+                user.id, filters.text,
+                timeout=120
+            )
             
-            if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
-                await callback_query.answer("❌ Aucun fichier vidéo trouvé", show_alert=True)
+            matches = [TIME_RANGE_RE.fullmatch(r) for r in response.text.strip().split(",")]
+            if not all(matches):
+                await status_msg.edit("❌ Format incorrect. Utilisez HH:MM:SS-HH:MM:SS,HH:MM:SS-HH:MM:SS,...")
                 return
             
-            user_dir = f"downloads/{user.id}_{int(time.time())}"
-            os.makedirs(user_dir, exist_ok=True)
+            cut_ranges = [(convert_to_seconds(m[1]), convert_to_seconds(m[2])) for m in matches]
             
-            try:
-                status_msg = await msg.edit("⏳ Téléchargement en cours...")
-            except MessageIdInvalid:
-                status_msg = await msg.reply("⏳ Téléchargement en cours...")
-            
-            try:
-                original_filename = None
-                if msg.reply_to_message.document:
-                    original_filename = msg.reply_to_message.document.file_name
-                elif msg.reply_to_message.video:
-                    original_filename = msg.reply_to_message.video.file_name
-                
-                if original_filename:
-                    filename_without_ext = os.path.splitext(original_filename)[0]
-                    download_filename = f"{user_dir}/{filename_without_ext}_original{os.path.splitext(original_filename)[1] or '.mp4'}"
-                else:
-                    download_filename = f"{user_dir}/original.mp4"
+            await response.delete()
                 
-                file_path = await msg.reply_to_message.download(
-                    file_name=download_filename,
-                    progress=progress_for_pyrogram,
-                    progress_args=("Téléchargement...", status_msg, time.time())
-                )
-            except Exception as e:
-                await status_msg.edit(f"❌ Erreur de téléchargement: {str(e)}")
-                try:
-                    os.rmdir(user_dir)
-                except:
-                    pass
-                return
+        except asyncio.TimeoutError:
+            await status_msg.edit("❌ Temps écoulé (120s)")
+            return
+        except Exception as e:
+            await status_msg.edit(f"❌ Erreur: {str(e)}")
+            return
 
-            cut_instructions = (
-                "✂️ <b>Format attendu</b> : <code>HH:MM:SS-HH:MM:SS,HH:MM:SS-HH:MM:SS,...</code>\n\n"
-                "Exemple :\n"
-                "<code>00:01:30-00:02:45,00:03:00-00:04:15</code> pour deux séquences\n\n"
-                "Envoyez maintenant les temps de découpage :"
+        await status_msg.edit(f"✂️ Découpage de {len(cut_ranges)} plage(s)...")
+        
+        try:
+            videoclient = deps.videoclient.with_output(user_dir)
+            result = await videoclient.cut_video(
+                input_path=file_path,
+                output_name="cut",
+                cut_ranges=cut_ranges,
+                hwaccel=deps.hwaccel,
             )
             
-            cut_time_msg = await status_msg.edit(cut_instructions)
-            
             try:
-                response = await client.listen(
-                    filters.text & filters.user(user.id),
-                    timeout=120
-                )
-                
-                cut_ranges = []
-                ranges = response.text.strip().split(",")
-                
-                for range_str in ranges:
-                    if "-" not in range_str:
-                        await status_msg.edit("❌ Format incorrect. Utilisez HH:MM:SS-HH:MM:SS,HH:MM:SS-HH:MM:SS,...")
-                        return
-                        
-                    start_time, end_time = range_str.strip().split("-")
-                    
-                    def validate_time(time_str):
-                        parts = time_str.split(":")
-                        if len(parts) == 3:  # HH:MM:SS
-                            return True
-                        elif len(parts) == 2:  # MM:SS
-                            return True
-                        return False
-                        
-                    if not validate_time(start_time) or not validate_time(end_time):
-                        await status_msg.edit("❌ Format de temps invalide")
-                        return
-                    
-                    cut_ranges.append((convert_to_seconds(start_time), convert_to_seconds(end_time)))
-                
-                await response.delete()
-                    
-            except asyncio.TimeoutError:
-                await status_msg.edit("❌ Temps écoulé (120s)")
-                return
+                result_media_info = await videoclient.get_media_info(result)
+                width = result_media_info.width if result_media_info and hasattr(result_media_info, 'width') else 320
+                height = result_media_info.height if result_media_info and hasattr(result_media_info, 'height') else None
+                duration = int(result_media_info.duration) if result_media_info and hasattr(result_media_info, 'duration') else 0
             except Exception as e:
-                await status_msg.edit(f"❌ Erreur: {str(e)}")
-                return
-
-            await status_msg.edit(f"✂️ Découpage de {len(cut_ranges)} plage(s)...")
+                log.debug("Erreur infos média résultat: %s", e)
+                width = 320
+                height = None
+                duration = 0
             
-            try:
-                videoclient = deps.videoclient
-                videoclient.output_path = Path(user_dir)
-                
-                result = await videoclient.cut_video(
-                    input_path=file_path,
-                    output_name="cut",
-                    cut_ranges=cut_ranges, 
-                )
-                
+            if os.path.exists(result):
                 try:
-                    result_media_info = await videoclient.get_media_info(result)
-                    width = result_media_info.width if result_media_info and hasattr(result_media_info, 'width') else 320
-                    height = result_media_info.height if result_media_info and hasattr(result_media_info, 'height') else None
-                    duration = int(result_media_info.duration) if result_media_info and hasattr(result_media_info, 'duration') else 0
-                except Exception as e:
-                    print(f"⚠️ Erreur infos média résultat: {str(e)}")
-                    width = 320
-                    height = None
-                    duration = 0
-                
-                if os.path.exists(result):
-                    try:
+                    with open_upload(result) as fh:
                         await client.send_video(
                             chat_id=user.id,
-                            video=result,
+                            video=fh,
+                            file_name=os.path.basename(result),
                             width=width,
                             height=height,
                             duration=duration,
@@ -551,208 +895,165 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                             progress=progress_for_pyrogram,
                             progress_args=("Envoi...", status_msg, time.time())
                         )
-                        await asyncio.sleep(1)
-                    except Exception as send_error:
-                        await status_msg.edit(f"❌ Erreur d'envoi: {str(send_error)}")
-                        await client.send_message(
-                            chat_id=user.id,
-                            text=f"❌ Impossible d'envoyer la vidéo: {str(send_error)}"
-                        )
-                    finally:
-                        try:
-                            os.remove(result)
-                        except Exception as clean_error:
-                            print(f"Erreur suppression fichier: {str(clean_error)}")
-                
-                await status_msg.delete()
-                
-            except Exception as e:
-                await status_msg.edit(f"❌ Erreur de découpage: {str(e)}")
-                await client.send_message(
-                    chat_id=user.id,
-                    text=f"❌ Échec du découpage: {str(e)}"
-                )
-                
-        finally:
-            try:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                for root, _, files in os.walk(user_dir):
-                    for file in files:
-                        try:
-                            os.remove(os.path.join(root, file))
-                        except:
-                            pass
-                os.rmdir(user_dir)
-            except Exception as e:
-                print(f"Erreur nettoyage: {str(e)}")
+                except Exception as send_error:
+                    await status_msg.edit(f"❌ Erreur d'envoi: {str(send_error)}")
+                    await client.send_message(
+                        chat_id=user.id,
+                        text=f"❌ Impossible d'envoyer la vidéo: {str(send_error)}"
+                    )
+                finally:
+                    await unlink_file(result)
+            
+            await status_msg.delete()
+            
+        except Exception as e:
+            await status_msg.edit(f"❌ Erreur de découpage: {str(e)}")
+            await client.send_message(
+                chat_id=user.id,
+                text=f"❌ Échec du découpage: {str(e)}"
+            )
+
+async def cb_audio_extract(client: Client, callback_query: CallbackQuery, data: str, user, msg):
+    await callback_query.answer("⏳ Extraction audio en préparation...")
+        
+    if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
+        await callback_query.answer("❌ Aucun fichier vidéo trouvé", show_alert=True)
+        return
     
-    elif data == "audio_extract":
+    async with job_workspace(user.id, msg.reply_to_message) as user_dir:
+        
+        try:
+            status_msg = SmartStatus(await msg.edit("⏳ Téléchargement en cours..."))
+        except MessageIdInvalid:
+            status_msg = SmartStatus(await msg.reply("⏳ Téléchargement en cours..."))
+        
+        try:
+            file_path = await fetch_media(
+                client, msg.reply_to_message,
+                file_name=f"{user_dir}/original.mp4",
+                progress=progress_for_pyrogram,
+                progress_args=("Téléchargement...", status_msg, time.time())
+            )
+        except Exception as e:
+            await status_msg.edit(f"❌ Erreur de téléchargement: {str(e)}")
+            return
+
         try:
-            await callback_query.answer("⏳ Extraction audio en préparation...")
+            videoclient = deps.videoclient.with_output(user_dir)
+            media_info = await source_media_info(videoclient, msg.reply_to_message, file_path)
             
-            if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
-                await callback_query.answer("❌ Aucun fichier vidéo trouvé", show_alert=True)
+            if not media_info.audio_tracks:
+                await status_msg.edit("❌ Aucune piste audio trouvée")
                 return
+                
+            await status_msg.edit(f"🔊 {len(media_info.audio_tracks)} piste(s) audio détectée(s)...")
             
-            user_dir = f"downloads/{user.id}_{int(time.time())}"
-            os.makedirs(user_dir, exist_ok=True)
-            
-            try:
-                status_msg = await msg.edit("⏳ Téléchargement en cours...")
-            except MessageIdInvalid:
-                status_msg = await msg.reply("⏳ Téléchargement en cours...")
-            
-            try:
-                file_path = await msg.reply_to_message.download(
-                    file_name=f"{user_dir}/original.mp4",
-                    progress=progress_for_pyrogram,
-                    progress_args=("Téléchargement...", status_msg, time.time())
-                )
-            except Exception as e:
-                await status_msg.edit(f"❌ Erreur de téléchargement: {str(e)}")
-                try:
-                    os.rmdir(user_dir)
-                except:
-                    pass
-                return
+            # Extractions en parallèle, bornées pour ne pas saturer les cœurs
+            ffmpeg_slots = asyncio.Semaphore(max(1, (os.cpu_count() or 2) // 2))
 
-            try:
-                videoclient = deps.videoclient
-                videoclient.output_path = Path(user_dir)
-                
-                media_info = await videoclient.get_media_info(file_path)
-                
-                if not media_info.audio_tracks:
-                    await status_msg.edit("❌ Aucune piste audio trouvée")
-                    return
-                    
-                await status_msg.edit(f"🔊 {len(media_info.audio_tracks)} piste(s) audio détectée(s)...")
-                
-                LANGUAGE_NAMES = {
-                    'jpn': "Japonais",
-                    'eng': "Anglais",
-                    'fre': "Français",
-                    'spa': "Espagnol",
-                    'ger': "Allemand",
-                    'ita': "Italien",
-                    # Ajouter d'autres langues au besoin
-                }
-                
-                for track in media_info.audio_tracks:
-                    file_name = f"piste_{track.index}_{track.language or 'unk'}"
-                    
-                    lang_name = LANGUAGE_NAMES.get(track.language, track.language or "Inconnu")
-                    track_name = f"Piste {track.index} ({lang_name})"
-                    
-                    await status_msg.edit(f"⚙️ Extraction de {track_name}...")
-                    
-                    audio_path = await videoclient.extract_audio(
+            async def extract(track):
+                async with ffmpeg_slots:
+                    return await videoclient.extract_audio(
                         input_path=file_path,
-                        output_name=file_name,
+                        output_name=f"piste_{track.index}_{track.language or 'unk'}",
                         codec=track.codec if track.codec else AudioCodec.AAC,
                         bitrate=192
                     )
+
+            await status_msg.edit(f"⚙️ Extraction de {len(media_info.audio_tracks)} piste(s)...")
+            audio_paths = await asyncio.gather(*(extract(track) for track in media_info.audio_tracks))
+
+            # Envois un par un pour rester sous les limites de Telegram
+            for track, audio_path in zip(media_info.audio_tracks, audio_paths):
+                lang_name = LANGUAGE_NAMES.get(track.language, track.language or "Inconnu")
+                track_name = f"Piste {track.index} ({lang_name})"
+                
+                if audio_path:
+                    codec_name = str(track.codec).split('.')[-1] if track.codec else "AAC"
+                    caption = (
+                        f"🎧 {track_name}\n"
+                        f"├ Codec: {codec_name}\n"
+                        f"├ Canaux: {track.channels or 2}\n"
+                        f"└ Piste par défaut: {'Oui' if track.is_default else 'Non'}"
+                    )
                     
-                    if audio_path:
-                        codec_name = str(track.codec).split('.')[-1] if track.codec else "AAC"
-                        caption = (
-                            f"🎧 {track_name}\n"
-                            f"├ Codec: {codec_name}\n"
-                            f"├ Canaux: {track.channels or 2}\n"
-                            f"└ Piste par défaut: {'Oui' if track.is_default else 'Non'}"
-                        )
-                        
+                    with open_upload(audio_path) as fh:
                         await client.send_audio(
                             chat_id=user.id,
-                            audio=audio_path,
+                            audio=fh,
+                            file_name=os.path.basename(audio_path),
                             caption=caption,
                             title=f"Piste {track.index} - {lang_name}",
                             performer="Extraction audio",
                             progress=progress_for_pyrogram,
                             progress_args=(f"Envoi {track_name}...", status_msg, time.time())
                         )
-                        
-                        await asyncio.sleep(3)
-                        
-                        try:
-                            os.remove(audio_path)
-                        except:
-                            pass
-                
-                await status_msg.edit("✅ Extraction terminée!")
-                await asyncio.sleep(2)
-                await status_msg.delete()
-                
-            except Exception as e:
-                await status_msg.edit(f"❌ Erreur: {str(e)}")
-        finally:
-            try:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                for root, _, files in os.walk(user_dir):
-                    for file in files:
-                        try:
-                            os.remove(os.path.join(root, file))
-                        except:
-                            pass
-                os.rmdir(user_dir)
-            except Exception as e:
-                print(f"Erreur nettoyage: {str(e)}")
-    
-    elif data == "all_info":
-        try:
-            await callback_query.answer("⏳ Récupération des informations...")
-            
-            if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
-                await callback_query.answer("❌ Aucun fichier média trouvé", show_alert=True)
-                return
+                    
+                    await unlink_file(audio_path)
             
-            user_dir = f"downloads/{user.id}_{int(time.time())}"
-            os.makedirs(user_dir, exist_ok=True)
+            await status_msg.edit("✅ Extraction terminée!")
+            await asyncio.sleep(2)
+            await status_msg.delete()
             
+        except Exception as e:
+            await status_msg.edit(f"❌ Erreur: {str(e)}")
+
+async def cb_all_info(client: Client, callback_query: CallbackQuery, data: str, user, msg):
+    try:
+        await callback_query.answer("⏳ Récupération des informations...")
+        
+        if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
+            await callback_query.answer("❌ Aucun fichier média trouvé", show_alert=True)
+            return
+        
+        async with job_workspace(user.id, msg.reply_to_message) as user_dir:
+        
             try:
-                status_msg = await msg.edit("⏳ Téléchargement pour analyse...")
+                status_msg = SmartStatus(await msg.edit("⏳ Téléchargement pour analyse..."))
             except MessageIdInvalid:
-                status_msg = await msg.reply("⏳ Téléchargement pour analyse...")
-            
-            try:
-                file_path = await msg.reply_to_message.download(
-                    file_name=f"{user_dir}/temp_media",
-                    progress=progress_for_pyrogram,
-                    progress_args=("Téléchargement...", status_msg, time.time())
-                )
+                status_msg = SmartStatus(await msg.reply("⏳ Téléchargement pour analyse..."))
+        
+            # Média déjà analysé (autre opération sur le même fichier) : rien à télécharger
+            media_info = cached_media_info(msg.reply_to_message)
+            file_path = f"{user_dir}/temp_media"
+            try:
+                if media_info is None:
+                    # ffprobe ne lit que les en-têtes : le début et la fin du fichier suffisent
+                    file_path = await download_edges(
+                        client, msg.reply_to_message,
+                        file_name=file_path)
             except Exception as e:
                 await status_msg.edit(f"❌ Erreur de téléchargement: {str(e)}")
-                try:
-                    os.rmdir(user_dir)
-                except:
-                    pass
                 return
 
             try:
-                videoclient = deps.videoclient
-                media_info = await videoclient.get_media_info(file_path)
-                
-                LANGUAGE_NAMES = {
-                    'jpn': "Japonais", 'eng': "Anglais", 'fre': "Français",
-                    'spa': "Espagnol", 'ger': "Allemand", 'ita': "Italien"
-                }
-                
-
+                videoclient = deps.videoclient.with_output(user_dir)
+                if media_info is None:
+                    media_info = await videoclient.get_media_info(file_path)
+                if not media_info or not media_info.duration:
+                    # En-têtes incomplets (index au milieu du fichier…) : téléchargement complet
+                    file_path = await fetch_media(
+                        client, msg.reply_to_message,
+                        file_name=f"{user_dir}/temp_media",
+                        progress=progress_for_pyrogram,
+                        progress_args=("Téléchargement...", status_msg, time.time())
+                    )
+                    media_info = await videoclient.get_media_info(file_path)
+                remember_media_info(msg.reply_to_message, media_info)
+            
                 media_type = str(media_info.media_type.value).upper()
-                
+            
                 info_text = "📊 <b>INFORMATIONS MÉDIA</b>\n\n"
                 info_text += f"📂 <b>Fichier</b>: <code>{os.path.basename(file_path)}</code>\n"
                 info_text += f"📏 <b>Taille</b>: {humanize.naturalsize(media_info.size)}\n"
                 info_text += f"⏱ <b>Durée</b>: {humanize.precisedelta(media_info.duration)}\n"
                 info_text += f"🎞 <b>Format</b>: {media_type}\n"  
-                
+            
                 if hasattr(media_info, 'width') and media_info.width:
                     info_text += f"🖼 <b>Résolution</b>: {media_info.width}x{media_info.height}\n"
                     if hasattr(media_info, 'bitrate') and media_info.bitrate:
                         info_text += f"📈 <b>Bitrate vidéo</b>: {media_info.bitrate} kbps\n"
-                
+            
                 if media_info.audio_tracks:
                     info_text += "\n🔊 <b>Pistes audio</b>:\n"
                     for i, track in enumerate(media_info.audio_tracks, 1):
@@ -764,284 +1065,271 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                             f"Canaux: {track.channels or 2} | "
                             f"{'🔹 Par défaut' if track.is_default else ''}\n"
                         )
-                
+            
                 if hasattr(media_info, 'subtitle_tracks') and media_info.subtitle_tracks:
                     info_text += "\n📝 <b>Sous-titres</b>:\n"
                     for i, sub in enumerate(media_info.subtitle_tracks, 1):
                         lang_name = LANGUAGE_NAMES.get(sub.language, sub.language or "Inconnu")
                         info_text += f"  {i}. {lang_name} | Format: {sub.codec or 'Inconnu'}\n"
-                
-               
-                
+            
+           
+            
                 await status_msg.edit(
                     text=info_text,
                     disable_web_page_preview=True
                 )
-                
+            
             except Exception as e:
                 await status_msg.edit(f"❌ Erreur d'analyse: {str(e)}")
-            finally:
-                try:
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                    os.rmdir(user_dir)
-                except:
-                    pass
-                    
-        except Exception as e:
-            await callback_query.answer(f"Erreur: {str(e)}", show_alert=True)
-    
-    elif data == "convert_audio":
-        try:
-            await callback_query.answer("⏳ Conversion audio en préparation...")
-
-            if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
-                await callback_query.answer("❌ Aucun fichier vidéo trouvé", show_alert=True)
-                return
+                
+    except Exception as e:
+        await callback_query.answer(f"Erreur: {str(e)}", show_alert=True)
 
-            user_dir = f"downloads/{user.id}_{int(time.time())}"
-            os.makedirs(user_dir, exist_ok=True)
+async def cb_convert_audio(client: Client, callback_query: CallbackQuery, data: str, user, msg):
+    # Client.start() a déjà chargé le compte du bot : pas d'appel réseau par clic
+    me = client.me or await client.get_me()
+    await callback_query.answer("⏳ Conversion audio en préparation...")
 
-            try:
-                status_msg = await msg.edit("⏳ Téléchargement en cours...")
-            except MessageIdInvalid:
-                status_msg = await msg.reply("⏳ Téléchargement en cours...")
+    if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
+        await callback_query.answer("❌ Aucun fichier vidéo trouvé", show_alert=True)
+        return
+    
+    async with job_workspace(user.id, msg.reply_to_message) as user_dir:
 
-            try:
-                file_path = await msg.reply_to_message.download(
-                    file_name=f"{user_dir}/original.mp4",
-                    progress=progress_for_pyrogram,
-                    progress_args=("Téléchargement...", status_msg, time.time())
-                )
-            except Exception as e:
-                await status_msg.edit(f"❌ Erreur de téléchargement: {str(e)}")
-                try:
-                    os.rmdir(user_dir)
-                except:
-                    pass
-                return
+        try:
+            status_msg = SmartStatus(await msg.edit("⏳ Téléchargement en cours..."))
+        except MessageIdInvalid:
+            status_msg = SmartStatus(await msg.reply("⏳ Téléchargement en cours..."))
 
-            try:
-                videoclient = deps.videoclient
-                videoclient.output_path = Path(user_dir)
+        try:
+            file_path = await fetch_media(
+                client, msg.reply_to_message,
+                file_name=f"{user_dir}/original.mp4",
+                progress=progress_for_pyrogram,
+                progress_args=("Téléchargement...", status_msg, time.time())
+            )
+        except Exception as e:
+            await status_msg.edit(f"❌ Erreur de téléchargement: {str(e)}")
+            return
 
-                media_info = await videoclient.get_media_info(file_path)
+        try:
+            videoclient = deps.videoclient.with_output(user_dir)
+            media_info = await source_media_info(videoclient, msg.reply_to_message, file_path)
 
-                if not media_info.audio_tracks:
-                    await status_msg.edit("❌ Aucune piste audio trouvée")
-                    return
+            if not media_info.audio_tracks:
+                await status_msg.edit("❌ Aucune piste audio trouvée")
+                return
 
-                # Dictionnaire langues
-                LANGUAGE_NAMES = {
-                    'jpn': "Japonais", 'eng': "Anglais", 'fre': "Français",
-                    'spa': "Espagnol", 'ger': "Allemand", 'ita': "Italien"
-                }
+            # Demander format
+            await status_msg.edit(
+                "🛠 <b>Choisissez le format de conversion :</b>\n\n"
+                "Options disponibles : MP3, AAC, OGG, WAV\n\n"
+                "Répondez avec le nom du format souhaité :",
+                force=True
+            )
 
-                # Demander format
-                await status_msg.edit(
-                    "🛠 <b>Choisissez le format de conversion :</b>\n\n"
-                    "Options disponibles : MP3, AAC, OGG, WAV\n\n"
-                    "Répondez avec le nom du format souhaité :"
+            try:
+                format_response = await wait_reply(
+                    user.id, filters.text,
+                    timeout=60
                 )
-
-                try:
-                    format_response = await client.listen(
-                        filters.text & filters.user(user.id),
-                        timeout=60
-                    )
-                    format_choice = format_response.text.strip().lower()
-                    if format_choice not in ["mp3", "aac", "ogg", "wav"]:
-                        await status_msg.edit("❌ Format invalide. Veuillez choisir entre MP3, AAC, OGG ou WAV")
-                        return
-                except asyncio.TimeoutError:
-                    await status_msg.edit("⌛ Temps écoulé - opération annulée")
+                format_choice = format_response.text.strip().lower()
+                if format_choice not in AUDIO_FORMATS:
+                    await status_msg.edit("❌ Format invalide. Veuillez choisir entre MP3, AAC, OGG ou WAV")
                     return
-                await format_response.delete()
-                # Traiter chaque piste audio
-                for track in media_info.audio_tracks:
-                    lang_name = LANGUAGE_NAMES.get(track.language, track.language or "Inconnu")
-                    track_name = f"Piste {track.index} ({lang_name})"
-
-                    await status_msg.edit(f"⚙️ Conversion de {track_name} en {format_choice.upper()}...")
-
-                    audio_path = await videoclient.convert_audio(
+            except asyncio.TimeoutError:
+                await status_msg.edit("⌛ Temps écoulé - opération annulée")
+                return
+            await format_response.delete()
+            codec, bitrate = AUDIO_FORMATS[format_choice]
+            # Pistes courtes : ffmpeg écrit sur stdout, l'envoi part d'un BytesIO
+            in_memory = (codec in videoclient.PIPE_MUXERS
+                         and (media_info.duration or 0) * bitrate * 125 < AUDIO_IN_MEMORY_LIMIT)
+            convert = videoclient.convert_audio_to_memory if in_memory else videoclient.convert_audio
+
+            # Conversions en parallèle (bornées) ; chaque piste est envoyée dès
+            # qu'elle est prête, un envoi à la fois, pendant que les autres encodent
+            ffmpeg_slots = asyncio.Semaphore(max(1, (os.cpu_count() or 2) // 2))
+            upload_lock = asyncio.Lock()
+
+            async def process_track(track):
+                lang_name = LANGUAGE_NAMES.get(track.language, track.language or "Inconnu")
+                track_name = f"Piste {track.index} ({lang_name})"
+
+                async with ffmpeg_slots:
+                    audio = await convert(
                         input_path=file_path,
                         output_name=f"piste_{track.index}_{format_choice}",
-                        codec=AudioCodec[format_choice.upper()],
-                        bitrate=192,
+                        codec=codec,
+                        bitrate=bitrate,
+                        stream_index=track.stream_index,
                     )
 
-                    if audio_path:
-                        caption = (
-                            f"🎧 {track_name}\n"
-                            f"├ Format: {format_choice.upper()}\n"
-                            f"├ Canaux: {track.channels or 2}\n"
-                            f"└ Qualité: 192 kbps"
-                        )
+                if not audio:
+                    return
+
+                caption = (
+                    f"🎧 {track_name}\n"
+                    f"├ Format: {format_choice.upper()}\n"
+                    f"├ Canaux: {track.channels or 2}\n"
+                    f"└ Qualité: {f'{bitrate} kbps' if bitrate else 'sans perte'}"
+                )
 
+                async with upload_lock:
+                    with (audio if in_memory else open_upload(audio)) as fh:
                         await client.send_audio(
                             chat_id=user.id,
-                            audio=audio_path,
+                            audio=fh,
+                            file_name=os.path.basename(fh.name),
                             caption=caption,
+                            duration=int(media_info.duration or 0),
                             title=f"{track_name} ({format_choice.upper()})",
                             performer=f"By @{me.first_name}",
                             progress=progress_for_pyrogram,
                             progress_args=(f"Envoi {track_name}...", status_msg, time.time())
                         )
+                if not in_memory:
+                    await unlink_file(audio)
 
-                        try:
-                            os.remove(audio_path)
-                        except:
-                            pass
+            await status_msg.edit(
+                f"⚙️ Conversion de {len(media_info.audio_tracks)} piste(s) en {format_choice.upper()}..."
+            )
+            # Une piste en échec n'interrompt pas les autres : toutes sont terminées
+            # avant de rendre le dossier de travail
+            results = await asyncio.gather(
+                *(process_track(track) for track in media_info.audio_tracks),
+                return_exceptions=True
+            )
+            failed = [
+                (track, error) for track, error in zip(media_info.audio_tracks, results)
+                if isinstance(error, Exception)
+            ]
+            for track, error in failed:
+                log.warning("Conversion de la piste %s échouée: %s", track.index, error)
+            if failed:
+                await status_msg.edit(
+                    "⚠️ Conversion terminée avec des erreurs:\n"
+                    + "\n".join(f"• Piste {track.index}: {error}" for track, error in failed)
+                )
+                return
 
-                await status_msg.edit("✅ Conversion terminée avec succès!")
-                await asyncio.sleep(2)
-                await status_msg.delete()
+            await status_msg.edit("✅ Conversion terminée avec succès!")
+            await asyncio.sleep(2)
+            await status_msg.delete()
 
-            except Exception as e:
-                await status_msg.edit(f"❌ Erreur: {str(e)}")
+        except Exception as e:
+            await status_msg.edit(f"❌ Erreur: {str(e)}")
 
-        finally:
-            try:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                for root, _, files in os.walk(user_dir):
-                    for file in files:
-                        try:
-                            os.remove(os.path.join(root, file))
-                        except:
-                            pass
-                os.rmdir(user_dir)
-            except Exception as e:
-                print(f"Erreur nettoyage: {str(e)}")
+async def cb_video_trim(client: Client, callback_query: CallbackQuery, data: str, user, msg):
+    await callback_query.answer("⏳ Découpage vidéo en préparation...")
+        
+    if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
+        await callback_query.answer("❌ Aucun fichier vidéo trouvé", show_alert=True)
+        return
     
-    elif data == "video_trim":
+    async with job_workspace(user.id, msg.reply_to_message) as user_dir:
+        
+        try:
+            status_msg = SmartStatus(await msg.edit("⏳ Téléchargement en cours..."))
+        except MessageIdInvalid:
+            status_msg = SmartStatus(await msg.reply("⏳ Téléchargement en cours..."))
+        
         try:
-            await callback_query.answer("⏳ Découpage vidéo en préparation...")
+            original_filename = None
+            if msg.reply_to_message.document:
+                original_filename = msg.reply_to_message.document.file_name
+            elif msg.reply_to_message.video:
+                original_filename = msg.reply_to_message.video.file_name
             
-            if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
-                await callback_query.answer("❌ Aucun fichier vidéo trouvé", show_alert=True)
-                return
+            if original_filename:
+                download_filename = tagged_filename(user_dir, original_filename, "original")
+            else:
+                download_filename = f"{user_dir}/original.mp4"
             
-            user_dir = f"downloads/{user.id}_{int(time.time())}"
-            os.makedirs(user_dir, exist_ok=True)
+            file_path = await fetch_media(
+                client, msg.reply_to_message,
+                file_name=download_filename,
+                progress=progress_for_pyrogram,
+                progress_args=("Téléchargement...", status_msg, time.time())
+            )
+        except Exception as e:
+            await status_msg.edit(f"❌ Erreur de téléchargement: {str(e)}")
+            return
+
+        try:
+            videoclient = deps.videoclient.with_output(user_dir)
+            original_media_info = await source_media_info(videoclient, msg.reply_to_message, file_path)
+            original_duration = int(original_media_info.duration) if original_media_info and hasattr(original_media_info, 'duration') else 0
+        except Exception as e:
+            log.debug("Erreur lecture infos média originales: %s", e)
+            original_media_info = None
+            original_duration = 0
+
+        trim_instructions = (
+            "✂️ <b>Format attendu</b> : <code>HH:MM:SS-HH:MM:SS</code>\n"
+            f"Durée totale: {seconds_to_timestamp(original_duration)}\n\n"
+            "Exemple :\n"
+            "<code>00:01:30-00:02:45</code> pour une séquence\n"
+            "<code>00:01:30-00:02:45!</code> pour une coupe précise à l'image (réencodage, plus lent)\n\n"
+            "Envoyez maintenant le temps de découpage :"
+        )
+        
+        await status_msg.edit(trim_instructions, force=True)
+        
+        try:
+            response = await wait_reply(
+                user.id, filters.text,
+                timeout=120
+            )
             
-            try:
-                status_msg = await msg.edit("⏳ Téléchargement en cours...")
-            except MessageIdInvalid:
-                status_msg = await msg.reply("⏳ Téléchargement en cours...")
+            # « ! » final : coupe précise à l'image plutôt que sur l'image clé
+            text = response.text.strip()
+            exact = text.endswith("!")
+            match = TIME_RANGE_RE.fullmatch(text.rstrip("!"))
+            if not match:
+                await status_msg.edit("❌ Format incorrect. Utilisez HH:MM:SS-HH:MM:SS")
+                return
             
-            try:
-                original_filename = None
-                if msg.reply_to_message.document:
-                    original_filename = msg.reply_to_message.document.file_name
-                elif msg.reply_to_message.video:
-                    original_filename = msg.reply_to_message.video.file_name
+            start_time_str, end_time_str = match.groups()
                 
-                if original_filename:
-                    filename_without_ext = os.path.splitext(original_filename)[0]
-                    download_filename = f"{user_dir}/{filename_without_ext}_original{os.path.splitext(original_filename)[1] or '.mp4'}"
-                else:
-                    download_filename = f"{user_dir}/original.mp4"
+            start_time = convert_to_seconds(start_time_str)
+            end_time = convert_to_seconds(end_time_str)
+            
+            await response.delete()
+            
+            if start_time >= end_time:
+                await status_msg.edit("❌ Le temps de fin doit être après le temps de début")
+                return
                 
-                file_path = await msg.reply_to_message.download(
-                    file_name=download_filename,
-                    progress=progress_for_pyrogram,
-                    progress_args=("Téléchargement...", status_msg, time.time())
-                )
-            except Exception as e:
-                await status_msg.edit(f"❌ Erreur de téléchargement: {str(e)}")
-                try:
-                    os.rmdir(user_dir)
-                except:
-                    pass
+            if original_duration > 0 and end_time > original_duration:
+                await status_msg.edit(f"❌ La fin ({end_time_str}) dépasse la durée totale ({seconds_to_timestamp(original_duration)})")
                 return
-
-            try:
-                videoclient = deps.videoclient
-                original_media_info = await videoclient.get_media_info(file_path)
-                original_duration = int(original_media_info.duration) if original_media_info and hasattr(original_media_info, 'duration') else 0
-            except Exception as e:
-                print(f"⚠️ Erreur lecture infos média originales: {str(e)}")
-                original_duration = 0
-
-            trim_instructions = (
-                "✂️ <b>Format attendu</b> : <code>HH:MM:SS-HH:MM:SS</code>\n"
-                f"Durée totale: {seconds_to_timestamp(original_duration)}\n\n"
-                "Exemple :\n"
-                "<code>00:01:30-00:02:45</code> pour une séquence\n\n"
-                "Envoyez maintenant le temps de découpage :"
+                
+            await status_msg.edit(f"✂️ Découpage de {start_time_str} à {end_time_str}...")
+            
+            result = await videoclient.trim_video(
+                input_path=file_path,
+                output_name="trimmed",
+                start_time=start_time,
+                end_time=end_time,
+                reencode=exact
             )
             
-            await status_msg.edit(trim_instructions)
+            if not result or not os.path.exists(result):
+                await status_msg.edit("❌ Échec du découpage vidéo")
+                return
+                
+            # Pas de mise à l'échelle : mêmes dimensions que la source, durée connue
+            width = getattr(original_media_info, 'width', 0) or 320
+            height = getattr(original_media_info, 'height', 0) or None
+            duration = int(end_time - start_time)
             
             try:
-                response = await client.listen(
-                    filters.text & filters.user(user.id),
-                    timeout=120
-                )
-                
-                if "-" not in response.text:
-                    await status_msg.edit("❌ Format incorrect. Utilisez HH:MM:SS-HH:MM:SS")
-                    return
-                
-                start_time_str, end_time_str = response.text.strip().split("-")
-                
-                def validate_time(time_str):
-                    parts = time_str.split(":")
-                    if len(parts) == 3:  # HH:MM:SS
-                        return True
-                    elif len(parts) == 2:  # MM:SS
-                        return True
-                    return False
-                    
-                if not validate_time(start_time_str) or not validate_time(end_time_str):
-                    await status_msg.edit("❌ Format de temps invalide")
-                    return
-                    
-                start_time = convert_to_seconds(start_time_str)
-                end_time = convert_to_seconds(end_time_str)
-                
-                await response.delete()
-                
-                if start_time >= end_time:
-                    await status_msg.edit("❌ Le temps de fin doit être après le temps de début")
-                    return
-                    
-                if original_duration > 0 and end_time > original_duration:
-                    await status_msg.edit(f"❌ La fin ({end_time_str}) dépasse la durée totale ({seconds_to_timestamp(original_duration)})")
-                    return
-                    
-                await status_msg.edit(f"✂️ Découpage de {start_time_str} à {end_time_str}...")
-                
-                videoclient.output_path = Path(user_dir)
-                
-                result = await videoclient.trim_video(
-                    input_path=file_path,
-                    output_name="trimmed",
-                    start_time=start_time,
-                    end_time=end_time
-                )
-                
-                if not result or not os.path.exists(result):
-                    await status_msg.edit("❌ Échec du découpage vidéo")
-                    return
-                    
-                try:
-                    result_media_info = await videoclient.get_media_info(result)
-                    width = result_media_info.width if result_media_info and hasattr(result_media_info, 'width') else 320
-                    height = result_media_info.height if result_media_info and hasattr(result_media_info, 'height') else None
-                    duration = int(result_media_info.duration) if result_media_info and hasattr(result_media_info, 'duration') else (end_time - start_time)
-                except Exception as e:
-                    print(f"⚠️ Erreur lecture infos média résultat: {str(e)}")
-                    width = 320
-                    height = None
-                    duration = end_time - start_time 
-                
-                try:
+                with open_upload(result) as fh:
                     await client.send_video(
                         chat_id=user.id,
-                        video=result,
+                        video=fh,
+                        file_name=os.path.basename(result),
                         width=width,
                         height=height,
                         duration=duration,
@@ -1049,108 +1337,80 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                         progress=progress_for_pyrogram,
                         progress_args=("Envoi...", status_msg, time.time())
                     )
-                    await asyncio.sleep(1)
-                except Exception as send_error:
-                    await status_msg.edit(f"❌ Erreur d'envoi: {str(send_error)}")
-                    await client.send_message(
-                        chat_id=user.id,
-                        text=f"❌ Impossible d'envoyer la vidéo: {str(send_error)}"
-                    )
-                finally:
-                    try:
-                        os.remove(result)
-                    except Exception as clean_error:
-                        print(f"Erreur suppression fichier: {str(clean_error)}")
-                
-                await status_msg.delete()
-                
-            except asyncio.TimeoutError:
-                await status_msg.edit("❌ Temps écoulé (120s)")
-            except Exception as e:
-                await status_msg.edit(f"❌ Erreur: {str(e)}")
+            except Exception as send_error:
+                await status_msg.edit(f"❌ Erreur d'envoi: {str(send_error)}")
                 await client.send_message(
                     chat_id=user.id,
-                    text=f"❌ Échec du découpage: {str(e)}"
+                    text=f"❌ Impossible d'envoyer la vidéo: {str(send_error)}"
                 )
-        finally:
-            try:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                for root, _, files in os.walk(user_dir):
-                    for file in files:
-                        try:
-                            os.remove(os.path.join(root, file))
-                        except:
-                            pass
-                os.rmdir(user_dir)
-            except Exception as e:
-                print(f"Erreur nettoyage: {str(e)}")
-    
-    
-    elif data == "video_merge":
-        try:
-            await callback_query.answer("⏳ Fusion vidéo en préparation...")
-            
-            if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
-                await callback_query.answer("❌ Répondez à une vidéo pour commencer", show_alert=True)
-                return
-            
-            user_dir = f"downloads/{user.id}_{int(time.time())}"
-            os.makedirs(user_dir, exist_ok=True)
+            finally:
+                await unlink_file(result)
             
-            try:
-                status_msg = await msg.edit("⏳ Téléchargement de la première vidéo...")
-            except MessageIdInvalid:
-                status_msg = await msg.reply("⏳ Téléchargement de la première vidéo...")
+            await status_msg.delete()
             
-            try:
-                original_filename = None
-                if msg.reply_to_message.document:
-                    original_filename = msg.reply_to_message.document.file_name
-                elif msg.reply_to_message.video:
-                    original_filename = msg.reply_to_message.video.file_name
-                
-                if original_filename:
-                    filename_without_ext = os.path.splitext(original_filename)[0]
-                    first_video_path = f"{user_dir}/{filename_without_ext}_0{os.path.splitext(original_filename)[1] or '.mp4'}"
-                else:
-                    first_video_path = f"{user_dir}/video_0.mp4"
-                
-                first_video_path = await msg.reply_to_message.download(
-                    file_name=first_video_path,
-                    progress=progress_for_pyrogram,
-                    progress_args=("Téléchargement vidéo 1...", status_msg, time.time())
-                )
-            except Exception as e:
-                await status_msg.edit(f"❌ Erreur de téléchargement: {str(e)}")
-                try:
-                    os.rmdir(user_dir)
-                except:
-                    pass
-                return
+        except asyncio.TimeoutError:
+            await status_msg.edit("❌ Temps écoulé (120s)")
+        except Exception as e:
+            await status_msg.edit(f"❌ Erreur: {str(e)}")
+            await client.send_message(
+                chat_id=user.id,
+                text=f"❌ Échec du découpage: {str(e)}"
+            )
+
+async def cb_video_merge(client: Client, callback_query: CallbackQuery, data: str, user, msg):
+    await callback_query.answer("⏳ Fusion vidéo en préparation...")
+        
+    if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
+        await callback_query.answer("❌ Répondez à une vidéo pour commencer", show_alert=True)
+        return
+    
+    async with job_workspace(user.id, msg.reply_to_message) as user_dir:
+        try:
+            status_msg = SmartStatus(await msg.edit("⏳ Téléchargement de la première vidéo..."))
+        except MessageIdInvalid:
+            status_msg = SmartStatus(await msg.reply("⏳ Téléchargement de la première vidéo..."))
+        
+        try:
+            original_filename = None
+            if msg.reply_to_message.document:
+                original_filename = msg.reply_to_message.document.file_name
+            elif msg.reply_to_message.video:
+                original_filename = msg.reply_to_message.video.file_name
+        
+            if original_filename:
+                first_video_path = tagged_filename(user_dir, original_filename, 0)
+            else:
+                first_video_path = f"{user_dir}/video_0.mp4"
 
+            # Les vidéos se téléchargent en arrière-plan pendant que l'utilisateur
+            # envoie les suivantes ; on ne les attend qu'au moment de fusionner
             users_operations[user.id] = {
-                'dir': user_dir,
                 'video_paths': [first_video_path],
+                'download_tasks': [asyncio.create_task(
+                    fetch_media(client, msg.reply_to_message, file_name=first_video_path)
+                )],
                 'status_msg': status_msg,
-                'original_filenames': [original_filename] if original_filename else []
+                # Lignes de la liste affichée, complétée à chaque vidéo reçue
+                'video_lines': [f"1. {original_filename or os.path.basename(first_video_path)}"]
             }
-            
+        
             await status_msg.edit(
                 "📹 <b>Fusion vidéo</b>\n\n"
-                f"1. {original_filename or os.path.basename(first_video_path)} (vidéo de départ)\n\n"
+                f"{users_operations[user.id]['video_lines'][0]} (vidéo de départ)\n\n"
                 "Envoyez maintenant les autres vidéos à fusionner (une par message)\n\n"
                 "Tapez /done quand vous avez terminé\n"
-                "Tapez /cancel pour annuler"
+                "Tapez /cancel pour annuler",
+                force=True
             )
-            
+        
+            clip_messages = []
             while True:
                 try:
-                    response = await client.listen(
-                        filters=(filters.video | filters.document | filters.text) & filters.user(user.id),
+                    response = await wait_reply(
+                        user.id, VIDEO_OR_TEXT,
                         timeout=120
                     )
-                    
+                
                     if response.text:
                         if "/done" in response.text:
                             if len(users_operations[user.id]['video_paths']) < 2:
@@ -1161,82 +1421,91 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                             await status_msg.edit("❌ Fusion annulée")
                             return
                         continue
-                    
+                
                     try:
-                        video_num = len(users_operations[user.id]['video_paths'])
+                        operation = users_operations[user.id]
+                        video_num = len(operation['video_paths'])
                         original_filename = None
                         if response.document:
                             original_filename = response.document.file_name
                         elif response.video:
                             original_filename = response.video.file_name
-                        
+                    
                         if original_filename:
-                            filename_without_ext = os.path.splitext(original_filename)[0]
-                            new_video_path = f"{user_dir}/{filename_without_ext}_{video_num}{os.path.splitext(original_filename)[1] or '.mp4'}"
+                            new_video_path = tagged_filename(user_dir, original_filename, video_num)
                         else:
                             new_video_path = f"{user_dir}/video_{video_num}.mp4"
-                        
-                        new_video_path = await response.download(
-                            file_name=new_video_path,
-                            progress=progress_for_pyrogram,
-                            progress_args=(f"Téléchargement vidéo {video_num+1}...", status_msg, time.time())
-                        )
-                        users_operations[user.id]['video_paths'].append(new_video_path)
-                        if original_filename:
-                            users_operations[user.id]['original_filenames'].append(original_filename)
-                        
-                        await response.delete()
-                        
-                        video_list = "\n".join(
-                            f"{i+1}. {users_operations[user.id]['original_filenames'][i] if i < len(users_operations[user.id]['original_filenames']) else os.path.basename(p)}"
-                            for i, p in enumerate(users_operations[user.id]['video_paths'])
+                    
+                        operation['download_tasks'].append(asyncio.create_task(
+                            fetch_media(client, response, file_name=new_video_path)
+                        ))
+                        operation['video_paths'].append(new_video_path)
+                        operation['video_lines'].append(
+                            f"{video_num + 1}. {original_filename or os.path.basename(new_video_path)}"
                         )
+                        # Supprimé une fois téléchargé, pas avant
+                        clip_messages.append(response)
+                    
                         await status_msg.edit(
-                            f"📹 <b>Vidéos à fusionner ({len(users_operations[user.id]['video_paths'])})</b>\n\n"
-                            f"{video_list}\n\n"
+                            f"📹 <b>Vidéos à fusionner ({video_num + 1})</b>\n\n"
+                            + "\n".join(operation['video_lines']) +
+                            "\n\n"
                             "Envoyez d'autres vidéos ou tapez /done pour continuer\n"
                             "Tapez /cancel pour annuler"
                         )
-                        
+                    
                     except Exception as e:
                         await status_msg.edit(f"❌ Erreur de téléchargement: {str(e)}")
                         continue
-                        
+                    
                 except asyncio.TimeoutError:
                     await status_msg.edit("⌛ Temps écoulé - opération annulée")
                     return
             await response.delete()
 
+            await status_msg.edit("⏳ Fin des téléchargements...")
+            downloads = await asyncio.gather(*users_operations[user.id]['download_tasks'], return_exceptions=True)
+            await asyncio.gather(*(m.delete() for m in clip_messages), return_exceptions=True)
+            users_operations[user.id]['video_paths'] = [
+                path for path in downloads if not isinstance(path, BaseException)
+            ]
+            if len(users_operations[user.id]['video_paths']) < 2:
+                failed = next(path for path in downloads if isinstance(path, BaseException))
+                await status_msg.edit(f"❌ Erreur de téléchargement: {str(failed)}")
+                return
+
             await status_msg.edit(
                     "🛠 <b>Choisissez l'extension de sortie :</b>\n\n"
                     "Options disponibles : `MP4` `MKV` `AVI` \n\n"
                     "Envoyer `!annuler` pour annuler\n\n"
-                    "Répondez avec le nom du format souhaité :"
+                    "Répondez avec le nom du format souhaité :",
+                    force=True
                 )
             try:
-                format_response = await client.listen(
-                    filters.text & filters.user(user.id),
+                format_response = await wait_reply(
+                    user.id, filters.text,
                     timeout=60
                 )
-                
+            
                 if format_response.text == "!annuler":
                     await status_msg.edit("❌ Fusion annulée")
                     return
-                    
-                output_format = MediaType(format_response.text.lower())
                 
+                output_format = MediaType(format_response.text.lower())
+            
                 await format_response.delete()
-                
+            
                 await status_msg.edit(
                     "⏳ <b>Durée de transition entre les vidéos (en secondes) :</b>\n\n"
-                    "Entrez un nombre entre 0 et 5 (0 pour pas de transition) :"
+                    "Entrez un nombre entre 0 et 5 (0 pour pas de transition) :",
+                    force=True
                 )
-                
-                transition_response = await client.listen(
-                    filters.text & filters.user(user.id),
+            
+                transition_response = await wait_reply(
+                    user.id, filters.text,
                     timeout=60
                 )
-                
+            
                 try:
                     transition_duration = float(transition_response.text.strip())
                     if transition_duration < 0 or transition_duration > 5:
@@ -1245,46 +1514,45 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                     await status_msg.edit("❌ Durée invalide. Utilisez un nombre entre 0 et 5")
                     return
                 await transition_response.delete()
-                
+            
                 await status_msg.edit("⚙️ Fusion des vidéos en cours...")
-                
-                videoclient = deps.videoclient
-                videoclient.output_path = Path(user_dir)
-                
+            
+                videoclient = deps.videoclient.with_output(user_dir)
                 result = await videoclient.concat_video(
                     input_paths=users_operations[user.id]['video_paths'],
                     output_name="merged",
                     output_format=output_format,
                     transition_duration=transition_duration
                 )
-                
+            
                 if not result or not os.path.exists(result):
                     await status_msg.edit("❌ Échec de la fusion des vidéos")
                     return
-                    
+                
                 try:
                     result_media_info = await videoclient.get_media_info(result)
                     width = result_media_info.width if result_media_info and hasattr(result_media_info, 'width') else 1280
                     height = result_media_info.height if result_media_info and hasattr(result_media_info, 'height') else 720
                     duration = int(result_media_info.duration) if result_media_info and hasattr(result_media_info, 'duration') else 0
                 except Exception as e:
-                    print(f"⚠️ Erreur lecture infos média résultat: {str(e)}")
+                    log.debug("Erreur lecture infos média résultat: %s", e)
                     width = 1280
                     height = 720
                     duration = 0
-                
+            
                 try:
-                    await client.send_video(
-                        chat_id=user.id,
-                        video=result,
-                        width=width,
-                        height=height,
-                        duration=duration,
-                        caption=f"📼 Vidéo fusionnée ({len(users_operations[user.id]['video_paths'])} clips)",
-                        progress=progress_for_pyrogram,
-                        progress_args=("Envoi...", status_msg, time.time())
-                    )
-                    await asyncio.sleep(1)
+                    with open_upload(result) as fh:
+                        await client.send_video(
+                            chat_id=user.id,
+                            video=fh,
+                            file_name=os.path.basename(result),
+                            width=width,
+                            height=height,
+                            duration=duration,
+                            caption=f"📼 Vidéo fusionnée ({len(users_operations[user.id]['video_paths'])} clips)",
+                            progress=progress_for_pyrogram,
+                            progress_args=("Envoi...", status_msg, time.time())
+                        )
                 except Exception as send_error:
                     await status_msg.edit(f"❌ Erreur d'envoi: {str(send_error)}")
                     await client.send_message(
@@ -1292,15 +1560,12 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                         text=f"❌ Impossible d'envoyer la vidéo: {str(send_error)}"
                     )
                 finally:
-                    try:
-                        os.remove(result)
-                    except Exception as clean_error:
-                        print(f"Erreur suppression fichier: {str(clean_error)}")
-                
+                    await unlink_file(result)
+            
                 await status_msg.edit("✅ Fusion terminée avec succès!")
                 await asyncio.sleep(2)
                 await status_msg.delete()
-                
+            
             except asyncio.TimeoutError:
                 await status_msg.edit("⌛ Temps écoulé - opération annulée")
             except Exception as e:
@@ -1310,303 +1575,236 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                     text=f"❌ Échec de la fusion: {str(e)}"
                 )
         finally:
-            if user.id in users_operations:
-                try:
-                    for path in users_operations[user.id]['video_paths']:
-                        try:
-                            os.remove(path)
-                        except:
-                            pass
-                    if os.path.exists(user_dir):
-                        for root, _, files in os.walk(user_dir):
-                            for file in files:
-                                try:
-                                    os.remove(os.path.join(root, file))
-                                except:
-                                    pass
-                        os.rmdir(user_dir)
-                except Exception as e:
-                    print(f"Erreur nettoyage: {str(e)}")
-                finally:
-                    del users_operations[user.id]
-
-    elif data == "video_split":
-        def validate_time(time_str):
-            parts = time_str.split(":")
-            if len(parts) == 3:  # HH:MM:SS
-                return all(p.isdigit() for p in parts)
-            elif len(parts) == 2:  # MM:SS
-                return all(p.isdigit() for p in parts)
-            return False
-
-        def convert_to_seconds(time_str):
-            parts = list(map(int, time_str.split(":")))
-            if len(parts) == 3:  # HH:MM:SS
-                return parts[0] * 3600 + parts[1] * 60 + parts[2]
-            elif len(parts) == 2:  # MM:SS
-                return parts[0] * 60 + parts[1]
-            return 0
-
-        def seconds_to_timestamp(seconds):
-            hours = seconds // 3600
-            minutes = (seconds % 3600) // 60
-            seconds = seconds % 60
-            return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-
+            operation = users_operations.pop(user.id, None)
+            if operation:
+                for task in operation['download_tasks']:
+                    task.cancel()
+                # Téléchargements arrêtés avant que le dossier ne soit vidé et remis en commun
+                await asyncio.gather(*operation['download_tasks'], return_exceptions=True)
+
+async def cb_video_split(client: Client, callback_query: CallbackQuery, data: str, user, msg):
+    await callback_query.answer("⏳ Découpage vidéo en préparation...")
+        
+    if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
+        await callback_query.answer("❌ Aucun fichier vidéo trouvé", show_alert=True)
+        return
+    
+    async with job_workspace(user.id, msg.reply_to_message) as user_dir:
+        
         try:
-            await callback_query.answer("⏳ Découpage vidéo en préparation...")
-            
-            if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
-                await callback_query.answer("❌ Aucun fichier vidéo trouvé", show_alert=True)
-                return
-            
-            user_dir = f"downloads/{user.id}_{int(time.time())}"
-            os.makedirs(user_dir, exist_ok=True)
-            
-            try:
-                status_msg = await msg.edit("⏳ Téléchargement en cours...")
-            except MessageIdInvalid:
-                status_msg = await msg.reply("⏳ Téléchargement en cours...")
+            status_msg = SmartStatus(await msg.edit("⏳ Téléchargement en cours..."))
+        except MessageIdInvalid:
+            status_msg = SmartStatus(await msg.reply("⏳ Téléchargement en cours..."))
+        
+        try:
+            original_filename = None
+            if msg.reply_to_message.document:
+                original_filename = msg.reply_to_message.document.file_name
+            elif msg.reply_to_message.video:
+                original_filename = msg.reply_to_message.video.file_name
             
-            try:
-                original_filename = None
-                if msg.reply_to_message.document:
-                    original_filename = msg.reply_to_message.document.file_name
-                elif msg.reply_to_message.video:
-                    original_filename = msg.reply_to_message.video.file_name
-                
-                download_filename = f"{user_dir}/{original_filename or 'original.mp4'}"
-                file_path = await msg.reply_to_message.download(
-                    file_name=download_filename,
-                    progress=progress_for_pyrogram,
-                    progress_args=("Téléchargement...", status_msg, time.time())
-                )
-            except Exception as e:
-                await status_msg.edit(f"❌ Erreur de téléchargement: {str(e)}")
-                try:
-                    os.rmdir(user_dir)
-                except:
-                    pass
-                return
+            download_filename = f"{user_dir}/{original_filename or 'original.mp4'}"
+            file_path = await fetch_media(
+                client, msg.reply_to_message,
+                file_name=download_filename,
+                progress=progress_for_pyrogram,
+                progress_args=("Téléchargement...", status_msg, time.time())
+            )
+        except Exception as e:
+            await status_msg.edit(f"❌ Erreur de téléchargement: {str(e)}")
+            return
 
-            try:
-                videoclient = deps.videoclient
-                media_info = await videoclient.get_media_info(file_path)
-                total_duration = int(media_info.duration) if media_info else 0
-            except Exception as e:
-                print(f"⚠️ Erreur lecture durée: {str(e)}")
-                total_duration = 0
-
-            cut_instructions = (
-                "✂️ <b>Format attendu</b> : <code>HH:MM:SS-HH:MM:SS</code>\n"
-                f"Durée totale: {seconds_to_timestamp(total_duration)}\n\n"
-                "Exemple :\n"
-                "<code>00:01:30-00:02:45</code> pour un segment\n\n"
-                "Envoyez les plages séparées par des virgules :"
+        try:
+            videoclient = deps.videoclient.with_output(user_dir)
+            media_info = await source_media_info(videoclient, msg.reply_to_message, file_path)
+            total_duration = int(media_info.duration) if media_info else 0
+        except Exception as e:
+            log.debug("Erreur lecture durée: %s", e)
+            media_info = None
+            total_duration = 0
+
+        cut_instructions = (
+            "✂️ <b>Format attendu</b> : <code>HH:MM:SS-HH:MM:SS</code>\n"
+            f"Durée totale: {seconds_to_timestamp(total_duration)}\n\n"
+            "Exemple :\n"
+            "<code>00:01:30-00:02:45</code> pour un segment\n\n"
+            "Envoyez les plages séparées par des virgules :"
+        )
+        
+        await status_msg.edit(cut_instructions, force=True)
+        
+        try:
+            response = await wait_reply(
+                user.id, filters.text,
+                timeout=120
             )
             
-            await status_msg.edit(cut_instructions)
-            
-            try:
-                response = await client.listen(
-                    filters.text & filters.user(user.id),
-                    timeout=120
-                )
+            ranges = []
+            for range_str in response.text.strip().split(","):
+                match = TIME_RANGE_RE.fullmatch(range_str)
+                if not match:
+                    await status_msg.edit("❌ Format invalide. Utilisez HH:MM:SS-HH:MM:SS")
+                    return
                 
-                ranges = []
-                for range_str in response.text.strip().split(","):
-                    if "-" not in range_str:
-                        await status_msg.edit("❌ Format invalide. Utilisez HH:MM:SS-HH:MM:SS")
-                        return
-                    
-                    start_str, end_str = range_str.strip().split("-")
-                    
-                    if not all(validate_time(t) for t in [start_str, end_str]):
-                        await status_msg.edit("❌ Format de temps invalide")
-                        return
-                    
-                    start = convert_to_seconds(start_str)
-                    end = convert_to_seconds(end_str)
-                    
-                    if start >= end:
-                        await status_msg.edit("❌ Le temps de fin doit être après le début")
-                        return
-                    
-                    if total_duration > 0 and end > total_duration:
-                        await status_msg.edit(f"❌ La fin dépasse la durée totale ({seconds_to_timestamp(total_duration)})")
-                        return
-                    
-                    ranges.append((start, end))
+                start_str, end_str = match.groups()
                 
-                await response.delete()
+                start = convert_to_seconds(start_str)
+                end = convert_to_seconds(end_str)
                 
-                await status_msg.edit(f"✂️ Découpage de {len(ranges)} segment(s)...")
-                results = await videoclient.split_video(
-                    input_path=file_path,
-                    output_name="segment",
-                    cut_ranges=ranges
-                )
+                if start >= end:
+                    await status_msg.edit("❌ Le temps de fin doit être après le début")
+                    return
                 
-                if not results:
-                    await status_msg.edit("❌ Échec du découpage")
+                if total_duration > 0 and end > total_duration:
+                    await status_msg.edit(f"❌ La fin dépasse la durée totale ({seconds_to_timestamp(total_duration)})")
                     return
                 
-                for i, segment_path in enumerate(results):
-                    if os.path.exists(segment_path):
-                        try:
-                            seg_info = await videoclient.get_media_info(segment_path)
-                            width = seg_info.width if seg_info else 1280
-                            height = seg_info.height if seg_info else 720
-                            duration = int(seg_info.duration) if seg_info else (ranges[i][1] - ranges[i][0])
-                            
+                ranges.append((start, end))
+            
+            await response.delete()
+            
+            await status_msg.edit(f"✂️ Découpage de {len(ranges)} segment(s)...")
+            results = await videoclient.split_video(
+                input_path=file_path,
+                output_name="segment",
+                cut_ranges=ranges
+            )
+            
+            if not results:
+                await status_msg.edit("❌ Échec du découpage")
+                return
+            
+            # Segments sans mise à l'échelle : dimensions de la source, durée de la plage
+            width = getattr(media_info, 'width', 0) or 1280
+            height = getattr(media_info, 'height', 0) or 720
+            
+            # Envois en parallèle, bornés par les transferts simultanés de pyrogram
+            upload_slots = asyncio.Semaphore(deps.config.MAX_CONCURRENT_TRANSMISSIONS)
+
+            # Légende et durée viennent de la plage rendue avec chaque segment
+            async def send_segment(i: int, cut_range: Tuple[float, float], segment_path: Optional[str]):
+                start, end = cut_range
+                if not segment_path:
+                    await status_msg.edit(f"❌ Échec du découpage du segment {i+1}")
+                    return
+                if not os.path.exists(segment_path):
+                    return
+                async with upload_slots:
+                    try:
+                        duration = int(end - start)
+                        
+                        with open_upload(segment_path) as fh:
                             await client.send_video(
                                 chat_id=user.id,
-                                video=segment_path,
+                                video=fh,
+                                file_name=os.path.basename(segment_path),
                                 width=width,
                                 height=height,
                                 duration=duration,
-                                caption=f"✂️ Segment {i+1}: {seconds_to_timestamp(ranges[i][0])}-{seconds_to_timestamp(ranges[i][1])}",
+                                caption=f"✂️ Segment {i+1}: {seconds_to_timestamp(start)}-{seconds_to_timestamp(end)}",
                                 progress=progress_for_pyrogram,
                                 progress_args=(f"Envoi segment {i+1}...", status_msg, time.time())
                             )
-                            await asyncio.sleep(1)
-                        except Exception as e:
-                            await status_msg.edit(f"❌ Erreur envoi segment {i+1}: {str(e)}")
-                        finally:
-                            try:
-                                os.remove(segment_path)
-                            except:
-                                pass
-                
-                await status_msg.edit("✅ Découpage terminé!")
-                await asyncio.sleep(2)
-                await status_msg.delete()
-                
-            except asyncio.TimeoutError:
-                await status_msg.edit("⌛ Temps écoulé")
-            except Exception as e:
-                await status_msg.edit(f"❌ Erreur: {str(e)}")
-                
-        finally:
-            try:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                for root, _, files in os.walk(user_dir):
-                    for file in files:
-                        try:
-                            os.remove(os.path.join(root, file))
-                        except:
-                            pass
-                os.rmdir(user_dir)
-            except Exception as e:
-                print(f"Erreur nettoyage: {str(e)}")
+                    except Exception as e:
+                        await status_msg.edit(f"❌ Erreur envoi segment {i+1}: {str(e)}")
+                    finally:
+                        await unlink_file(segment_path)
+
+            await asyncio.gather(*(
+                send_segment(i, cut_range, path) for i, (cut_range, path) in enumerate(results)
+            ))
+            
+            await status_msg.edit("✅ Découpage terminé!")
+            await asyncio.sleep(2)
+            await status_msg.delete()
+            
+        except asyncio.TimeoutError:
+            await status_msg.edit("⌛ Temps écoulé")
+        except Exception as e:
+            await status_msg.edit(f"❌ Erreur: {str(e)}")
+
+async def cb_generate_thumbnail(client: Client, callback_query: CallbackQuery, data: str, user, msg):
+    await callback_query.answer("⏳ Préparation de la miniature...")
+        
+    # Vérification du fichier source
+    if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
+        await callback_query.answer("❌ Aucun fichier vidéo trouvé", show_alert=True)
+        return
+        
+    # Création du dossier utilisateur
     
-    elif data == "generate_thumbnail":
+    async with job_workspace(user.id, msg.reply_to_message) as user_dir:
+        
+        # Téléchargement du fichier
+        try:
+            status_msg = SmartStatus(await msg.edit("⏳ Téléchargement de la vidéo..."))
+        except MessageIdInvalid:
+            status_msg = SmartStatus(await msg.reply("⏳ Téléchargement de la vidéo..."))
+        
+        try:
+            file_path = await fetch_media(
+                client, msg.reply_to_message,
+                file_name=f"{user_dir}/source_video.mp4",
+                progress=progress_for_pyrogram,
+                progress_args=("Téléchargement...", status_msg, time.time())
+            )
+        except Exception as e:
+            await status_msg.edit(f"❌ Erreur de téléchargement: {str(e)}")
+            return
+
+        # Demande des paramètres de la miniature
+        thumbnail_instructions = (
+            "🖼 <b>Paramètres de la miniature</b>\n\n"
+            "1. <b>Position temporelle</b> (format HH:MM:SS)\n"
+            "Exemple: <code>00:01:30</code> pour 1 minute 30 secondes\n\n"
+            "2. <b>Largeur</b> (en pixels, entre 100 et 1280)\n\n"
+            "Répondez avec les valeurs séparées par un espace, exemple:\n"
+            "<code>00:01:30 640</code>"
+        )
+        
+        await status_msg.edit(thumbnail_instructions, force=True)
+        
         try:
-            await callback_query.answer("⏳ Préparation de la miniature...")
+            # Attente de la réponse utilisateur
+            response = await wait_reply(
+                user.id, filters.text,
+                timeout=120
+            )
             
-            # Vérification du fichier source
-            if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
-                await callback_query.answer("❌ Aucun fichier vidéo trouvé", show_alert=True)
+            # Traitement de la réponse : "HH:MM:SS [largeur]" ou "MM:SS [largeur]"
+            match = THUMBNAIL_ARGS_RE.fullmatch(response.text)
+            if not match:
+                await status_msg.edit("❌ Format incorrect. Utilisez: HH:MM:SS [largeur]")
+                return
+            time_offset, width = match.group(1), int(match.group(2) or 320)
+            if not 100 <= width <= 1280:
+                await status_msg.edit("❌ Largeur invalide (doit être entre 100 et 1280)")
                 return
             
-            # Création du dossier utilisateur
-            user_dir = f"downloads/{user.id}_{int(time.time())}"
-            os.makedirs(user_dir, exist_ok=True)
+            await response.delete()
             
-            # Téléchargement du fichier
-            try:
-                status_msg = await msg.edit("⏳ Téléchargement de la vidéo...")
-            except MessageIdInvalid:
-                status_msg = await msg.reply("⏳ Téléchargement de la vidéo...")
+            # Génération de la miniature
+            await status_msg.edit(f"⚙️ Génération de la miniature à {time_offset}...")
             
-            try:
-                file_path = await msg.reply_to_message.download(
-                    file_name=f"{user_dir}/source_video.mp4",
-                    progress=progress_for_pyrogram,
-                    progress_args=("Téléchargement...", status_msg, time.time())
-                )
-            except Exception as e:
-                await status_msg.edit(f"❌ Erreur de téléchargement: {str(e)}")
-                try:
-                    os.rmdir(user_dir)
-                except:
-                    pass
-                return
-
-            # Demande des paramètres de la miniature
-            thumbnail_instructions = (
-                "🖼 <b>Paramètres de la miniature</b>\n\n"
-                "1. <b>Position temporelle</b> (format HH:MM:SS)\n"
-                "Exemple: <code>00:01:30</code> pour 1 minute 30 secondes\n\n"
-                "2. <b>Largeur</b> (en pixels, entre 100 et 1280)\n\n"
-                "Répondez avec les valeurs séparées par un espace, exemple:\n"
-                "<code>00:01:30 640</code>"
+            videoclient = deps.videoclient.with_output(user_dir)
+            result = await videoclient.generate_thumbnail(
+                input_path=file_path,
+                output_name="thumbnail",
+                time_offset=time_offset,
+                width=width,
+                # décodage matériel seulement si un GPU a été détecté
+                hwaccel=deps.hwaccel if videoclient.hw_encoder else None
             )
             
-            await status_msg.edit(thumbnail_instructions)
-            
-            try:
-                # Attente de la réponse utilisateur
-                response = await client.listen(
-                    filters.text & filters.user(user.id),
-                    timeout=120
-                )
+            if not result:
+                await status_msg.edit("❌ Échec de la génération de la miniature")
+                return
                 
-                # Traitement de la réponse
-                parts = response.text.strip().split()
-                if len(parts) == 1:
-                    time_offset = parts[0]
-                    width = 320  # Valeur par défaut
-                elif len(parts) == 2:
-                    time_offset, width = parts
-                    try:
-                        width = int(width)
-                        if not 100 <= width <= 1280:
-                            raise ValueError
-                    except ValueError:
-                        await status_msg.edit("❌ Largeur invalide (doit être entre 100 et 1280)")
-                        return
-                else:
-                    await status_msg.edit("❌ Format incorrect. Utilisez: HH:MM:SS [largeur]")
-                    return
-                
-                # Validation du format temporel
-                def validate_time(time_str):
-                    parts = time_str.split(":")
-                    if len(parts) == 3:  # HH:MM:SS
-                        return True
-                    elif len(parts) == 2:  # MM:SS
-                        return True
-                    return False
-                    
-                if not validate_time(time_offset):
-                    await status_msg.edit("❌ Format de temps invalide. Utilisez HH:MM:SS")
-                    return
-                
-                await response.delete()
-                
-                # Génération de la miniature
-                await status_msg.edit(f"⚙️ Génération de la miniature à {time_offset}...")
-                
-                videoclient = deps.videoclient
-                videoclient.output_path = Path(user_dir)
-                
-                result = await videoclient.generate_thumbnail(
-                    input_path=file_path,
-                    output_name="thumbnail",
-                    time_offset=time_offset,
-                    width=width
-                )
-                
-                if not result:
-                    await status_msg.edit("❌ Échec de la génération de la miniature")
-                    return
-                    
-                # Envoi du résultat
+            # Envoi du résultat
+            with open_upload(result) as fh:
                 await client.send_photo(
                     chat_id=user.id,
-                    photo=result,
+                    photo=fh,
                     caption=(
                         f"🖼 Miniature générée\n"
                         f"⏱ Position: {time_offset}\n"
@@ -1615,128 +1813,111 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                     progress=progress_for_pyrogram,
                     progress_args=("Envoi...", status_msg, time.time())
                 )
-                
-                await status_msg.edit("✅ Miniature générée avec succès!")
-                await asyncio.sleep(2)
-                await status_msg.delete()
-                
-            except asyncio.TimeoutError:
-                await status_msg.edit("⌛ Temps écoulé - opération annulée")
-            except Exception as e:
-                await status_msg.edit(f"❌ Erreur: {str(e)}")
-        finally:
-            # Nettoyage complet
-            try:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                for root, _, files in os.walk(user_dir):
-                    for file in files:
-                        try:
-                            os.remove(os.path.join(root, file))
-                        except:
-                            pass
-                os.rmdir(user_dir)
-            except Exception as e:
-                print(f"Erreur lors du nettoyage: {str(e)}")
-    
-    elif data == "merge_video_audio":
-        try:
-            await callback_query.answer("⏳ Fusion vidéo/audio en préparation...")
+            
+            await status_msg.edit("✅ Miniature générée avec succès!")
+            await asyncio.sleep(2)
+            await status_msg.delete()
+            
+        except asyncio.TimeoutError:
+            await status_msg.edit("⌛ Temps écoulé - opération annulée")
+        except Exception as e:
+            await status_msg.edit(f"❌ Erreur: {str(e)}")
 
-            if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
-                await callback_query.answer("❌ Répondez à une vidéo", show_alert=True)
-                return
+async def cb_merge_video_audio(client: Client, callback_query: CallbackQuery, data: str, user, msg):
+    await callback_query.answer("⏳ Fusion vidéo/audio en préparation...")
 
-            user_dir = f"downloads/{user.id}_{int(time.time())}"
-            os.makedirs(user_dir, exist_ok=True)
+    if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
+        await callback_query.answer("❌ Répondez à une vidéo", show_alert=True)
+        return
+    
+    async with job_workspace(user.id, msg.reply_to_message) as user_dir:
 
-            try:
-                status_msg = await msg.edit("⏳ Téléchargement de la vidéo...")
-            except MessageIdInvalid:
-                status_msg = await msg.reply("⏳ Téléchargement de la vidéo...")
+        try:
+            status_msg = SmartStatus(await msg.edit("⏳ Téléchargement de la vidéo..."))
+        except MessageIdInvalid:
+            status_msg = SmartStatus(await msg.reply("⏳ Téléchargement de la vidéo..."))
 
-            try:
-                original_filename = None
-                if msg.reply_to_message.document:
-                    original_filename = msg.reply_to_message.document.file_name
-                elif msg.reply_to_message.video:
-                    original_filename = msg.reply_to_message.video.file_name
-
-                video_filename = f"{user_dir}/{original_filename or 'video_source.mp4'}"
-                video_path = await msg.reply_to_message.download(
-                    file_name=video_filename,
-                    progress=progress_for_pyrogram,
-                    progress_args=("Téléchargement vidéo...", status_msg, time.time())
-                )
-            except Exception as e:
-                await status_msg.edit(f"❌ Erreur de téléchargement vidéo: {str(e)}")
-                try:
-                    os.rmdir(user_dir)
-                except:
-                    pass
-                return
+        try:
+            original_filename = None
+            if msg.reply_to_message.document:
+                original_filename = msg.reply_to_message.document.file_name
+            elif msg.reply_to_message.video:
+                original_filename = msg.reply_to_message.video.file_name
 
-            await status_msg.edit(
-                "🎵 <b>Maintenant envoyez le fichier audio</b>\n\n"
-                "Format supporté: MP3, AAC, WAV\n\n"
-                "Tapez /cancel pour annuler"
+            video_filename = f"{user_dir}/{original_filename or 'video_source.mp4'}"
+            video_path = await fetch_media(
+                client, msg.reply_to_message,
+                file_name=video_filename,
+                progress=progress_for_pyrogram,
+                progress_args=("Téléchargement vidéo...", status_msg, time.time())
             )
+        except Exception as e:
+            await status_msg.edit(f"❌ Erreur de téléchargement vidéo: {str(e)}")
+            return
 
-            try:
-                audio_response = await client.listen(
-                    filters=(filters.audio | filters.document | filters.text) & filters.user(user.id),
-                    timeout=120
-                )
+        await status_msg.edit(
+            "🎵 <b>Maintenant envoyez le fichier audio</b>\n\n"
+            "Format supporté: MP3, AAC, WAV\n\n"
+            "Tapez /cancel pour annuler",
+            force=True
+        )
 
-                if audio_response.text and "/cancel" in audio_response.text:
-                    await status_msg.edit("❌ Fusion annulée")
-                    return
+        try:
+            audio_response = await wait_reply(
+                user.id, AUDIO_OR_TEXT,
+                timeout=120
+            )
 
-                await status_msg.edit("⏳ Téléchargement de l'audio...")
+            if audio_response.text and "/cancel" in audio_response.text:
+                await status_msg.edit("❌ Fusion annulée")
+                return
 
-                audio_original_name = None
-                if audio_response.document:
-                    audio_original_name = audio_response.document.file_name
-                elif audio_response.audio:
-                    audio_original_name = audio_response.audio.file_name
+            await status_msg.edit("⏳ Téléchargement de l'audio...")
 
-                audio_filename = f"{user_dir}/{audio_original_name or 'audio_source.mp3'}"
-                audio_path = await audio_response.download(
-                    file_name=audio_filename,
-                    progress=progress_for_pyrogram,
-                    progress_args=("Téléchargement audio...", status_msg, time.time())
-                )
+            audio_original_name = None
+            if audio_response.document:
+                audio_original_name = audio_response.document.file_name
+            elif audio_response.audio:
+                audio_original_name = audio_response.audio.file_name
 
-                await audio_response.delete()
+            audio_filename = f"{user_dir}/{audio_original_name or 'audio_source.mp3'}"
+            audio_path = await fetch_media(
+                client, audio_response,
+                file_name=audio_filename,
+                progress=progress_for_pyrogram,
+                progress_args=("Téléchargement audio...", status_msg, time.time())
+            )
 
-                await status_msg.edit("⚙️ Fusion vidéo/audio en cours...")
+            await audio_response.delete()
 
-                videoclient = deps.videoclient
-                videoclient.output_path = Path(user_dir)
+            await status_msg.edit("⚙️ Fusion vidéo/audio en cours...")
 
-                result = await videoclient.merge_video_audio(
-                    video_path=video_path,
-                    audio_path=audio_path,
-                    output_name="merged"
-                )
+            videoclient = deps.videoclient.with_output(user_dir)
+            result = await videoclient.merge_video_audio(
+                video_path=video_path,
+                audio_path=audio_path,
+                output_name="merged"
+            )
 
-                if not result or not os.path.exists(result):
-                    await status_msg.edit("❌ Échec de la fusion")
-                    return
+            if not result or not os.path.exists(result):
+                await status_msg.edit("❌ Échec de la fusion")
+                return
 
-                # Obtenir les infos de la vidéo fusionnée
-                try:
-                    media_info = await videoclient.get_media_info(result)
-                    width = media_info.width if media_info else 1280
-                    height = media_info.height if media_info else 720
-                    duration = int(media_info.duration) if media_info else 0
-                except Exception as e:
-                    print(f"⚠️ Erreur lecture info fusionnée: {str(e)}")
-                    width, height, duration = 1280, 720, 0
+            # Obtenir les infos de la vidéo fusionnée
+            try:
+                media_info = await videoclient.get_media_info(result)
+                width = media_info.width if media_info else 1280
+                height = media_info.height if media_info else 720
+                duration = int(media_info.duration) if media_info else 0
+            except Exception as e:
+                log.debug("Erreur lecture info fusionnée: %s", e)
+                width, height, duration = 1280, 720, 0
 
+            with open_upload(result) as fh:
                 await client.send_video(
                     chat_id=user.id,
-                    video=result,
+                    video=fh,
+                    file_name=os.path.basename(result),
                     width=width,
                     height=height,
                     duration=duration,
@@ -1745,91 +1926,60 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                     progress_args=("Envoi...", status_msg, time.time())
                 )
 
-                await status_msg.edit("✅ Fusion terminée avec succès!")
-                await asyncio.sleep(2)
-                await status_msg.delete()
-
-            except asyncio.TimeoutError:
-                await status_msg.edit("⌛ Temps écoulé - opération annulée")
-            except Exception as e:
-                await status_msg.edit(f"❌ Erreur: {str(e)}")
-        finally:
-            try:
-                for file in [video_path, audio_path, result]:
-                    try:
-                        if file and os.path.exists(file):
-                            os.remove(file)
-                    except:
-                        pass
-                if os.path.exists(user_dir):
-                    for root, _, files in os.walk(user_dir):
-                        for file in files:
-                            try:
-                                os.remove(os.path.join(root, file))
-                            except:
-                                pass
-                    os.rmdir(user_dir)
-            except Exception as e:
-                print(f"Erreur nettoyage: {str(e)}")
-    
-    elif data == "remove_audio":
-        try:
-            await callback_query.answer("⏳ Suppression de l'audio en cours...")
+            await status_msg.edit("✅ Fusion terminée avec succès!")
+            await asyncio.sleep(2)
+            await status_msg.delete()
 
-            if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
-                await callback_query.answer("❌ Aucun fichier vidéo trouvé", show_alert=True)
-                return
+        except asyncio.TimeoutError:
+            await status_msg.edit("⌛ Temps écoulé - opération annulée")
+        except Exception as e:
+            await status_msg.edit(f"❌ Erreur: {str(e)}")
 
-            user_dir = f"downloads/{user.id}_{int(time.time())}"
-            os.makedirs(user_dir, exist_ok=True)
+async def cb_remove_audio(client: Client, callback_query: CallbackQuery, data: str, user, msg):
+    await callback_query.answer("⏳ Suppression de l'audio en cours...")
 
+    if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
+        await callback_query.answer("❌ Aucun fichier vidéo trouvé", show_alert=True)
+        return
+    
+    async with job_workspace(user.id, msg.reply_to_message) as user_dir:
+        try:
             try:
-                status_msg = await msg.edit("⏳ Téléchargement de la vidéo...")
+                status_msg = SmartStatus(await msg.edit("⏳ Téléchargement de la vidéo..."))
             except MessageIdInvalid:
-                status_msg = await msg.reply("⏳ Téléchargement de la vidéo...")
+                status_msg = SmartStatus(await msg.reply("⏳ Téléchargement de la vidéo..."))
 
             try:
                 file_name = msg.reply_to_message.file_name or "original.mp4"
-                input_path = await msg.reply_to_message.download(
+                input_path = await fetch_media(
+                    client, msg.reply_to_message,
                     file_name=f"{user_dir}/{file_name}",
                     progress=progress_for_pyrogram,
                     progress_args=("Téléchargement...", status_msg, time.time())
                 )
             except Exception as e:
                 await status_msg.edit(f"❌ Erreur de téléchargement: {str(e)}")
-                shutil.rmtree(user_dir, ignore_errors=True)
                 return
 
-            await status_msg.edit(
+            confirmed = await ask_confirmation(
+                status_msg, user.id,
                 "🔇 <b>Supprimer l'audio de cette vidéo?</b>\n\n"
-                f"Fichier: <code>{os.path.basename(input_path)}</code>\n\n"
-                "Tapez /cancel pour annuler, /done pour confirmer"
+                f"Fichier: <code>{os.path.basename(input_path)}</code>"
             )
-
-            try:
-                response = await client.listen(filters.text & filters.user(user.id), timeout=60)
-
-                if response.text.strip().lower() == "/cancel":
-                    await status_msg.edit("❌ Opération annulée")
-                    return
-                elif response.text.strip().lower() != "/done":
-                    await status_msg.edit("❌ Réponse invalide. Tapez /done ou /cancel.")
-                    return
-
-            except asyncio.TimeoutError:
+            if confirmed is None:
                 await status_msg.edit("⌛ Temps écoulé - opération annulée")
                 return
-
-            await response.delete()
+            if not confirmed:
+                await status_msg.edit("❌ Opération annulée")
+                return
 
             await status_msg.edit("⚙️ Suppression de l'audio...")
 
-            videoclient = deps.videoclient
-            videoclient.output_path = Path(user_dir)
-
+            videoclient = deps.videoclient.with_output(user_dir)
             result = await videoclient.remove_audio(
                 input_path=input_path,
-                output_name="no_audio"
+                output_name="no_audio",
+                hwaccel=deps.hwaccel
             )
 
             if not result:
@@ -1838,14 +1988,16 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
 
             info = await videoclient.get_media_info(result)
 
-            await client.send_document(
-                chat_id=user.id,
-                document=result,
-                caption=f"🎬 Vidéo sans audio\n\n📄 <code>{os.path.basename(result)}</code>\n\n{info}",
-                force_document=True,
-                progress=progress_for_pyrogram,
-                progress_args=("Envoi...", status_msg, time.time())
-            )
+            with open_upload(result) as fh:
+                await client.send_document(
+                    chat_id=user.id,
+                    document=fh,
+                    file_name=os.path.basename(result),
+                    caption=f"🎬 Vidéo sans audio\n\n📄 <code>{os.path.basename(result)}</code>\n\n{info}",
+                    force_document=True,
+                    progress=progress_for_pyrogram,
+                    progress_args=("Envoi...", status_msg, time.time())
+                )
 
             await status_msg.edit("✅ Audio supprimé avec succès!")
             await asyncio.sleep(2)
@@ -1853,496 +2005,294 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
 
         except Exception as e:
             await status_msg.edit(f"❌ Erreur: {str(e)}")
-        finally:
-            try:
-                shutil.rmtree(user_dir, ignore_errors=True)
-            except Exception as e:
-                print(f"Erreur de nettoyage: {str(e)}")
 
+async def cb_subtitle_extract(client: Client, callback_query: CallbackQuery, data: str, user, msg):
+    await callback_query.answer("⏳ Extraction des sous-titres...")
+        
+    # Vérification du fichier source
+    if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
+        await callback_query.answer("❌ Aucun fichier vidéo trouvé", show_alert=True)
+        return
+        
+    # Création du dossier temporaire
     
-    elif data == "subtitle_extract":
+    async with job_workspace(user.id, msg.reply_to_message) as user_dir:
+        
+        # Téléchargement du fichier
         try:
-            await callback_query.answer("⏳ Extraction des sous-titres...")
-            
-            # Vérification du fichier source
-            if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
-                await callback_query.answer("❌ Aucun fichier vidéo trouvé", show_alert=True)
+            status_msg = SmartStatus(await msg.edit("⏳ Téléchargement de la vidéo..."))
+        except MessageIdInvalid:
+            status_msg = SmartStatus(await msg.reply("⏳ Téléchargement de la vidéo..."))
+        
+        try:
+            input_path = await fetch_media(
+                client, msg.reply_to_message,
+                file_name=f"{user_dir}/original.mp4",
+                progress=progress_for_pyrogram,
+                progress_args=("Téléchargement...", status_msg, time.time())
+            )
+        except Exception as e:
+            await status_msg.edit(f"❌ Erreur de téléchargement: {str(e)}")
+            return
+
+        # Demande de confirmation
+        try:
+            confirmed = await ask_confirmation(
+                status_msg, user.id,
+                "📝 <b>Extraire les sous-titres de cette vidéo?</b>\n\n"
+                f"Fichier: {os.path.basename(input_path)}"
+            )
+            if confirmed is None:
+                await status_msg.edit("⌛ Temps écoulé - opération annulée")
+                return
+            if not confirmed:
+                await status_msg.edit("❌ Opération annulée")
                 return
             
-            # Création du dossier temporaire
-            user_dir = f"downloads/{user.id}_{int(time.time())}"
-            os.makedirs(user_dir, exist_ok=True)
-            
-            # Téléchargement du fichier
-            try:
-                status_msg = await msg.edit("⏳ Téléchargement de la vidéo...")
-            except MessageIdInvalid:
-                status_msg = await msg.reply("⏳ Téléchargement de la vidéo...")
+            # Extraction des sous-titres
+            await status_msg.edit("⚙️ Extraction des sous-titres...")
             
-            try:
-                input_path = await msg.reply_to_message.download(
-                    file_name=f"{user_dir}/original.mp4",
-                    progress=progress_for_pyrogram,
-                    progress_args=("Téléchargement...", status_msg, time.time())
-                )
-            except Exception as e:
-                await status_msg.edit(f"❌ Erreur de téléchargement: {str(e)}")
-                try:
-                    os.rmdir(user_dir)
-                except:
-                    pass
-                return
-
-            # Demande de confirmation
-            await status_msg.edit(
-                "📝 <b>Extraire les sous-titres de cette vidéo?</b>\n\n"
-                f"Fichier: {os.path.basename(input_path)}\n\n"
-                "Tapez /confirm pour continuer ou /cancel pour annuler"
+            videoclient = deps.videoclient.with_output(user_dir)
+            subtitle_files = await videoclient.extract_subtitles(
+                input_path=input_path,
+                output_dir=user_dir,
+                hwaccel=deps.hwaccel
             )
             
-            try:
-                response = await client.listen(
-                    filters.text & filters.user(user.id),
-                    timeout=60
-                )
-                
-                if response.text.strip().lower() == "/cancel":
-                    await status_msg.edit("❌ Opération annulée")
-                    return
-                elif response.text.strip().lower() != "/confirm":
-                    await status_msg.edit("❌ Commande invalide. Opération annulée")
-                    return
-                    
-                await response.delete()
-                
-                # Extraction des sous-titres
-                await status_msg.edit("⚙️ Extraction des sous-titres...")
-                
-                videoclient = deps.videoclient
-                videoclient.output_path = Path(user_dir)
-                
-                subtitle_files = await videoclient.extract_subtitles(
-                    input_path=input_path,
-                    output_dir=user_dir,
-                )
+            if not subtitle_files or not isinstance(subtitle_files, list):
+                await status_msg.edit("❌ Aucun sous-titre trouvé ou erreur d'extraction")
+                return
                 
-                if not subtitle_files or not isinstance(subtitle_files, list):
-                    await status_msg.edit("❌ Aucun sous-titre trouvé ou erreur d'extraction")
-                    return
-                    
-                for sub_file in subtitle_files:
-                    if os.path.exists(sub_file):
+            # Fichiers de quelques Ko : tous envoyés en même temps, supprimés avec le dossier
+            upload_slots = asyncio.Semaphore(deps.config.MAX_CONCURRENT_TRANSMISSIONS)
+
+            async def send_subtitle(sub_file: str):
+                async with upload_slots:
+                    with open_upload(sub_file) as fh:
                         await client.send_document(
                             chat_id=user.id,
-                            document=sub_file,
+                            document=fh,
+                            file_name=os.path.basename(sub_file),
                             caption=f"📝 Sous-titre extrait: {os.path.basename(sub_file)}",
-                            force_document=True,
-                            progress=progress_for_pyrogram,
-                            progress_args=("Envoi...", status_msg, time.time())
+                            force_document=True
                         )
-                        os.remove(sub_file)  
-                        await asyncio.sleep(1)
-                await status_msg.edit("✅ Extraction terminée avec succès!")
-                await asyncio.sleep(2)
-                await status_msg.delete()
-                
-            except asyncio.TimeoutError:
-                await status_msg.edit("⌛ Temps écoulé - opération annulée")
-            except Exception as e:
-                await status_msg.edit(f"❌ Erreur: {str(e)}")
-        finally:
-            # Nettoyage complet
-            try:
-                if 'input_path' in locals() and os.path.exists(input_path):
-                    os.remove(input_path)
-                if 'user_dir' in locals() and os.path.exists(user_dir):
-                    for root, _, files in os.walk(user_dir):
-                        for file in files:
-                            file_path = os.path.join(root, file)
-                            try:
-                                if os.path.exists(file_path):
-                                    os.remove(file_path)
-                            except:
-                                pass
-                    os.rmdir(user_dir)
-            except Exception as e:
-                print(f"Erreur lors du nettoyage: {str(e)}")
-                
-    elif data == "subtitle_add":
-        try:
-            await callback_query.answer("⏳ Ajout de sous-titres en cours...")
-            
-            if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
-                await callback_query.answer("❌ Aucun fichier vidéo trouvé", show_alert=True)
-                return
-            
-            user_dir = f"downloads/{user.id}_{int(time.time())}"
-            os.makedirs(user_dir, exist_ok=True)
-            
-            try:
-                status_msg = await msg.edit("⏳ Téléchargement de la vidéo...")
-            except MessageIdInvalid:
-                status_msg = await msg.reply("⏳ Téléchargement de la vidéo...")
-            
-            try:
-                original_filename = None
-                if msg.reply_to_message.document:
-                    original_filename = msg.reply_to_message.document.file_name
-                elif msg.reply_to_message.video:
-                    original_filename = msg.reply_to_message.video.file_name
-                
-                video_path = await msg.reply_to_message.download(
-                    file_name=f"{user_dir}/{original_filename or 'original.mp4'}",
-                    progress=progress_for_pyrogram,
-                    progress_args=("Téléchargement vidéo...", status_msg, time.time())
-                )
-                
-                videoclient = deps.videoclient
-                media_info = await videoclient.get_media_info(video_path)
-                width = media_info.width if media_info else 1280
-                height = media_info.height if media_info else 720
-                duration = int(media_info.duration) if media_info else 0
-                
-            except Exception as e:
-                await status_msg.edit(f"❌ Erreur de téléchargement vidéo: {str(e)}")
-                try:
-                    os.rmdir(user_dir)
-                except:
-                    pass
-                return
 
-            await status_msg.edit(
-                "📜 <b>Envoyez maintenant le fichier de sous-titres</b>\n\n"
-                f"📹 Vidéo: {original_filename or 'video'}\n"
-                f"📏 Résolution: {width}x{height}\n"
-                f"⏱ Durée: {duration // 60}:{duration % 60:02d}\n\n"
-                "Formats supportés: .srt, .vtt, .ass\n\n"
-                "Tapez /cancel pour annuler"
-            )
+            await status_msg.edit(f"📤 Envoi de {len(subtitle_files)} sous-titre(s)...")
+            await asyncio.gather(*(send_subtitle(f) for f in subtitle_files if os.path.exists(f)))
+            await status_msg.edit("✅ Extraction terminée avec succès!")
+            await asyncio.sleep(2)
+            await status_msg.delete()
             
-            try:
-                subtitle_response = await client.listen(
-                    filters=(filters.document | filters.text) & filters.user(user.id),
-                    timeout=120
-                )
-                
-                if subtitle_response.text and "/cancel" in subtitle_response.text.lower():
-                    await status_msg.edit("❌ Opération annulée")
-                    return
-                    
-                await status_msg.edit("⏳ Téléchargement des sous-titres...")
-                subtitle_path = await subtitle_response.download(
-                    file_name=f"{user_dir}/subtitles.{subtitle_response.document.file_name.split('.')[-1]}",
-                    progress=progress_for_pyrogram,
-                    progress_args=("Téléchargement sous-titres...", status_msg, time.time())
-                )
-                
-                await status_msg.edit("⚙️ Ajout des sous-titres...")
-                videoclient.output_path = Path(user_dir)
-                
-                temp_video = await videoclient.remove_subtitles(
-                    input_path=video_path,
-                    output_name="no_subtitles"
-                )
-                if not temp_video:
-                    await status_msg.edit("❌ Échec du nettoyage des sous-titres existants")
-                    return
-                await subtitle_response.delete()
-                
-                result = await videoclient.add_subtitle(
-                    input_path=temp_video,
-                    sbt_file=subtitle_path,
-                    language="french",
-                    output_name="final_output",
-                    is_forced=False,
-                )
-                
-                if not result:
-                    await status_msg.edit("❌ Échec de l'ajout des sous-titres")
-                    return
-                    
-                result_info = await videoclient.get_media_info(result)
-                result_width = result_info.width if result_info else width
-                result_height = result_info.height if result_info else height
-                result_duration = int(result_info.duration) if result_info else duration
-                
-                await client.send_video(
-                    chat_id=user.id,
-                    video=result,
-                    width=result_width,
-                    height=result_height,
-                    duration=result_duration,
-                    caption="🎬 Vidéo avec sous-titres ajoutés",
-                    progress=progress_for_pyrogram,
-                    progress_args=("Envoi...", status_msg, time.time())
-                )
-                
-                await status_msg.edit("✅ Sous-titres ajoutés avec succès!")
-                await asyncio.sleep(2)
-                await status_msg.delete()
-                
-            except asyncio.TimeoutError:
-                await status_msg.edit("⌛ Temps écoulé - opération annulée")
-            except Exception as e:
-                await status_msg.edit(f"❌ Erreur: {str(e)}")
-        finally:
-            try:
-                for file in [locals().get("video_path"), locals().get("subtitle_path"), locals().get("temp_video"), locals().get("result")]:
-                    if file and os.path.exists(file):
-                        try:
-                            os.remove(file)
-                        except Exception as e:
-                            print(f"Erreur suppression fichier {file}: {e}")
-                
-                if os.path.exists(user_dir):
-                    for root, _, files in os.walk(user_dir):
-                        for file in files:
-                            try:
-                                os.remove(os.path.join(root, file))
-                            except Exception as e:
-                                print(f"Erreur suppression dans {root}: {e}")
-                    try:
-                        os.rmdir(user_dir)
-                    except Exception as e:
-                        print(f"Erreur suppression dossier {user_dir}: {e}")
-            except Exception as e:
-                print(f"Erreur lors du nettoyage général: {str(e)}")
-                
-    elif data == "force_subtitle":
+        except asyncio.TimeoutError:
+            await status_msg.edit("⌛ Temps écoulé - opération annulée")
+        except Exception as e:
+            await status_msg.edit(f"❌ Erreur: {str(e)}")
+
+async def cb_subtitle_add(client: Client, callback_query: CallbackQuery, data: str, user, msg):
+    is_forced = data == "force_subtitle"
+    label = " forcés" if is_forced else ""
+    await callback_query.answer(f"⏳ Ajout de sous-titres{label} en cours...")
+        
+    if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
+        await callback_query.answer("❌ Aucun fichier vidéo trouvé", show_alert=True)
+        return
+    
+    async with job_workspace(user.id, msg.reply_to_message) as user_dir:
+        
         try:
-            await callback_query.answer("⏳ Ajout de sous-titres forcés en cours...")
+            status_msg = SmartStatus(await msg.edit("⏳ Préparation..."))
+        except MessageIdInvalid:
+            status_msg = SmartStatus(await msg.reply("⏳ Préparation..."))
+        
+        source = msg.reply_to_message
+        original_filename = (source.document or source.video).file_name
+        videoclient = deps.videoclient.with_output(user_dir)
+        # Dimensions connues sans la vidéo : analyse précédente ou métadonnées Telegram
+        known = cached_media_info(source) or source.video
+        details = ""
+        if known and known.width:
+            details += f"📏 Résolution: {known.width}x{known.height}\n"
+        if known and known.duration:
+            details += f"⏱ Durée: {int(known.duration) // 60}:{int(known.duration) % 60:02d}\n"
+
+        await status_msg.edit(
+            f"📜 <b>Envoyez maintenant le fichier de sous-titres{' FORCÉS' if is_forced else ''}</b>\n\n"
+            f"📹 Vidéo: {original_filename or 'video'}\n"
+            f"{details}\n"
+            "Formats supportés: .srt, .vtt, .ass\n\n"
+            + ("Les sous-titres seront marqués comme forcés (toujours affichés)\n\n" if is_forced else "") +
+            "Tapez /cancel pour annuler",
+            force=True
+        )
+        
+        # La vidéo se télécharge pendant que l'utilisateur envoie ses sous-titres
+        video_task = asyncio.create_task(fetch_media(
+            client, source,
+            file_name=f"{user_dir}/{original_filename or 'original.mp4'}"
+        ))
+        try:
+            subtitle_response = await wait_reply(
+                user.id, DOCUMENT_OR_TEXT,
+                timeout=120
+            )
             
-            if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
-                await callback_query.answer("❌ Aucun fichier vidéo trouvé", show_alert=True)
+            if subtitle_response.text and "/cancel" in subtitle_response.text.lower():
+                await status_msg.edit("❌ Opération annulée")
                 return
-            
-            user_dir = f"downloads/{user.id}_{int(time.time())}"
-            os.makedirs(user_dir, exist_ok=True)
-            
-            try:
-                status_msg = await msg.edit("⏳ Téléchargement de la vidéo...")
-            except MessageIdInvalid:
-                status_msg = await msg.reply("⏳ Téléchargement de la vidéo...")
-            
-            try:
-                original_filename = None
-                if msg.reply_to_message.document:
-                    original_filename = msg.reply_to_message.document.file_name
-                elif msg.reply_to_message.video:
-                    original_filename = msg.reply_to_message.video.file_name
-                
-                video_path = await msg.reply_to_message.download(
-                    file_name=f"{user_dir}/{original_filename or 'original.mp4'}",
-                    progress=progress_for_pyrogram,
-                    progress_args=("Téléchargement vidéo...", status_msg, time.time())
-                )
-                
-                videoclient = deps.videoclient
-                media_info = await videoclient.get_media_info(video_path)
-                width = media_info.width if media_info else 1280
-                height = media_info.height if media_info else 720
-                duration = int(media_info.duration) if media_info else 0
                 
+            await status_msg.edit("⏳ Téléchargement des sous-titres...")
+            subtitle_path = await fetch_media(
+                client, subtitle_response,
+                file_name=f"{user_dir}/subtitles{'_forced' if is_forced else ''}.{subtitle_response.document.file_name.split('.')[-1]}",
+                progress=progress_for_pyrogram,
+                progress_args=("Téléchargement sous-titres...", status_msg, time.time())
+            )
+            await subtitle_response.delete()
+
+            if not video_task.done():
+                await status_msg.edit("⏳ Fin du téléchargement de la vidéo...")
+            try:
+                video_path = await video_task
+                media_info = await source_media_info(videoclient, source, video_path)
             except Exception as e:
                 await status_msg.edit(f"❌ Erreur de téléchargement vidéo: {str(e)}")
-                try:
-                    os.rmdir(user_dir)
-                except:
-                    pass
                 return
-
-            await status_msg.edit(
-                "📜 <b>Envoyez maintenant le fichier de sous-titres FORCÉS</b>\n\n"
-                f"📹 Vidéo: {original_filename or 'video'}\n"
-                f"📏 Résolution: {width}x{height}\n"
-                f"⏱ Durée: {duration // 60}:{duration % 60:02d}\n\n"
-                "Formats supportés: .srt, .vtt, .ass\n\n"
-                "Les sous-titres seront marqués comme forcés (toujours affichés)\n\n"
-                "Tapez /cancel pour annuler"
+            width = media_info.width if media_info else 1280
+            height = media_info.height if media_info else 720
+            duration = int(media_info.duration) if media_info else 0
+            
+            await status_msg.edit(f"⚙️ Ajout des sous-titres{label}...")
+            
+            # Une seule passe ffmpeg : les anciens sous-titres sont écartés au remux
+            result = await videoclient.add_subtitle(
+                input_path=video_path,
+                sbt_file=subtitle_path,
+                language="french",
+                output_name="forced_subtitles_output" if is_forced else "final_output",
+                is_forced=is_forced,
+                replace_existing=True,
             )
             
-            try:
-                subtitle_response = await client.listen(
-                    filters=(filters.document | filters.text) & filters.user(user.id),
-                    timeout=120
-                )
-                
-                if subtitle_response.text and "/cancel" in subtitle_response.text.lower():
-                    await status_msg.edit("❌ Opération annulée")
-                    return
-                    
-                await status_msg.edit("⏳ Téléchargement des sous-titres...")
-                subtitle_ext = subtitle_response.document.file_name.split('.')[-1]
-                subtitle_path = await subtitle_response.download(
-                    file_name=f"{user_dir}/subtitles_forced.{subtitle_ext}",
-                    progress=progress_for_pyrogram,
-                    progress_args=("Téléchargement sous-titres...", status_msg, time.time())
-                )
-                
-                await status_msg.edit("⚙️ Ajout des sous-titres forcés...")
-                videoclient.output_path = Path(user_dir)
-                
-                temp_video = await videoclient.remove_subtitles(
-                    input_path=video_path,
-                    output_name="no_subtitles"
-                )
-                if not temp_video:
-                    await status_msg.edit("❌ Échec du nettoyage des sous-titres existants")
-                    return
-                await subtitle_response.delete()
-                
-                result = await videoclient.add_subtitle(
-                    input_path=temp_video,
-                    sbt_file=subtitle_path,
-                    language="french",
-                    output_name="forced_subtitles_output",
-                    is_forced=True,
-                )
-                
-                if not result:
-                    await status_msg.edit("❌ Échec de l'ajout des sous-titres forcés")
-                    return
-                    
-                result_info = await videoclient.get_media_info(result)
-                result_width = result_info.width if result_info else width
-                result_height = result_info.height if result_info else height
-                result_duration = int(result_info.duration) if result_info else duration
+            if not result:
+                await status_msg.edit(f"❌ Échec de l'ajout des sous-titres{label}")
+                return
                 
+            # Remux ou incrustation : dimensions et durée sont celles de la source,
+            # pas besoin de relire la sortie avec ffprobe avant l'envoi
+            with open_upload(result) as fh:
                 await client.send_video(
                     chat_id=user.id,
-                    video=result,
-                    width=result_width,
-                    height=result_height,
-                    duration=result_duration,
-                    caption="🎬 Vidéo avec sous-titres forcés ajoutés",
+                    video=fh,
+                    file_name=os.path.basename(result),
+                    width=width,
+                    height=height,
+                    duration=duration,
+                    caption=f"🎬 Vidéo avec sous-titres{label} ajoutés",
                     progress=progress_for_pyrogram,
                     progress_args=("Envoi...", status_msg, time.time())
                 )
-                
-                await status_msg.edit("✅ Sous-titres forcés ajoutés avec succès!")
-                await asyncio.sleep(2)
-                await status_msg.delete()
-                
-            except asyncio.TimeoutError:
-                await status_msg.edit("⌛ Temps écoulé - opération annulée")
-            except Exception as e:
-                await status_msg.edit(f"❌ Erreur: {str(e)}")
+            
+            await status_msg.edit(f"✅ Sous-titres{label} ajoutés avec succès!")
+            await asyncio.sleep(2)
+            await status_msg.delete()
+            
+        except asyncio.TimeoutError:
+            await status_msg.edit("⌛ Temps écoulé - opération annulée")
+        except Exception as e:
+            await status_msg.edit(f"❌ Erreur: {str(e)}")
         finally:
-            try:
-                for file in [locals().get("video_path"), 
-                           locals().get("subtitle_path"), 
-                           locals().get("temp_video"), 
-                           locals().get("result")]:
-                    if file and os.path.exists(file):
-                        try:
-                            os.remove(file)
-                        except Exception as e:
-                            print(f"Erreur suppression fichier {file}: {e}")
-                
-                if os.path.exists(user_dir):
-                    for root, _, files in os.walk(user_dir):
-                        for file in files:
-                            try:
-                                os.remove(os.path.join(root, file))
-                            except Exception as e:
-                                print(f"Erreur suppression dans {root}: {e}")
-                    try:
-                        os.rmdir(user_dir)
-                    except Exception as e:
-                        print(f"Erreur suppression dossier {user_dir}: {e}")
-            except Exception as e:
-                print(f"Erreur lors du nettoyage général: {str(e)}")
+            # Annulation ou délai dépassé : le téléchargement s'arrête avant le nettoyage du dossier
+            video_task.cancel()
+            await asyncio.gather(video_task, return_exceptions=True)
 
-    elif data == "remove_subtitles":
+async def cb_remove_subtitles(client: Client, callback_query: CallbackQuery, data: str, user, msg):
+    await callback_query.answer("⏳ Suppression des sous-titres en cours...")
+    
+    if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
+        await callback_query.answer("❌ Aucun fichier vidéo trouvé", show_alert=True)
+        return
+    
+    async with job_workspace(user.id, msg.reply_to_message) as user_dir:
+        
         try:
-            await callback_query.answer("⏳ Suppression des sous-titres en cours...")
+            status_msg = SmartStatus(await msg.edit("⏳ Téléchargement du fichier vidéo..."))
+        except MessageIdInvalid:
+            status_msg = SmartStatus(await msg.reply("⏳ Téléchargement du fichier vidéo..."))
+        
+        try:
+            original_filename = None
+            if msg.reply_to_message.document:
+                original_filename = msg.reply_to_message.document.file_name
+            elif msg.reply_to_message.video:
+                original_filename = msg.reply_to_message.video.file_name
             
-            if not msg.reply_to_message or not (msg.reply_to_message.video or msg.reply_to_message.document):
-                await callback_query.answer("❌ Aucun fichier vidéo trouvé", show_alert=True)
-                return
+            input_path = await fetch_media(
+                client, msg.reply_to_message,
+                file_name=f"{user_dir}/{original_filename or 'original.mp4'}",
+                progress=progress_for_pyrogram,
+                progress_args=("Téléchargement...", status_msg, time.time())
+            )
             
-            user_dir = f"downloads/{user.id}_{int(time.time())}"
-            os.makedirs(user_dir, exist_ok=True)
+            videoclient = deps.videoclient.with_output(user_dir)
+            media_info = await source_media_info(videoclient, msg.reply_to_message, input_path)
+            width = media_info.width if media_info else 1280
+            height = media_info.height if media_info else 720
+            duration = int(media_info.duration) if media_info else 0
+            has_subtitles = media_info.has_subtitles if media_info else False
             
-            try:
-                status_msg = await msg.edit("⏳ Téléchargement du fichier vidéo...")
-            except MessageIdInvalid:
-                status_msg = await msg.reply("⏳ Téléchargement du fichier vidéo...")
+        except Exception as e:
+            await status_msg.edit(f"❌ Erreur de téléchargement: {str(e)}")
+            return
+        
+        await status_msg.edit(
+            "❌ <b>Supprimer les sous-titres de cette vidéo?</b>\n\n"
+            f"📹 Fichier: {original_filename or 'video'}\n"
+            f"📏 Résolution: {width}x{height}\n"
+            f"⏱ Durée: {duration // 60}:{duration % 60:02d}\n"
+            f"🔤 Sous-titres détectés: {'Oui' if has_subtitles else 'Non'}\n\n"
+            "Tapez /confirm pour continuer ou /cancel pour annuler",
+            force=True
+        )
+        
+        try:
+            response = await wait_reply(
+                user.id, filters.text,
+                timeout=60
+            )
             
-            try:
-                original_filename = None
-                if msg.reply_to_message.document:
-                    original_filename = msg.reply_to_message.document.file_name
-                elif msg.reply_to_message.video:
-                    original_filename = msg.reply_to_message.video.file_name
-                
-                input_path = await msg.reply_to_message.download(
-                    file_name=f"{user_dir}/{original_filename or 'original.mp4'}",
-                    progress=progress_for_pyrogram,
-                    progress_args=("Téléchargement...", status_msg, time.time())
-                )
-                
-                videoclient = deps.videoclient
-                media_info = await videoclient.get_media_info(input_path)
-                width = media_info.width if media_info else 1280
-                height = media_info.height if media_info else 720
-                duration = int(media_info.duration) if media_info else 0
-                has_subtitles = media_info.has_subtitles if media_info else False
-                
-            except Exception as e:
-                await status_msg.edit(f"❌ Erreur de téléchargement: {str(e)}")
-                try:
-                    os.rmdir(user_dir)
-                except:
-                    pass
+            if response.text.strip().lower() == "/cancel":
+                await status_msg.edit("❌ Opération annulée")
                 return
+            elif response.text.strip().lower() != "/confirm":
+                await status_msg.edit("❌ Commande invalide. Opération annulée")
+                return
+                
+            await response.delete()
             
-            await status_msg.edit(
-                "❌ <b>Supprimer les sous-titres de cette vidéo?</b>\n\n"
-                f"📹 Fichier: {original_filename or 'video'}\n"
-                f"📏 Résolution: {width}x{height}\n"
-                f"⏱ Durée: {duration // 60}:{duration % 60:02d}\n"
-                f"🔤 Sous-titres détectés: {'Oui' if has_subtitles else 'Non'}\n\n"
-                "Tapez /confirm pour continuer ou /cancel pour annuler"
+            # Traitement de la vidéo
+            await status_msg.edit("⚙️ Suppression des sous-titres...")
+            
+            result = await videoclient.remove_subtitles(
+                input_path=input_path,
+                output_name="no_subtitles"
             )
             
-            try:
-                response = await client.listen(
-                    filters.text & filters.user(user.id),
-                    timeout=60
-                )
-                
-                if response.text.strip().lower() == "/cancel":
-                    await status_msg.edit("❌ Opération annulée")
-                    return
-                elif response.text.strip().lower() != "/confirm":
-                    await status_msg.edit("❌ Commande invalide. Opération annulée")
-                    return
-                    
-                await response.delete()
-                
-                # Traitement de la vidéo
-                await status_msg.edit("⚙️ Suppression des sous-titres...")
-                
-                videoclient.output_path = Path(user_dir)
-                
-                result = await videoclient.remove_subtitles(
-                    input_path=input_path,
-                    output_name="no_subtitles"
-                )
-                
-                if not result:
-                    await status_msg.edit("❌ Échec de la suppression des sous-titres")
-                    return
+            if not result:
+                await status_msg.edit("❌ Échec de la suppression des sous-titres")
+                return
+            # La source n'est plus utile : on libère le tmpfs avant l'envoi
+            await unlink_file(input_path)
+            
+            result_info = await videoclient.get_media_info(result)
+            result_width = result_info.width if result_info else width
+            result_height = result_info.height if result_info else height
+            result_duration = int(result_info.duration) if result_info else duration
                 
-                result_info = await videoclient.get_media_info(result)
-                result_width = result_info.width if result_info else width
-                result_height = result_info.height if result_info else height
-                result_duration = int(result_info.duration) if result_info else duration
-                    
+            with open_upload(result) as fh:
                 await client.send_video(
                     chat_id=user.id,
-                    video=result,
+                    video=fh,
+                    file_name=os.path.basename(result),
                     width=result_width,
                     height=result_height,
                     duration=result_duration,
@@ -2350,198 +2300,178 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                     progress=progress_for_pyrogram,
                     progress_args=("Envoi...", status_msg, time.time())
                 )
-                
-                await status_msg.edit("✅ Sous-titres supprimés avec succès!")
-                await asyncio.sleep(2)
-                await status_msg.delete()
-                
-            except asyncio.TimeoutError:
-                await status_msg.edit("⌛ Temps écoulé - opération annulée")
-            except Exception as e:
-                await status_msg.edit(f"❌ Erreur: {str(e)}")
-        finally:
-            try:
-                for file in [locals().get("input_path"), locals().get("result")]:
-                    if file and os.path.exists(file):
-                        try:
-                            os.remove(file)
-                        except Exception as e:
-                            print(f"Erreur suppression fichier {file}: {e}")
-                
-                if os.path.exists(user_dir):
-                    for root, _, files in os.walk(user_dir):
-                        for file in files:
-                            try:
-                                os.remove(os.path.join(root, file))
-                            except Exception as e:
-                                print(f"Erreur suppression dans {root}: {e}")
-                    try:
-                        os.rmdir(user_dir)
-                    except Exception as e:
-                        print(f"Erreur suppression dossier {user_dir}: {e}")
-            except Exception as e:
-                print(f"Erreur de nettoyage: {str(e)}")
-    
-    elif data in ["choose_subtitle", "choose_subtitle_burn"]:
-        status_msg = None
-        try:
-            await callback_query.answer("⏳ Traitement des sous-titres en cours...")
-
-            if not msg.reply_to_message:
-                await callback_query.answer("❌ Aucun message auquel répondre", show_alert=True)
-                return
+            
+            await status_msg.edit("✅ Sous-titres supprimés avec succès!")
+            await asyncio.sleep(2)
+            await status_msg.delete()
+            
+        except asyncio.TimeoutError:
+            await status_msg.edit("⌛ Temps écoulé - opération annulée")
+        except Exception as e:
+            await status_msg.edit(f"❌ Erreur: {str(e)}")
 
-            reply_msg = msg.reply_to_message
-            if not (reply_msg.video or (reply_msg.document and reply_msg.document.mime_type.startswith('video/'))):
-                await callback_query.answer("❌ Aucun fichier vidéo valide trouvé", show_alert=True)
-                return
+async def cb_choose_subtitle(client: Client, callback_query: CallbackQuery, data: str, user, msg):
+    status_msg = None
+    await callback_query.answer("⏳ Traitement des sous-titres en cours...")
 
-            user_dir = f"downloads/{user.id}_{int(time.time())}"
-            os.makedirs(user_dir, exist_ok=True)
+    if not msg.reply_to_message:
+        await callback_query.answer("❌ Aucun message auquel répondre", show_alert=True)
+        return
 
-            try:
-                status_msg = await msg.edit("⏳ Téléchargement de la vidéo...")
-            except MessageIdInvalid:
-                status_msg = await msg.reply("⏳ Téléchargement de la vidéo...")
+    reply_msg = msg.reply_to_message
+    if not (reply_msg.video or (reply_msg.document and reply_msg.document.mime_type.startswith('video/'))):
+        await callback_query.answer("❌ Aucun fichier vidéo valide trouvé", show_alert=True)
+        return
 
-            try:
-                if reply_msg.video:
-                    original_filename = reply_msg.video.file_name or "video.mp4"
-                else:
-                    original_filename = reply_msg.document.file_name or "video.mp4"
+    async with job_workspace(user.id, msg.reply_to_message) as user_dir:
 
-                input_path = await reply_msg.download(
-                    file_name=f"{user_dir}/{original_filename}",
-                    progress=progress_for_pyrogram,
-                    progress_args=("Téléchargement...", status_msg, time.time())
-                )
+        try:
+            status_msg = SmartStatus(await msg.edit("⏳ Téléchargement de la vidéo..."))
+        except MessageIdInvalid:
+            status_msg = SmartStatus(await msg.reply("⏳ Téléchargement de la vidéo..."))
 
-                videoclient = deps.videoclient
-                media_info = await videoclient.get_media_info(input_path)
+        try:
+            if reply_msg.video:
+                original_filename = reply_msg.video.file_name or "video.mp4"
+            else:
+                original_filename = reply_msg.document.file_name or "video.mp4"
 
-                if not media_info:
-                    await status_msg.edit("❌ Impossible d'analyser le fichier vidéo")
-                    return
+            input_path = await fetch_media(
+                client, reply_msg,
+                file_name=f"{user_dir}/{original_filename}",
+                progress=progress_for_pyrogram,
+                progress_args=("Téléchargement...", status_msg, time.time())
+            )
 
-                duration = int(media_info.duration) if media_info.duration else 0
-                width = media_info.width if media_info.width else 1280
-                height = media_info.height if media_info.height else 720
+            videoclient = deps.videoclient.with_output(user_dir)
+            media_info = await source_media_info(videoclient, reply_msg, input_path)
 
-            except Exception as e:
-                await status_msg.edit(f"❌ Erreur de téléchargement: {str(e)}")
-                shutil.rmtree(user_dir, ignore_errors=True)
+            if not media_info:
+                await status_msg.edit("❌ Impossible d'analyser le fichier vidéo")
                 return
 
-            if not media_info.subtitle_tracks:
-                await status_msg.edit("❌ Aucune piste de sous-titres détectée dans le fichier")
-                shutil.rmtree(user_dir, ignore_errors=True)
-                return
+            duration = int(media_info.duration) if media_info.duration else 0
+            width = media_info.width if media_info.width else 1280
+            height = media_info.height if media_info.height else 720
 
-            subtitle_options = []
-            lang_counter = {}
-
-            for index, track in enumerate(media_info.subtitle_tracks):
-                lang = track.language.lower() if track.language else "inconnu"
-                lang_counter[lang] = lang_counter.get(lang, 0) + 1
-                count = lang_counter[lang]
-                display_name = f"{lang.capitalize()} ({count})" if count > 1 else lang.capitalize()
-                subtitle_options.append({
-                    'index': index,
-                    'lang_code': lang,
-                    'display': display_name
-                })
+        except Exception as e:
+            await status_msg.edit(f"❌ Erreur de téléchargement: {str(e)}")
+            return
 
-            keyboard = []
-            current_row = []
-            for i, option in enumerate(subtitle_options):
-                current_row.append(KeyboardButton(text=option['display']))
-                if (i + 1) % 2 == 0 or i + 1 == len(subtitle_options):
-                    keyboard.append(current_row)
-                    current_row = []
+        if not media_info.subtitle_tracks:
+            await status_msg.edit("❌ Aucune piste de sous-titres détectée dans le fichier")
+            return
 
-            keyboard.append([KeyboardButton(text="❌ Annuler")])
+        # display -> option : un seul passage, et recherche directe de la réponse
+        subtitle_options = {}
+        lang_counter = {}
+
+        for index, track in enumerate(media_info.subtitle_tracks):
+            lang = track.language.lower() if track.language else "inconnu"
+            lang_counter[lang] = lang_counter.get(lang, 0) + 1
+            count = lang_counter[lang]
+            display_name = f"{lang.capitalize()} ({count})" if count > 1 else lang.capitalize()
+            subtitle_options[display_name] = {
+                'index': index,
+                'lang_code': lang,
+                'display': display_name
+            }
 
-            reply_markup = ReplyKeyboardMarkup(
-                keyboard=keyboard,
-                resize_keyboard=True,
-                one_time_keyboard=True
-            )
+        displays = list(subtitle_options)
+        keyboard = [
+            [KeyboardButton(text=display) for display in displays[i:i + 2]]
+            for i in range(0, len(displays), 2)
+        ]
 
-            action = "brûler" if data == "choose_subtitle_burn" else "sélectionner"
-            languages_text = "\n".join(f"- {opt['display']}" for opt in subtitle_options)
+        keyboard.append([KeyboardButton(text="❌ Annuler")])
 
-            await status_msg.edit(
-                f"🎬 <b>Choisissez la piste de sous-titres à {action}</b>\n\n"
-                f"📹 Fichier: {original_filename}\n"
-                f"📏 Résolution: {width}x{height}\n"
-                f"⏱ Durée: {duration // 60}:{duration % 60:02d}\n\n"
-                f"Pistes disponibles (index FFmpeg):\n{languages_text}",
-                reply_markup=reply_markup
-            )
+        reply_markup = ReplyKeyboardMarkup(
+            keyboard=keyboard,
+            resize_keyboard=True,
+            one_time_keyboard=True
+        )
 
-            try:
-                response = await client.listen(
-                    filters=(filters.text & filters.user(user.id)),
-                    timeout=120
-                )
+        action = "brûler" if data == "choose_subtitle_burn" else "sélectionner"
+        languages_text = "\n".join(f"- {display}" for display in displays)
+
+        await status_msg.edit(
+            f"🎬 <b>Choisissez la piste de sous-titres à {action}</b>\n\n"
+            f"📹 Fichier: {original_filename}\n"
+            f"📏 Résolution: {width}x{height}\n"
+            f"⏱ Durée: {duration // 60}:{duration % 60:02d}\n\n"
+            f"Pistes disponibles (index FFmpeg):\n{languages_text}",
+            reply_markup=reply_markup,
+            force=True
+        )
 
-                if response.text.strip().lower() in ("❌ annuler", "/cancel"):
-                    await msg.reply("❌ Opération annulée", reply_markup=ReplyKeyboardRemove())
-                    await response.delete()
-                    return
+        try:
+            response = await wait_reply(
+                user.id, filters.text,
+                timeout=120
+            )
 
-                selected_display = response.text.strip()
-                selected_option = next((opt for opt in subtitle_options if opt['display'] == selected_display), None)
+            if response.text.strip().lower() in ("❌ annuler", "/cancel"):
+                await msg.reply("❌ Opération annulée", reply_markup=ReplyKeyboardRemove())
+                await response.delete()
+                return
 
-                if not selected_option:
-                    await msg.reply("❌ Sélection invalide", reply_markup=ReplyKeyboardRemove())
-                    await response.delete()
-                    return
+            selected_display = response.text.strip()
+            selected_option = subtitle_options.get(selected_display)
 
+            if not selected_option:
+                await msg.reply("❌ Sélection invalide", reply_markup=ReplyKeyboardRemove())
                 await response.delete()
-                await status_msg.delete()
+                return
 
-                selected_lang = selected_option['lang_code']
-                track_index = selected_option['index'] + 1
+            await response.delete()
+            await status_msg.delete()
 
-                status_msg = await msg.reply(
-                    f"⚙️ {action.capitalize()} la piste {selected_lang.capitalize()} (Index: {track_index})...",
-                    reply_markup=ReplyKeyboardRemove()
-                )
+            selected_lang = selected_option['lang_code']
+            track_index = selected_option['index'] + 1
 
-                output_name = f"output_{selected_lang}_{int(time.time())}"
+            status_msg = SmartStatus(await msg.reply(
+                f"⚙️ {action.capitalize()} la piste {selected_lang.capitalize()} (Index: {track_index})...",
+                reply_markup=ReplyKeyboardRemove()
+            ))
 
-                if data == "choose_subtitle":
-                    result = await videoclient.choose_subtitle(
-                        input_path=input_path,
-                        output_name=output_name,
-                        language=selected_lang,
-                        index=track_index,
-                        make_default=True,
-                    )
-                else:
-                    result = await videoclient.choose_subtitle_burn(
-                        input_path=input_path,
-                        output_name=output_name,
-                        language=selected_lang,
-                        index=track_index,
-                    )
+            output_name = f"output_{selected_lang}_{uuid.uuid4().hex[:12]}"
 
-                if not result:
-                    await status_msg.edit(f"❌ Échec du traitement de la piste {track_index}")
-                    return
+            if data == "choose_subtitle":
+                result = await videoclient.choose_subtitle(
+                    input_path=input_path,
+                    output_name=output_name,
+                    language=selected_lang,
+                    index=track_index,
+                    make_default=True,
+                )
+            else:
+                result = await videoclient.choose_subtitle_burn(
+                    input_path=input_path,
+                    output_name=output_name,
+                    language=selected_lang,
+                    index=track_index,
+                    hwaccel=deps.hwaccel,
+                )
 
-                result_info = await videoclient.get_media_info(result)
-                result_width = result_info.width if result_info else width
-                result_height = result_info.height if result_info else height
-                result_duration = int(result_info.duration) if result_info and result_info.duration else duration
+            if not result:
+                await status_msg.edit(f"❌ Échec du traitement de la piste {track_index}")
+                return
+            # La source n'est plus utile : on libère le tmpfs avant l'envoi
+            await unlink_file(input_path)
 
-                caption_action = "brûlés" if data == "choose_subtitle_burn" else "ajoutés"
-                caption = f"🎬 Vidéo avec sous-titres {selected_lang.capitalize()} {caption_action} (Piste {track_index})"
+            result_info = await videoclient.get_media_info(result)
+            result_width = result_info.width if result_info else width
+            result_height = result_info.height if result_info else height
+            result_duration = int(result_info.duration) if result_info and result_info.duration else duration
 
+            caption_action = "brûlés" if data == "choose_subtitle_burn" else "ajoutés"
+            caption = f"🎬 Vidéo avec sous-titres {selected_lang.capitalize()} {caption_action} (Piste {track_index})"
+
+            with open_upload(result) as fh:
                 await client.send_video(
                     chat_id=user.id,
-                    video=result,
+                    video=fh,
+                    file_name=os.path.basename(result),
                     width=result_width,
                     height=result_height,
                     duration=result_duration,
@@ -2549,63 +2479,48 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                     progress=progress_for_pyrogram,
                     progress_args=("Envoi...", status_msg, time.time())
                 )
-                await status_msg.delete()
-                await msg.reply(f"✅ Piste {track_index} {action} avec succès!")
-
-            except asyncio.TimeoutError:
-                await msg.reply("⌛ Temps écoulé - opération annulée", reply_markup=ReplyKeyboardRemove())
-            except Exception as e:
-                await msg.reply(f"❌ Erreur: {str(e)}", reply_markup=ReplyKeyboardRemove())
-
-        finally:
-            try:
-                for file in [locals().get("input_path"), locals().get("result")]:
-                    if file and os.path.exists(file):
-                        os.remove(file)
-                if os.path.exists(user_dir):
-                    shutil.rmtree(user_dir, ignore_errors=True)
-            except Exception as e:
-                print(f"Erreur lors du nettoyage: {str(e)}")
+            await status_msg.delete()
+            await msg.reply(f"✅ Piste {track_index} {action} avec succès!")
 
-    
-    elif data in ["add_chapters", "edit_chapter", "split_chapter", "remove_chapters", "get_chapters", "get_chapter"]:
-        # Variables à nettoyer
-        input_path = None
-        result = None
-        chapter_file = None
-        response = None
-        status_msg = None
-        
+        except asyncio.TimeoutError:
+            await msg.reply("⌛ Temps écoulé - opération annulée", reply_markup=ReplyKeyboardRemove())
+        except Exception as e:
+            await msg.reply(f"❌ Erreur: {str(e)}", reply_markup=ReplyKeyboardRemove())
+
+async def cb_chapters(client: Client, callback_query: CallbackQuery, data: str, user, msg):
+    # Variables à nettoyer
+    input_path = None
+    result = None
+    chapter_file = None
+    response = None
+    status_msg = None
+    async with job_workspace(user.id, msg.reply_to_message) as user_dir:
         try:
             await callback_query.answer("⏳ Traitement des chapitres en cours...")
-            
-            # Création du dossier temporaire
-            user_dir = f"downloads/{user.id}_{int(time.time())}"
-            os.makedirs(user_dir, exist_ok=True)
-            
+        
             # Vérification du fichier source avec gestion améliorée
             if not msg.reply_to_message or not (msg.reply_to_message.video or 
                                             (msg.reply_to_message.document and 
                                             msg.reply_to_message.document.mime_type.startswith('video/'))):
                 try:
-                    status_msg = await msg.edit("📤 Veuillez envoyer le fichier vidéo...")
-                    file_msg = await client.listen(
-                        filters=(filters.document | filters.video) & filters.user(user.id),
+                    status_msg = SmartStatus(await msg.edit("📤 Veuillez envoyer le fichier vidéo..."))
+                    file_msg = await wait_reply(
+                        user.id, VIDEO_FILE,
                         timeout=60
                     )
-                    
+                
                     if not (file_msg.video or (file_msg.document and file_msg.document.mime_type.startswith('video/'))):
                         await status_msg.edit("❌ Format de fichier non supporté")
                         return
-                        
+                    
                     reply_msg = file_msg
                 except asyncio.TimeoutError:
                     await status_msg.edit("⌛ Temps écoulé - opération annulée")
                     return
             else:
                 reply_msg = msg.reply_to_message
-                status_msg = await msg.edit("⏳ Téléchargement de la vidéo...")
-            
+                status_msg = SmartStatus(await msg.edit("⏳ Téléchargement de la vidéo..."))
+        
             # Téléchargement avec gestion du nom original et métadonnées
             try:
                 # Récupération du nom original
@@ -2615,26 +2530,44 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                 else:
                     original_filename = reply_msg.document.file_name or "video.mp4"
                     duration = 0
-                
-                input_path = await reply_msg.download(
-                    file_name=f"{user_dir}/{original_filename}",
-                    progress=progress_for_pyrogram,
-                    progress_args=("Téléchargement...", status_msg, time.time())
-                )
-                
+            
+                if data in ("get_chapters", "get_chapter"):
+                    # Lecture seule : le début et la fin du fichier suffisent
+                    input_path = await download_edges(
+                        client, reply_msg,
+                        file_name=f"{user_dir}/{original_filename}")
+                else:
+                    input_path = await fetch_media(
+                        client, reply_msg,
+                        file_name=f"{user_dir}/{original_filename}",
+                        progress=progress_for_pyrogram,
+                        progress_args=("Téléchargement...", status_msg, time.time())
+                    )
+            
                 # Analyse des métadonnées
-                videoclient = deps.videoclient
-                media_info = await videoclient.get_media_info(input_path)
+                videoclient = deps.videoclient.with_output(user_dir)
+                if data in ("get_chapters", "get_chapter"):
+                    # Fichier partiel : sondé directement, mémorisé seulement s'il est lisible
+                    media_info = await videoclient.get_media_info(input_path)
+                    if not media_info or not media_info.duration:
+                        # En-têtes ou chapitres au milieu du fichier : téléchargement complet
+                        input_path = await fetch_media(
+                            client, reply_msg,
+                            file_name=f"{user_dir}/{original_filename}",
+                            progress=progress_for_pyrogram,
+                            progress_args=("Téléchargement...", status_msg, time.time())
+                        )
+                        media_info = await videoclient.get_media_info(input_path)
+                    if media_info and media_info.duration:
+                        remember_media_info(reply_msg, media_info)
+                else:
+                    media_info = await source_media_info(videoclient, reply_msg, input_path)
                 width = media_info.width if media_info else 1280
                 height = media_info.height if media_info else 720
                 duration = int(media_info.duration) if media_info else duration
-                
+            
             except Exception as e:
                 await status_msg.edit(f"❌ Erreur de téléchargement: {str(e)}")
-                try:
-                    shutil.rmtree(user_dir, ignore_errors=True)
-                except:
-                    pass
                 return
 
             try:
@@ -2642,10 +2575,7 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                     await file_msg.delete()
             except:
                 pass
-            
-            # Initialisation du client vidéo
-            videoclient.output_path = Path(user_dir)
-            
+        
             if data == "get_chapters":
                 # Affichage amélioré des chapitres existants
                 chapters = await videoclient.get_chapters(input_path)
@@ -2656,13 +2586,13 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                         f"📏 {width}x{height} | ⏱ {duration//60}:{duration%60:02d}"
                     )
                     return
-                    
+                
                 chapters_text = "\n".join(
                     f"{i+1}. {chap.get('title', 'Sans titre')} "
                     f"(de {chap['start']} à {chap['end']})"
                     for i, chap in enumerate(chapters)
                 )
-                
+            
                 await status_msg.edit(
                     f"📋 Chapitres trouvés dans:\n\n"
                     f"📹 {original_filename}\n"
@@ -2670,13 +2600,13 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                     f"{chapters_text}"
                 )
                 return
-                
+            
             elif data == "get_chapter":
                 chapters = await videoclient.get_chapters(input_path)
                 if not chapters:
                     await status_msg.edit("❌ Aucun chapitre à afficher")
                     return
-                
+            
                 # Création du clavier de sélection
                 keyboard = []
                 for i, chap in enumerate(chapters, 1):
@@ -2684,28 +2614,29 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                         f"{i}. {chap.get('title', 'Sans titre')[:20]}"
                     )])
                 keyboard.append([KeyboardButton("❌ Annuler")])
-                
+            
                 await status_msg.edit(
                     f"🔢 Sélectionnez le chapitre à afficher:\n\n"
                     f"📹 {original_filename}\n"
                     f"📏 {width}x{height} | ⏱ {duration//60}:{duration%60:02d}",
-                    reply_markup=ReplyKeyboardMarkup(keyboard, one_time_keyboard=True)
+                    reply_markup=ReplyKeyboardMarkup(keyboard, one_time_keyboard=True),
+                    force=True
                 )
-                
+            
                 try:
-                    response = await client.listen(
-                        filters=(filters.text & filters.user(user.id) & ~filters.command),
+                    response = await wait_reply(
+                        user.id, PLAIN_TEXT,
                         timeout=30
                     )
-                    
+                
                     if response.text.strip().lower() in ("❌ annuler", "/cancel"):
                         await status_msg.edit("❌ Opération annulée", reply_markup=ReplyKeyboardRemove())
                         return
-                        
+                    
                     try:
                         chapter_index = int(response.text.split('.')[0].strip())
                         chapter = chapters[chapter_index-1]
-                        
+                    
                         await status_msg.edit(
                             f"📌 Chapitre {chapter_index}:\n\n"
                             f"📹 {original_filename}\n"
@@ -2720,33 +2651,35 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                 except asyncio.TimeoutError:
                     await status_msg.edit("⌛ Temps écoulé", reply_markup=ReplyKeyboardRemove())
                 return
-                
+            
             elif data == "remove_chapters":
                 # Suppression des chapitres avec métadonnées
-                output_name = f"no_chapters_{int(time.time())}"
+                output_name = f"no_chapters_{uuid.uuid4().hex[:12]}"
                 result = await videoclient.remove_chapters(input_path, output_name)
-                
+            
                 if not result:
                     await status_msg.edit("❌ Échec de la suppression des chapitres")
                     return
-                
+            
                 # Récupération des infos du résultat
                 result_info = await videoclient.get_media_info(result)
                 result_width = result_info.width if result_info else width
                 result_height = result_info.height if result_info else height
                 result_duration = int(result_info.duration) if result_info else duration
-                    
-                await client.send_video(
-                    chat_id=user.id,
-                    video=result,
-                    width=result_width,
-                    height=result_height,
-                    duration=result_duration,
-                    caption=f"🎬 {original_filename} - Sans chapitres",
-                    progress=progress_for_pyrogram,
-                    progress_args=("Envoi...", status_msg, time.time())
-                )
                 
+                with open_upload(result) as fh:
+                    await client.send_video(
+                        chat_id=user.id,
+                        video=fh,
+                        file_name=os.path.basename(result),
+                        width=result_width,
+                        height=result_height,
+                        duration=result_duration,
+                        caption=f"🎬 {original_filename} - Sans chapitres",
+                        progress=progress_for_pyrogram,
+                        progress_args=("Envoi...", status_msg, time.time())
+                    )
+            
             elif data == "add_chapters":
                 # Ajout de chapitres avec interface améliorée
                 await status_msg.edit(
@@ -2756,35 +2689,38 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                     "Formats supportés:\n"
                     "1. JSON: [{'start':'00:00:00','end':'00:01:00','title':'Chapitre 1'},...]\n"
                     "2. Texte: HH:MM:SS Titre (un par ligne)\n\n"
-                    "Tapez /cancel pour annuler"
+                    "Tapez /cancel pour annuler",
+                    force=True
                 )
-                
+            
                 try:
-                    chapter_msg = await client.listen(
-                        filters=filters.document & filters.user(user.id),
+                    chapter_msg = await wait_reply(
+                        user.id, filters.document,
                         timeout=120
                     )
-                    
-                    chapter_file = await chapter_msg.download(
+                
+                    chapter_file = await fetch_media(
+                        client, chapter_msg,
                         file_name=f"{user_dir}/chapters{Path(chapter_msg.document.file_name).suffix}"
                     )
-                    
+                
                     # Validation et parsing des chapitres
                     chapters = []
                     try:
+                        # Lecture unique dans un thread : la boucle reste libre si le disque est lent
+                        raw = await asyncio.to_thread(Path(chapter_file).read_bytes)
                         if Path(chapter_file).suffix == '.json':
-                            with open(chapter_file, 'r', encoding='utf-8') as f:
-                                chapters_data = json.load(f)
+                            chapters_data = orjson.loads(raw) if orjson else json.loads(raw)
                             if not isinstance(chapters_data, list):
                                 raise ValueError("Format JSON invalide - liste attendue")
                             chapters = chapters_data
                         else:  # Format texte
-                            with open(chapter_file, 'r', encoding='utf-8') as f:
-                                lines = [line.strip() for line in f if line.strip()]
-                            
+                            text = raw.decode('utf-8', errors='replace')
+                            lines = [line for line in map(str.strip, text.splitlines()) if line]
+                        
                             if not lines:
                                 raise ValueError("Fichier vide")
-                                
+                            
                             # Vérifier si c'est le format simple (HH:MM:SS Titre)
                             if ' ' in lines[0]:
                                 prev_time = "00:00:00"
@@ -2792,11 +2728,11 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                                     parts = line.split(maxsplit=1)
                                     if len(parts) != 2:
                                         raise ValueError(f"Ligne {i}: format 'HH:MM:SS Titre' attendu")
-                                    
+                                
                                     current_time = parts[0]
-                                    if not re.match(r'^\d{2}:\d{2}:\d{2}$', current_time):
+                                    if not is_hms(current_time):
                                         raise ValueError(f"Ligne {i}: format temporel invalide")
-                                    
+                                
                                     chapters.append({
                                         'start': prev_time,
                                         'end': current_time,
@@ -2805,54 +2741,56 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                                     prev_time = current_time
                             else:
                                 raise ValueError("Format non reconnu")
-                    
+                
                     except Exception as e:
                         await status_msg.edit(f"❌ Erreur dans le fichier:\n{str(e)}")
                         return
-                    
+                
                     if not chapters:
                         await status_msg.edit("❌ Aucun chapitre valide trouvé")
                         return
-                        
-                    output_name = f"with_chapters_{int(time.time())}"
+                    
+                    output_name = f"with_chapters_{uuid.uuid4().hex[:12]}"
                     result = await videoclient.add_chapters(
                         input_path=input_path,
                         output_name=output_name,
                         chapters=chapters
                     )
-                    
+                
                     if not result:
                         await status_msg.edit("❌ Échec de l'ajout des chapitres")
                         return
-                        
+                    
                     # Envoi avec métadonnées
                     result_info = await videoclient.get_media_info(result)
                     result_width = result_info.width if result_info else width
                     result_height = result_info.height if result_info else height
                     result_duration = int(result_info.duration) if result_info else duration
-                    
-                    await client.send_video(
-                        chat_id=user.id,
-                        video=result,
-                        width=result_width,
-                        height=result_height,
-                        duration=result_duration,
-                        caption=f"🎬 {original_filename} - {len(chapters)} chapitres ajoutés",
-                        progress=progress_for_pyrogram,
-                        progress_args=("Envoi...", status_msg, time.time())
-                    )
-                    
+                
+                    with open_upload(result) as fh:
+                        await client.send_video(
+                            chat_id=user.id,
+                            video=fh,
+                            file_name=os.path.basename(result),
+                            width=result_width,
+                            height=result_height,
+                            duration=result_duration,
+                            caption=f"🎬 {original_filename} - {len(chapters)} chapitres ajoutés",
+                            progress=progress_for_pyrogram,
+                            progress_args=("Envoi...", status_msg, time.time())
+                        )
+                
                 except asyncio.TimeoutError:
                     await status_msg.edit("⌛ Temps écoulé - opération annulée")
                     return
-                    
+                
             elif data == "edit_chapter":
                 # Édition avec interface améliorée
                 chapters = await videoclient.get_chapters(input_path)
                 if not chapters:
                     await status_msg.edit("❌ Aucun chapitre à modifier")
                     return
-                
+            
                 # Création du clavier de sélection
                 keyboard = []
                 for i, chap in enumerate(chapters, 1):
@@ -2861,28 +2799,29 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                         f"({chap['start']}-{chap['end']})"
                     )])
                 keyboard.append([KeyboardButton("❌ Annuler")])
-                
+            
                 await status_msg.edit(
                     f"📋 Sélectionnez le chapitre à modifier:\n\n"
                     f"📹 {original_filename}\n"
                     f"📏 {width}x{height} | ⏱ {duration//60}:{duration%60:02d}",
-                    reply_markup=ReplyKeyboardMarkup(keyboard, one_time_keyboard=True)
+                    reply_markup=ReplyKeyboardMarkup(keyboard, one_time_keyboard=True),
+                    force=True
                 )
-                
+            
                 try:
-                    response = await client.listen(
-                        filters=(filters.text & filters.user(user.id) & ~filters.command),
+                    response = await wait_reply(
+                        user.id, PLAIN_TEXT,
                         timeout=60
                     )
-                    
+                
                     if response.text.strip().lower() in ("❌ annuler", "/cancel"):
                         await status_msg.edit("❌ Opération annulée", reply_markup=ReplyKeyboardRemove())
                         return
-                        
+                    
                     try:
                         chapter_index = int(response.text.split('.')[0].strip())
                         selected_chapter = chapters[chapter_index-1]
-                        
+                    
                         await status_msg.edit(
                             f"✏️ Modification du chapitre {chapter_index}:\n\n"
                             f"Ancien titre: {selected_chapter.get('title', 'Sans titre')}\n"
@@ -2891,26 +2830,27 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                             "1. Nouveau titre (optionnel)\n"
                             "2. Nouveau début (HH:MM:SS, optionnel)\n"
                             "3. Nouvelle fin (HH:MM:SS, optionnel)",
-                            reply_markup=ReplyKeyboardRemove()
+                            reply_markup=ReplyKeyboardRemove(),
+                            force=True
                         )
-                        
-                        edit_data = await client.listen(
-                            filters.text & filters.user(user.id),
+                    
+                        edit_data = await wait_reply(
+                            user.id, filters.text,
                             timeout=120
                         )
-                        
+                    
                         lines = [line.strip() for line in edit_data.text.split('\n') if line.strip()]
                         new_title = lines[0] if len(lines) > 0 else None
                         new_start = lines[1] if len(lines) > 1 else None
                         new_end = lines[2] if len(lines) > 2 else None
-                        
+                    
                         # Validation des heures si fournies
-                        if new_start and not re.match(r'^\d{2}:\d{2}:\d{2}$', new_start):
+                        if new_start and not is_hms(new_start):
                             raise ValueError("Format de début invalide")
-                        if new_end and not re.match(r'^\d{2}:\d{2}:\d{2}$', new_end):
+                        if new_end and not is_hms(new_end):
                             raise ValueError("Format de fin invalide")
-                        
-                        output_name = f"edited_chapter_{int(time.time())}"
+                    
+                        output_name = f"edited_chapter_{uuid.uuid4().hex[:12]}"
                         result = await videoclient.edit_chapter(
                             input_path=input_path,
                             output_name=output_name,
@@ -2919,43 +2859,45 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                             new_start=new_start,
                             new_end=new_end
                         )
-                        
+                    
                         if not result:
                             await status_msg.edit("❌ Échec de la modification")
                             return
-                            
+                        
                         # Envoi avec métadonnées
                         result_info = await videoclient.get_media_info(result)
                         result_width = result_info.width if result_info else width
                         result_height = result_info.height if result_info else height
                         result_duration = int(result_info.duration) if result_info else duration
-                        
-                        await client.send_video(
-                            chat_id=user.id,
-                            video=result,
-                            width=result_width,
-                            height=result_height,
-                            duration=result_duration,
-                            caption=f"🎬 {original_filename} - Chapitre {chapter_index} modifié",
-                            progress=progress_for_pyrogram,
-                            progress_args=("Envoi...", status_msg, time.time())
-                        )
-                        
+                    
+                        with open_upload(result) as fh:
+                            await client.send_video(
+                                chat_id=user.id,
+                                video=fh,
+                                file_name=os.path.basename(result),
+                                width=result_width,
+                                height=result_height,
+                                duration=result_duration,
+                                caption=f"🎬 {original_filename} - Chapitre {chapter_index} modifié",
+                                progress=progress_for_pyrogram,
+                                progress_args=("Envoi...", status_msg, time.time())
+                            )
+                    
                     except (ValueError, IndexError) as e:
                         await status_msg.edit(f"❌ Erreur: {str(e)}", reply_markup=ReplyKeyboardRemove())
                         return
-                        
+                    
                 except asyncio.TimeoutError:
                     await status_msg.edit("⌛ Temps écoulé", reply_markup=ReplyKeyboardRemove())
                     return
-                    
+                
             elif data == "split_chapter":
                 # Division avec interface améliorée
                 chapters = await videoclient.get_chapters(input_path)
                 if not chapters:
                     await status_msg.edit("❌ Aucun chapitre à diviser")
                     return
-                
+            
                 # Création du clavier de sélection
                 keyboard = []
                 for i, chap in enumerate(chapters, 1):
@@ -2964,252 +2906,243 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                         f"({chap['start']}-{chap['end']})"
                     )])
                 keyboard.append([KeyboardButton("❌ Annuler")])
-                
+            
                 await status_msg.edit(
                     f"📋 Sélectionnez le chapitre à diviser:\n\n"
                     f"📹 {original_filename}\n"
                     f"📏 {width}x{height} | ⏱ {duration//60}:{duration%60:02d}",
-                    reply_markup=ReplyKeyboardMarkup(keyboard, one_time_keyboard=True)
+                    reply_markup=ReplyKeyboardMarkup(keyboard, one_time_keyboard=True),
+                    force=True
                 )
-                
+            
                 try:
-                    response = await client.listen(
-                        filters=(filters.text & filters.user(user.id) & ~filters.command),
+                    response = await wait_reply(
+                        user.id, PLAIN_TEXT,
                         timeout=60
                     )
-                    
+                
                     if response.text.strip().lower() in ("❌ annuler", "/cancel"):
                         await status_msg.edit("❌ Opération annulée", reply_markup=ReplyKeyboardRemove())
                         return
-                        
+                    
                     try:
                         chapter_index = int(response.text.split('.')[0].strip())
                         selected_chapter = chapters[chapter_index-1]
-                        
+                    
                         await status_msg.edit(
                             f"⏱ Division du chapitre {chapter_index}:\n\n"
                             f"Titre: {selected_chapter.get('title', 'Sans titre')}\n"
                             f"Actuel: {selected_chapter['start']} à {selected_chapter['end']}\n\n"
                             "Entrez l'heure de division (HH:MM:SS):",
-                            reply_markup=ReplyKeyboardRemove()
+                            reply_markup=ReplyKeyboardRemove(),
+                            force=True
                         )
-                        
-                        split_msg = await client.listen(
-                            filters.text & filters.user(user.id),
+                    
+                        split_msg = await wait_reply(
+                            user.id, filters.text,
                             timeout=60
                         )
                         split_time = split_msg.text.strip()
-                        
-                        if not re.match(r'^\d{2}:\d{2}:\d{2}$', split_time):
+                    
+                        if not is_hms(split_time):
                             raise ValueError("Format temporel invalide")
-                            
-                        output_name = f"split_chapter_{int(time.time())}"
+                        
+                        output_name = f"split_chapter_{uuid.uuid4().hex[:12]}"
                         result = await videoclient.split_chapter(
                             input_path=input_path,
                             output_name=output_name,
                             chapter_index=chapter_index,
                             split_time=split_time
                         )
-                        
+                    
                         if not result:
                             await status_msg.edit("❌ Échec de la division")
                             return
-                            
+                        
                         # Envoi avec métadonnées
                         result_info = await videoclient.get_media_info(result)
                         result_width = result_info.width if result_info else width
                         result_height = result_info.height if result_info else height
                         result_duration = int(result_info.duration) if result_info else duration
-                        
-                        await client.send_video(
-                            chat_id=user.id,
-                            video=result,
-                            width=result_width,
-                            height=result_height,
-                            duration=result_duration,
-                            caption=f"🎬 {original_filename} - Chapitre {chapter_index} divisé",
-                            progress=progress_for_pyrogram,
-                            progress_args=("Envoi...", status_msg, time.time())
-                        )
-                        
+                    
+                        with open_upload(result) as fh:
+                            await client.send_video(
+                                chat_id=user.id,
+                                video=fh,
+                                file_name=os.path.basename(result),
+                                width=result_width,
+                                height=result_height,
+                                duration=result_duration,
+                                caption=f"🎬 {original_filename} - Chapitre {chapter_index} divisé",
+                                progress=progress_for_pyrogram,
+                                progress_args=("Envoi...", status_msg, time.time())
+                            )
+                    
                     except (ValueError, IndexError) as e:
                         await status_msg.edit(f"❌ Erreur: {str(e)}", reply_markup=ReplyKeyboardRemove())
                         return
-                        
+                    
                 except asyncio.TimeoutError:
                     await status_msg.edit("⌛ Temps écoulé", reply_markup=ReplyKeyboardRemove())
                     return
-            
+        
             await status_msg.edit("✅ Opération terminée avec succès!")
             await asyncio.sleep(2)
             await status_msg.delete()
-            
+        
         except Exception as e:
             if status_msg:
                 await status_msg.edit(f"❌ Erreur: {str(e)}")
             else:
                 await msg.edit(f"❌ Erreur: {str(e)}")
-        finally:
-            try:
-                for file in [locals().get("input_path"), 
-                           locals().get("result"), 
-                           locals().get("chapter_file")]:
-                    if file and os.path.exists(file):
-                        try:
-                            os.remove(file)
-                        except:
-                            pass
-                
-                if os.path.exists(user_dir):
-                    shutil.rmtree(user_dir, ignore_errors=True)
-            except Exception as e:
-                print(f"Erreur de nettoyage: {str(e)}")
+
+async def cb_audio_selection(client: Client, callback_query: CallbackQuery, data: str, user, msg):
+    await callback_query.answer("🔊 Traitement des pistes audio en cours...")
+        
+    if not msg.reply_to_message or not (msg.reply_to_message.video or 
+                                    (msg.reply_to_message.document and 
+                                    msg.reply_to_message.document.mime_type.startswith('video/'))):
+        await callback_query.answer("❌ Aucun fichier vidéo valide", show_alert=True)
+        return
     
-    elif data == "audio_selection":
+    async with job_workspace(user.id, msg.reply_to_message) as user_dir:
+        reply_msg = msg.reply_to_message
+        
         try:
-            await callback_query.answer("🔊 Traitement des pistes audio en cours...")
+            try:
+                status_msg = SmartStatus(await msg.edit("⏳ Analyse du fichier..."))
+            except MessageIdInvalid:
+                status_msg = SmartStatus(await msg.reply("⏳ Analyse du fichier..."))
             
-            if not msg.reply_to_message or not (msg.reply_to_message.video or 
-                                            (msg.reply_to_message.document and 
-                                            msg.reply_to_message.document.mime_type.startswith('video/'))):
-                await callback_query.answer("❌ Aucun fichier vidéo valide", show_alert=True)
+            original_filename = (reply_msg.video.file_name if reply_msg.video 
+                            else reply_msg.document.file_name) or "video.mp4"
+            input_path = await fetch_media(
+                client, reply_msg,
+                file_name=f"{user_dir}/{original_filename}",
+                progress=progress_for_pyrogram,
+                progress_args=("Téléchargement...", status_msg, time.time())
+            )
+            
+            videoclient = deps.videoclient.with_output(user_dir)
+            media_info = await source_media_info(videoclient, reply_msg, input_path)
+            
+            if not media_info or not hasattr(media_info, 'audio_tracks'):
+                await status_msg.edit("❌ Format non supporté ou fichier corrompu")
+                return
+                
+            duration = int(media_info.duration) if media_info.duration else 0
+            
+            if not media_info.audio_tracks:
+                await status_msg.edit("ℹ️ Aucune piste audio détectée")
+                return
+
+            audio_options = []
+            for track in media_info.audio_tracks:
+                if not isinstance(track, AudioTrack):
+                    continue
+                    
+                display_text = (
+                    f"{track.language.upper() if track.language else 'INCONNU'} "
+                    f"[Piste {track.index}] • "
+                    f"{track.codec.name} • "
+                    f"{track.channels} canaux • "
+                    f"{'DÉFAUT • ' if track.is_default else ''}"
+                    f"{track.stream_type}"
+                )
+                
+                audio_options.append({
+                    'track': track,
+                    'display': display_text
+                })
+
+            if not audio_options:
+                await status_msg.edit("❌ Aucune piste audio valide")
                 return
 
-            user_dir = f"downloads/{user.id}_{int(time.time())}"
-            os.makedirs(user_dir, exist_ok=True)
-            reply_msg = msg.reply_to_message
+            keyboard = [
+                [KeyboardButton(opt['display'])] 
+                for opt in audio_options
+            ]
+            keyboard.append([KeyboardButton("❌ Annuler")])
             
+            reply_markup = ReplyKeyboardMarkup(
+                keyboard=keyboard,
+                resize_keyboard=True,
+                one_time_keyboard=True
+            )
+
             try:
-                try:
-                    status_msg = await msg.edit("⏳ Analyse du fichier...")
-                except MessageIdInvalid:
-                    status_msg = await msg.reply("⏳ Analyse du fichier...")
-                
-                original_filename = (reply_msg.video.file_name if reply_msg.video 
-                                else reply_msg.document.file_name) or "video.mp4"
-                input_path = await reply_msg.download(
-                    file_name=f"{user_dir}/{original_filename}",
-                    progress=progress_for_pyrogram,
-                    progress_args=("Téléchargement...", status_msg, time.time())
+                await status_msg.edit(
+                    "🎧 <b>Sélectionnez la piste audio principale</b>\n\n"
+                    f"📁 Fichier: {original_filename}\n"
+                    f"⏱ Durée: {duration//60}:{duration%60:02d}\n\n"
+                    "Pistes disponibles:",
+                    reply_markup=reply_markup,
+                    force=True
+                )
+            except MessageIdInvalid:
+                status_msg = SmartStatus(await msg.reply(
+                    "🎧 <b>Sélectionnez la piste audio principale</b>\n\n"
+                    f"📁 Fichier: {original_filename}\n"
+                    f"⏱ Durée: {duration//60}:{duration%60:02d}\n\n"
+                    "Pistes disponibles:",
+                    reply_markup=reply_markup
+                ))
+
+            try:
+                response = await wait_reply(
+                    user.id, filters.text,
+                    timeout=120
                 )
                 
-                videoclient = deps.videoclient
-                media_info = await videoclient.get_media_info(input_path)
-                
-                if not media_info or not hasattr(media_info, 'audio_tracks'):
-                    await status_msg.edit("❌ Format non supporté ou fichier corrompu")
-                    return
-                    
-                duration = int(media_info.duration) if media_info.duration else 0
-                
-                if not media_info.audio_tracks:
-                    await status_msg.edit("ℹ️ Aucune piste audio détectée")
+                if response.text.strip().lower() in ("❌ annuler", "/cancel"):
+                    await status_msg.edit("❌ Opération annulée", reply_markup=ReplyKeyboardRemove())
                     return
-
-                audio_options = []
-                for track in media_info.audio_tracks:
-                    if not isinstance(track, AudioTrack):
-                        continue
-                        
-                    display_text = (
-                        f"{track.language.upper() if track.language else 'INCONNU'} "
-                        f"[Piste {track.index}] • "
-                        f"{track.codec.name} • "
-                        f"{track.channels} canaux • "
-                        f"{'DÉFAUT • ' if track.is_default else ''}"
-                        f"{track.stream_type}"
-                    )
                     
-                    audio_options.append({
-                        'track': track,
-                        'display': display_text
-                    })
-
-                if not audio_options:
-                    await status_msg.edit("❌ Aucune piste audio valide")
+                selected_opt = None
+                for opt in audio_options:
+                    if opt['display'] == response.text.strip():
+                        selected_opt = opt
+                        break
+                
+                if not selected_opt:
+                    await status_msg.edit("❌ Sélection invalide", reply_markup=ReplyKeyboardRemove())
                     return
 
-                keyboard = [
-                    [KeyboardButton(opt['display'])] 
-                    for opt in audio_options
-                ]
-                keyboard.append([KeyboardButton("❌ Annuler")])
+                await response.delete()
+                await status_msg.delete()
+                selected_track = selected_opt['track']
                 
-                reply_markup = ReplyKeyboardMarkup(
-                    keyboard=keyboard,
-                    resize_keyboard=True,
-                    one_time_keyboard=True
-                )
-
                 try:
-                    await status_msg.edit(
-                        "🎧 <b>Sélectionnez la piste audio principale</b>\n\n"
-                        f"📁 Fichier: {original_filename}\n"
-                        f"⏱ Durée: {duration//60}:{duration%60:02d}\n\n"
-                        "Pistes disponibles:",
-                        reply_markup=reply_markup
+                    await status_msg.reply(
+                        f"⚙️ Traitement de la piste {selected_track.language or 'inconnu'}...",
+                        reply_markup=ReplyKeyboardRemove()
                     )
                 except MessageIdInvalid:
-                    status_msg = await msg.reply(
-                        "🎧 <b>Sélectionnez la piste audio principale</b>\n\n"
-                        f"📁 Fichier: {original_filename}\n"
-                        f"⏱ Durée: {duration//60}:{duration%60:02d}\n\n"
-                        "Pistes disponibles:",
-                        reply_markup=reply_markup
-                    )
-
-                try:
-                    response = await client.listen(
-                        filters=(filters.text & filters.user(user.id)),
-                        timeout=120
-                    )
-                    
-                    if response.text.strip().lower() in ("❌ annuler", "/cancel"):
-                        await status_msg.edit("❌ Opération annulée", reply_markup=ReplyKeyboardRemove())
-                        return
-                        
-                    selected_opt = None
-                    for opt in audio_options:
-                        if opt['display'] == response.text.strip():
-                            selected_opt = opt
-                            break
-                    
-                    if not selected_opt:
-                        await status_msg.edit("❌ Sélection invalide", reply_markup=ReplyKeyboardRemove())
-                        return
-
-                    await response.delete()
-                    await status_msg.delete()
-                    selected_track = selected_opt['track']
-                    
-                    try:
-                        await status_msg.reply(
-                            f"⚙️ Traitement de la piste {selected_track.language or 'inconnu'}...",
-                            reply_markup=ReplyKeyboardRemove()
-                        )
-                    except MessageIdInvalid:
-                        status_msg = await msg.reply(
-                            f"⚙️ Traitement de la piste {selected_track.language or 'inconnu'}...",
-                            reply_markup=ReplyKeyboardRemove()
-                        )
-                    
-                    output_name = f"audio_{selected_track.index}_{int(time.time())}"
-                    
-                    result = await videoclient.choose_audio(
-                        input_path=input_path,
-                        output_name=output_name,
-                        index=selected_track.index,
-                        language=selected_track.language,
-                        make_default=True
-                    )
+                    status_msg = SmartStatus(await msg.reply(
+                        f"⚙️ Traitement de la piste {selected_track.language or 'inconnu'}...",
+                        reply_markup=ReplyKeyboardRemove()
+                    ))
+                
+                output_name = f"audio_{selected_track.index}_{uuid.uuid4().hex[:12]}"
+                
+                result = await videoclient.choose_audio(
+                    input_path=input_path,
+                    output_name=output_name,
+                    index=selected_track.index,
+                    language=selected_track.language,
+                    make_default=True
+                )
+                
+                if not result:
+                    await status_msg.reply("❌ Échec du traitement audio")
+                    return
                     
-                    if not result:
-                        await status_msg.reply("❌ Échec du traitement audio")
-                        return
-                        
+                with open_upload(result) as fh:
                     await client.send_video(
                         chat_id=user.id,
-                        video=result,
+                        video=fh,
+                        file_name=os.path.basename(result),
                         caption=(
                             "🎵 <b>Piste audio sélectionnée</b>\n\n"
                             f"• Langue: {selected_track.language or 'Inconnue'}\n"
@@ -3220,86 +3153,111 @@ async def handle_callback(client: Client, callback_query: CallbackQuery):
                         progress=progress_for_pyrogram,
                         progress_args=("Envoi...", status_msg, time.time())
                     )
-                    
-                    await status_msg.reply("✅ Audio traité avec succès!")
-                    await asyncio.sleep(2)
-                    await status_msg.delete()
-                    
-                except asyncio.TimeoutError:
-                    await status_msg.reply("⌛ Temps écoulé", reply_markup=ReplyKeyboardRemove())
-                except Exception as e:
-                    await status_msg.reply(f"❌ Erreur: {str(e)}", reply_markup=ReplyKeyboardRemove())
-                    
-            except Exception as e:
-                await status_msg.reply(f"⚠️ Erreur critique: {str(e)}")
-                raise e
                 
-        finally:
-            try:
-                if 'input_path' in locals() and os.path.exists(input_path):
-                    os.remove(input_path)
-                if 'result' in locals() and os.path.exists(result):
-                    os.remove(result)
-                if os.path.exists(user_dir):
-                    shutil.rmtree(user_dir, ignore_errors=True)
+                await status_msg.reply("✅ Audio traité avec succès!")
+                await asyncio.sleep(2)
+                await status_msg.delete()
+                
+            except asyncio.TimeoutError:
+                await status_msg.reply("⌛ Temps écoulé", reply_markup=ReplyKeyboardRemove())
             except Exception as e:
-                print(f"Erreur de nettoyage: {str(e)}")
-    
-    elif data == "upgrade_premium":
-        message = (
-            "💎 <b>Choisissez votre abonnement</b>\n\n"
-            "🆓 <u>Gratuit</u>\n"
-            "• 1 point/jour (30/mois)\n"
-            "• 3 fichiers/jour\n"
-            "• Prix: Gratuit\n\n"
-            "🥉 <u>Basic</u> - 4.99$/mois\n"
-            f"• {SUB_CONFIG[SubType.BASIC]['pts']} points/jour ({SUB_CONFIG[SubType.BASIC]['pts']*30}/mois)\n"
-            f"• {SUB_CONFIG[SubType.BASIC]['files']} fichiers/jour\n\n"
-            "🥈 <u>Pro</u> - 14.99$/mois\n"
-            f"• {SUB_CONFIG[SubType.PRO]['pts']} points/jour ({SUB_CONFIG[SubType.PRO]['pts']*30}/mois)\n"
-            f"• {SUB_CONFIG[SubType.PRO]['files']} fichiers/jour\n\n"
-            "🥇 <u>Premium</u> - 29.99$/mois\n"
-            f"• {SUB_CONFIG[SubType.PREM]['pts']} points/jour ({SUB_CONFIG[SubType.PREM]['pts']*30}/mois)\n"
-            f"• {SUB_CONFIG[SubType.PREM]['files']} fichiers/jour"
-        )
+                await status_msg.reply(f"❌ Erreur: {str(e)}", reply_markup=ReplyKeyboardRemove())
+                
+        except Exception as e:
+            await status_msg.reply(f"⚠️ Erreur critique: {str(e)}")
+            raise e
+
+async def cb_upgrade_premium(client: Client, callback_query: CallbackQuery, data: str, user, msg):
+    message = (
+        "💎 <b>Choisissez votre abonnement</b>\n\n"
+        "🆓 <u>Gratuit</u>\n"
+        "• 1 point/jour (30/mois)\n"
+        "• 3 fichiers/jour\n"
+        "• Prix: Gratuit\n\n"
+        "🥉 <u>Basic</u> - 4.99$/mois\n"
+        f"• {SUB_CONFIG[SubType.BASIC]['pts']} points/jour ({SUB_CONFIG[SubType.BASIC]['pts']*30}/mois)\n"
+        f"• {SUB_CONFIG[SubType.BASIC]['files']} fichiers/jour\n\n"
+        "🥈 <u>Pro</u> - 14.99$/mois\n"
+        f"• {SUB_CONFIG[SubType.PRO]['pts']} points/jour ({SUB_CONFIG[SubType.PRO]['pts']*30}/mois)\n"
+        f"• {SUB_CONFIG[SubType.PRO]['files']} fichiers/jour\n\n"
+        "🥇 <u>Premium</u> - 29.99$/mois\n"
+        f"• {SUB_CONFIG[SubType.PREM]['pts']} points/jour ({SUB_CONFIG[SubType.PREM]['pts']*30}/mois)\n"
+        f"• {SUB_CONFIG[SubType.PREM]['files']} fichiers/jour"
+    )
+
+    keyboard = InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton(
+                "🥉 Souscrire Basic",
+                callback_data="confirm_upgrade_BASIC"
+            )
+        ],
+        [
+            InlineKeyboardButton(
+                "🥈 Souscrire Pro",
+                callback_data="confirm_upgrade_PRO"
+            )
+        ],
+        [
+            InlineKeyboardButton(
+                "🥇 Souscrire Premium",
+                callback_data="confirm_upgrade_PREM"
+            )
+        ],
+        [
+            InlineKeyboardButton(
+                "🔙 Retour",
+                callback_data="start_back"
+            )
+        ]
+    ])
 
-        keyboard = InlineKeyboardMarkup([
-            [
-                InlineKeyboardButton(
-                    "🥉 Souscrire Basic",
-                    callback_data="confirm_upgrade_BASIC"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    "🥈 Souscrire Pro",
-                    callback_data="confirm_upgrade_PRO"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    "🥇 Souscrire Premium",
-                    callback_data="confirm_upgrade_PREM"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    "🔙 Retour",
-                    callback_data="start_back"
-                )
-            ]
-        ])
+    if callback_query.message:
+        await callback_query.message.edit_text(
+            message,
+            reply_markup=keyboard,
+            parse_mode=ParseMode.HTML
+        )
+    else:
+        await callback_query.answer()
+        await callback_query.message.reply_text(
+            message,
+            reply_markup=keyboard,
+            parse_mode=ParseMode.HTML
+        )
 
-        if callback_query.message:
-            await callback_query.message.edit_text(
-                message,
-                reply_markup=keyboard,
-                parse_mode=ParseMode.HTML
-            )
-        else:
-            await callback_query.answer()
-            await callback_query.message.reply_text(
-                message,
-                reply_markup=keyboard,
-                parse_mode=ParseMode.HTML
-            )
\ No newline at end of file
+# Un handler par valeur de callback_data
+CALLBACK_HANDLERS = {
+    "main_menu": cb_menu,
+    "video_menu1": cb_menu,
+    "audio_menu1": cb_menu,
+    "subs_menu1": cb_menu,
+    "tools_menu1": cb_menu,
+    "info_menu": cb_menu,
+    "compress": cb_compress,
+    "close": cb_close,
+    "cut": cb_cut,
+    "audio_extract": cb_audio_extract,
+    "all_info": cb_all_info,
+    "convert_audio": cb_convert_audio,
+    "video_trim": cb_video_trim,
+    "video_merge": cb_video_merge,
+    "video_split": cb_video_split,
+    "generate_thumbnail": cb_generate_thumbnail,
+    "merge_video_audio": cb_merge_video_audio,
+    "remove_audio": cb_remove_audio,
+    "subtitle_extract": cb_subtitle_extract,
+    "subtitle_add": cb_subtitle_add,
+    "force_subtitle": cb_subtitle_add,
+    "remove_subtitles": cb_remove_subtitles,
+    "choose_subtitle": cb_choose_subtitle,
+    "choose_subtitle_burn": cb_choose_subtitle,
+    "add_chapters": cb_chapters,
+    "edit_chapter": cb_chapters,
+    "split_chapter": cb_chapters,
+    "remove_chapters": cb_chapters,
+    "get_chapters": cb_chapters,
+    "get_chapter": cb_chapters,
+    "audio_selection": cb_audio_selection,
+    "upgrade_premium": cb_upgrade_premium,
+}
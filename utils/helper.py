@@ -1,5 +1,11 @@
+import asyncio
+import errno
+import functools
 import math
+import os
 import time
+from typing import BinaryIO
+from pyrogram.errors import FloodWait
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
 PROGRESS_BAR_TEMPLATE = """<b>
@@ -11,12 +17,237 @@ PROGRESS_BAR_TEMPLATE = """<b>
 ╰━━━━━━━━━━━━━━━⪼
 </b>"""
 
+# Tampon de lecture pour l'envoi des fichiers (16x moins d'appels read()
+# que les blocs de 512 Kio de Pyrogram)
+UPLOAD_BUFFER_SIZE = 8 * 1024 * 1024
+
+# Fréquence maximale des mises à jour de progression : au plus une édition
+# toutes les PROGRESS_MIN_INTERVAL secondes ET tous les PROGRESS_MIN_STEP %
+PROGRESS_MIN_INTERVAL = 3.0
+PROGRESS_MIN_STEP = 5.0
+# (id du message, début du transfert) -> (instant, pourcentage) de la dernière édition
+PROGRESS_STATE: dict = {}
+# (id du message, début du transfert) -> édition de progression en cours d'envoi
+PROGRESS_EDITS: dict = {}
+
+# Taille des blocs renvoyés par Client.stream_media
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# Blocs par tranche distribuée aux téléchargements parallèles (16 Mio)
+DOWNLOAD_SLICE_CHUNKS = 16
+# Reprises d'une tranche interrompue (FloodWait, connexion coupée) avant d'abandonner
+DOWNLOAD_RETRIES = 3
+
+# Octets lus au début et à la fin d'un média quand seuls ses en-têtes comptent
+PROBE_EDGE_SIZE = 2 * 1024 * 1024
+
+def open_upload(path) -> BinaryIO:
+    """Ouvre un fichier à envoyer avec un grand tampon de lecture."""
+    return open(path, "rb", buffering=UPLOAD_BUFFER_SIZE)
+
+def preallocate(path: str, size: int) -> None:
+    """
+    Crée `path` et lui réserve `size` octets contigus (Linux uniquement).
+    Sur un système de fichiers sans fallocate, le fichier est simplement
+    créé ; un manque de place (ENOSPC) remonte avant tout téléchargement.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o644)
+    try:
+        if size > 0 and hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(fd, 0, size)
+            except OSError as e:
+                if e.errno not in (errno.EOPNOTSUPP, errno.EINVAL):
+                    raise
+    finally:
+        os.close(fd)
+
+async def write_chunks(client, message, fd: int, first: int, count: int):
+    """Écrit les blocs `first` à `first + count` du média à leur place dans `fd` (0 = jusqu'à la fin)."""
+    position = first * DOWNLOAD_CHUNK_SIZE
+    async for chunk in client.stream_media(message, offset=first, limit=count):
+        write = asyncio.ensure_future(asyncio.to_thread(os.pwrite, fd, chunk, position))
+        try:
+            await asyncio.shield(write)
+        except asyncio.CancelledError:
+            # pwrite ne s'interrompt pas : `fd` reste ouvert et le dossier intact jusqu'à sa fin
+            await write
+            raise
+        position += len(chunk)
+        yield len(chunk)
+
+async def download_media(client, message, file_name: str, progress=None, progress_args: tuple = (),
+                         workers: int = None) -> str:
+    """
+    Télécharge le média de `message` dans `file_name` préalloué à sa taille.
+
+    `Message.download` écrit dans un fichier `.temp` ouvert en "wb" puis le
+    déplace, ce qui annule toute préallocation : les blocs sont donc écrits
+    ici directement dans le fichier final, à leur position (`os.pwrite`,
+    exécuté dans un thread pour ne pas bloquer la boucle d'événements).
+    Le fichier est découpé en tranches de `DOWNLOAD_SLICE_CHUNKS` blocs que
+    `workers` téléchargements parallèles (par défaut
+    `client.max_concurrent_transmissions`) se partagent au fil de l'eau :
+    une connexion lente ne retarde que sa tranche, pas un quart du fichier.
+    Une tranche interrompue reprend au premier bloc manquant : `get_file`
+    de Pyrogram journalise ses erreurs puis s'arrête sans lever d'exception.
+    """
+    media = message.video or message.document or message.audio
+    total = getattr(media, "file_size", 0) or 0
+    await asyncio.to_thread(preallocate, file_name, total)
+
+    chunks = -(-total // DOWNLOAD_CHUNK_SIZE)
+    workers = workers or getattr(client, "max_concurrent_transmissions", 1)
+    # Itérateur partagé : chaque worker prend la prochaine tranche libre
+    slices = iter(range(0, chunks, DOWNLOAD_SLICE_CHUNKS))
+    current = 0
+
+    async def fetch(first: int, count: int):
+        nonlocal current
+        done = 0
+        for _ in range(DOWNLOAD_RETRIES + 1):
+            try:
+                async for size in write_chunks(client, message, fd, first + done, count - done if count else 0):
+                    done += 1
+                    current += size
+                    if progress:
+                        await progress(current, total, *progress_args)
+            except FloodWait as e:
+                await asyncio.sleep(e.value)
+                continue
+            if not count or done >= count:
+                return
+            await asyncio.sleep(1)
+        raise RuntimeError(f"Téléchargement incomplet : blocs {first + done} à {first + count - 1} manquants")
+
+    async def worker():
+        for first in slices:
+            await fetch(first, min(DOWNLOAD_SLICE_CHUNKS, chunks - first))
+
+    fd = os.open(file_name, os.O_WRONLY)
+    try:
+        if chunks:
+            await asyncio.gather(*(
+                worker() for _ in range(max(1, min(workers, -(-chunks // DOWNLOAD_SLICE_CHUNKS))))
+            ))
+        else:
+            # Taille inconnue : lecture séquentielle de tout le fichier
+            await fetch(0, 0)
+        if current != total:
+            os.ftruncate(fd, current)
+    finally:
+        os.close(fd)
+    return os.path.abspath(file_name)
+
+async def download_edges(client, message, file_name: str, edge: int = PROBE_EDGE_SIZE) -> str:
+    """
+    Ne télécharge que le début et la fin du média de `message`, dans un
+    fichier creux de sa taille réelle : cela suffit à ffprobe pour lire les
+    en-têtes, l'atome `moov` (en tête ou en fin de MP4) et les chapitres.
+    Les petits fichiers et ceux de taille inconnue sont téléchargés en entier.
+    """
+    media = message.video or message.document or message.audio
+    total = getattr(media, "file_size", 0) or 0
+    chunks = -(-total // DOWNLOAD_CHUNK_SIZE)
+    edge_chunks = max(1, edge // DOWNLOAD_CHUNK_SIZE)
+    if chunks <= 2 * edge_chunks:
+        return await download_media(client, message, file_name)
+
+    fd = os.open(file_name, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        # ftruncate sans fallocate : le milieu reste creux et n'occupe rien
+        os.ftruncate(fd, total)
+
+        async def fetch(first: int):
+            async for _ in write_chunks(client, message, fd, first, edge_chunks):
+                pass
+
+        await asyncio.gather(fetch(0), fetch(chunks - edge_chunks))
+    finally:
+        os.close(fd)
+    return os.path.abspath(file_name)
+
+class SmartStatus:
+    """
+    Enveloppe du message de statut d'une tâche : les éditions au texte
+    identique sont ignorées et celles rapprochées de moins de `min_interval`
+    secondes sont regroupées (seul le dernier texte est envoyé, en différé).
+    `force=True` envoie tout de suite (questions posées à l'utilisateur).
+    """
+
+    def __init__(self, message, min_interval: float = 1.0):
+        self.message = message
+        self.min_interval = min_interval
+        self._last = getattr(message, "text", None) or ""
+        self._t = time.monotonic()
+        self._pending = None
+        self._flush_task = None
+
+    def __getattr__(self, name):
+        return getattr(self.message, name)
+
+    async def edit(self, text: str, force: bool = False, **kwargs):
+        if kwargs or force:
+            return await self._send(text, **kwargs)
+        if text == (self._pending if self._pending is not None else self._last):
+            return self.message
+        if self._pending is None and time.monotonic() - self._t >= self.min_interval:
+            return await self._send(text)
+        self._pending = text
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush())
+        return self.message
+
+    edit_text = edit
+
+    async def delete(self, *args, **kwargs):
+        self._cancel_pending()
+        return await self.message.delete(*args, **kwargs)
+
+    async def _send(self, text: str, **kwargs):
+        self._cancel_pending()
+        self._last = text
+        self._t = time.monotonic()
+        return await self.message.edit(text, **kwargs)
+
+    async def _flush(self):
+        await asyncio.sleep(max(0.0, self._t + self.min_interval - time.monotonic()))
+        text, self._pending, self._flush_task = self._pending, None, None
+        if text is None:
+            return
+        self._last = text
+        self._t = time.monotonic()
+        try:
+            await self.message.edit(text)
+        except Exception:
+            pass
+
+    def _cancel_pending(self):
+        self._pending = None
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+
 async def progress_for_pyrogram(current: int, total: int, ud_type: str, message, start_time: float, progress_id: str = None):
     now = time.time()
     diff = now - start_time
-    if round(diff % 5.0) == 0 or current == total:
+    key = (id(message), start_time)
+    percentage = current * 100 / total if total else 0
+    pending = PROGRESS_EDITS.get(key)
+    if current != total:
+        last_ts, last_pct = PROGRESS_STATE.get(key, (start_time, 0.0))
+        if now - last_ts < PROGRESS_MIN_INTERVAL or percentage < last_pct + PROGRESS_MIN_STEP:
+            return
+        if pending is not None:
+            # Édition précédente toujours en cours : on saute celle-ci
+            return
+        if len(PROGRESS_STATE) > 256:
+            # transferts interrompus jamais arrivés à 100 %
+            PROGRESS_STATE.clear()
+        PROGRESS_STATE[key] = (now, percentage)
+    else:
+        PROGRESS_STATE.pop(key, None)
+    if diff > 0:
         try:
-            percentage = current * 100 / total
             speed = current / diff
             elapsed_time_ms = round(diff) * 1000
             time_to_completion_ms = round((total - current) / speed) * 1000
@@ -34,13 +265,27 @@ async def progress_for_pyrogram(current: int, total: int, ud_type: str, message,
                 eta=eta_str if eta_str else "0 s"
             )
 
-            await message.edit_text(
-                text=f"{ud_type}\n\n{progress_bar}\n\n{progress_text}",
-            )
-        except Exception as e:
-            # print(f"Erreur lors de la mise à jour de la progression : {e}")
+            text = f"{ud_type}\n\n{progress_bar}\n\n{progress_text}"
+            if current != total:
+                # Le transfert n'attend pas l'aller-retour réseau de l'édition
+                task = asyncio.create_task(edit_progress(message, text))
+                PROGRESS_EDITS[key] = task
+                task.add_done_callback(lambda _: PROGRESS_EDITS.pop(key, None))
+                return
+            # Dernière édition : après celle en vol, pour ne pas être écrasée par elle
+            if pending is not None:
+                await pending
+            await message.edit_text(text=text)
+        except Exception:
             pass
 
+async def edit_progress(message, text: str) -> None:
+    """Édition de progression lancée en tâche de fond ; un échec (FloodWait...) est ignoré."""
+    try:
+        await message.edit_text(text=text)
+    except Exception:
+        pass
+
 def human_readable_size(size: int) -> str:
     if size is None or size == 0:
         return "0 B"
@@ -111,8 +356,8 @@ def convert_to_seconds(time_str):
         return parts[0] * 60 + parts[1]
     return 0
 
+@functools.lru_cache(maxsize=1024)
 def seconds_to_timestamp(seconds):
-    hours = seconds // 3600
-    minutes = (seconds % 3600) // 60
-    seconds = seconds % 60
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
     return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
\ No newline at end of file
@@ -1,12 +1,16 @@
 import asyncio
 import asyncio.subprocess as aio_subproc
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+import copy
+import hashlib
+import io
 import re
 import subprocess
 import shlex
 import json
 import logging
 import logging.handlers
+import os
 import signal
 import sys
 import tempfile
@@ -52,6 +56,17 @@ class AudioCodec(Enum):
     MP3 = "mp3"
     OPUS = "opus"
     VORBIS = "vorbis"
+    PCM = "pcm_s16le"
+
+    @property
+    def extension(self) -> str:
+        # Container extension for a standalone audio file of this codec
+        mapping = {
+            AudioCodec.OPUS: "ogg",
+            AudioCodec.VORBIS: "ogg",
+            AudioCodec.PCM: "wav",
+        }
+        return mapping.get(self, self.value)
 
 
 class SubtitleCodec(Enum):
@@ -148,7 +163,47 @@ class MediaFileInfo:
 
 class VideoClient:
     __slots__ = ('name', 'output_path', 'thread_count', 'ffmpeg_path', 'ffprobe_path',
-                 'executor', 'logger', 'running', '_ffmpeg_version', '_ffprobe_version')
+                 'executor', 'logger', 'running', '_ffmpeg_version', '_ffprobe_version',
+                 '_probe_cache', 'hw_encoder')
+
+    # Max cached ffprobe/chapter results (LRU)
+    PROBE_CACHE_SIZE = 128
+
+    VAAPI_DEVICE = "/dev/dri/renderD128"
+
+    # Muxers able to write each audio codec to a non-seekable pipe
+    PIPE_MUXERS = {
+        AudioCodec.MP3: "mp3",
+        AudioCodec.AAC: "adts",
+        AudioCodec.OPUS: "ogg",
+        AudioCodec.VORBIS: "ogg",
+    }
+
+    # Hardware encoders, in order of preference. `decode` feeds CPU filters,
+    # `upload` hands the filtered frames back to the encoder's surfaces.
+    HW_ENCODERS = {
+        'cuda': {
+            'decode': ["-hwaccel", "cuda"],
+            'upload': "",
+            'h264': 'h264_nvenc',
+            'hevc': 'hevc_nvenc',
+            'options': ["-preset", "p4", "-rc", "vbr", "-cq", "{crf}"],
+        },
+        'vaapi': {
+            'decode': ["-vaapi_device", VAAPI_DEVICE],
+            'upload': "format=nv12,hwupload",
+            'h264': 'h264_vaapi',
+            'hevc': 'hevc_vaapi',
+            'options': ["-rc_mode", "CQP", "-qp", "{crf}"],
+        },
+        'qsv': {
+            'decode': ["-hwaccel", "qsv"],
+            'upload': "format=nv12",
+            'h264': 'h264_qsv',
+            'hevc': 'hevc_qsv',
+            'options': ["-preset", "fast", "-global_quality", "{crf}"],
+        },
+    }
 
     def __init__(self, name: str, out_pth: Union[str, Path], trd: int = 4,
                  ffmpeg: str = "ffmpeg", ffprobe: str = "ffprobe"):
@@ -160,11 +215,14 @@ class VideoClient:
         self.running = False
         self._ffmpeg_version = None
         self._ffprobe_version = None
+        self._probe_cache: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self.hw_encoder: Optional[str] = None
 
         self._setup_output_dir()
         self.logger = self._setup_logger()
         self._verify_ffmpeg()
         self._verify_ffprobe()
+        self._detect_hw_encoder()
         self.executor = ThreadPoolExecutor(max_workers=self.thread_count)
         self._register_signal_handlers()
 
@@ -210,6 +268,90 @@ class VideoClient:
         except Exception as e:
             raise RuntimeError(f"ffmpeg not available: {e}")
 
+    def _detect_hw_encoder(self):
+        """
+        Pick, once, the first hardware H.264 encoder this ffmpeg build and host support.
+
+        Stock builds list cuda/nvenc and qsv even without the hardware, so each
+        listed candidate must also pass a one-frame test encode.
+        """
+        try:
+            hwaccels = subprocess.run([self.ffmpeg_path, "-hide_banner", "-hwaccels"], stdout=subprocess.PIPE,
+                                      stderr=subprocess.DEVNULL, text=True, timeout=5).stdout.split()
+            encoders = subprocess.run([self.ffmpeg_path, "-hide_banner", "-encoders"], stdout=subprocess.PIPE,
+                                      stderr=subprocess.DEVNULL, text=True, timeout=5).stdout
+        except Exception:
+            hwaccels, encoders = [], ""
+        self.hw_encoder = next(
+            (name for name, profile in self.HW_ENCODERS.items()
+             if name in hwaccels and f" {profile['h264']} " in encoders
+             and (name != 'vaapi' or Path(self.VAAPI_DEVICE).exists())
+             and self._test_hw_encoder(profile)),
+            None
+        )
+        self.logger.info(f"Hardware encoder: {self.hw_encoder or 'none (libx264)'}")
+
+    def _test_hw_encoder(self, profile: Dict[str, Any]) -> bool:
+        """Encode a single blank frame with `profile` to check the device really works."""
+        command = [
+            self.ffmpeg_path, "-hide_banner", "-v", "error",
+            *profile['decode'],
+            "-f", "lavfi", "-i", "color=s=256x256",
+            "-frames:v", "1",
+            *(["-vf", profile['upload']] if profile['upload'] else []),
+            "-c:v", profile['h264'],
+            "-f", "null", "-"
+        ]
+        try:
+            return subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                  timeout=15).returncode == 0
+        except Exception:
+            return False
+
+    def _encoder_args(self, hwaccel: Optional[str], crf: int = 23,
+                      codec: str = 'h264', preset: str = 'fast') -> Tuple[List[str], str, List[str]]:
+        """
+        Input options, upload filter and video codec options for a re-encode.
+
+        Uses the detected hardware encoder when `hwaccel` is set, libx264
+        (or libx265 for `codec='hevc'`) at `preset` otherwise. Frames are
+        filtered on the CPU; append the upload filter (may be empty) after
+        your own filters.
+        """
+        profile = self.HW_ENCODERS.get(self.hw_encoder) if hwaccel else None
+        if not profile:
+            software = 'libx265' if codec == 'hevc' else 'libx264'
+            return [], "", ["-c:v", software, "-preset", preset, "-crf", str(crf)]
+        return (list(profile['decode']), profile['upload'],
+                ["-c:v", profile[codec], *(opt.format(crf=crf) for opt in profile['options'])])
+
+    def _encoder_attempts(self, hwaccel: Optional[str]) -> List[Optional[str]]:
+        """`hwaccel` values to try in turn: the hardware encoder first, then libx264."""
+        return [hwaccel, None] if hwaccel and self.hw_encoder else [None]
+
+    @staticmethod
+    def _audio_encoder_args(codec: AudioCodec, bitrate: int) -> List[str]:
+        """
+        Audio codec options for a re-encode.
+
+        MP3 uses LAME VBR (-q:a 2, ~190 kbps) which spends less time in the
+        quantization loop than CBR; Opus/Vorbis use libopus/libvorbis rather
+        than ffmpeg's experimental native encoders; WAV is plain PCM.
+        """
+        if codec == AudioCodec.MP3:
+            return ["-c:a", "libmp3lame", "-q:a", "2"]
+        if codec == AudioCodec.OPUS:
+            return ["-c:a", "libopus", "-b:a", f"{bitrate}k", "-vbr", "on",
+                    "-application", "audio"]
+        if codec == AudioCodec.VORBIS:
+            return ["-c:a", "libvorbis", "-b:a", f"{bitrate}k"]
+        if codec == AudioCodec.PCM:
+            return ["-c:a", "pcm_s16le"]
+        args = ["-c:a", codec.value, "-b:a", f"{bitrate}k"]
+        if codec == AudioCodec.AAC:
+            args.extend(["-aac_coder", "twoloop"])
+        return args
+
     def _register_signal_handlers(self):
         try:
             signal.signal(signal.SIGINT, self._handle_shutdown)
@@ -221,6 +363,18 @@ class VideoClient:
         self.logger.info(f"Shutdown signal {signum}")
         self.stop()
 
+    def with_output(self, out_pth: Union[str, Path]) -> 'VideoClient':
+        """
+        Return a lightweight view of this client writing into `out_pth`.
+
+        The copy shares the executor, logger and probe cache, so concurrent
+        jobs get their own output directory without mutating the shared
+        instance (and without re-running the ffmpeg checks).
+        """
+        view = copy.copy(self)
+        view.output_path = Path(out_pth)
+        return view
+
     def start(self):
         if self.running:
             return
@@ -295,12 +449,98 @@ class VideoClient:
             self.logger.error(f"Command exception: {e}", exc_info=True)
             return False
 
+    async def _run_ffmpeg_pipe(self, command: List[str], timeout: int = 600) -> Optional[bytes]:
+        """
+        Runs an ffmpeg command writing its output to stdout.
+        Returns the output bytes on success, None otherwise.
+        """
+        self.logger.debug("Running command: " + " ".join(shlex.quote(x) for x in command))
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *command,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except FileNotFoundError:
+            self.logger.error("Executable not found (check ffmpeg/ffprobe path)")
+            return None
+
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning(f"Command timed out ({timeout}s)")
+            try:
+                proc.kill()
+            except Exception:
+                pass
+            return None
+
+        if proc.returncode != 0:
+            err = stderr.decode(errors='ignore').strip()
+            self.logger.debug(f"Command failed (code {proc.returncode}): {err[:800]}")
+            return None
+        return stdout
+
+    @staticmethod
+    def _content_key(path: Path) -> Tuple[int, int, str]:
+        """Cheap identity of a file: size, mtime and a hash of its first 64 KiB."""
+        stat = path.stat()
+        with path.open('rb') as f:
+            head = hashlib.blake2b(f.read(65536), digest_size=16).hexdigest()
+        return stat.st_size, stat.st_mtime_ns, head
+
+    async def _cache_key(self, kind: str, path: Path) -> Tuple:
+        """Cache key for `path`, with the stat and head hash run on the executor."""
+        loop = asyncio.get_running_loop()
+        return (kind, *await loop.run_in_executor(self.executor, self._content_key, path))
+
+    @staticmethod
+    def _unlink_all(paths: List[Path]) -> None:
+        for path in paths:
+            try:
+                path.unlink(missing_ok=True)
+            except OSError:
+                pass
+
+    async def _discard(self, paths: List[Path]) -> None:
+        """Unlink scratch files on the executor: freeing GB-sized files can stall the loop."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self._unlink_all, paths)
+
+    def _cache_get(self, key: Tuple) -> Any:
+        if key not in self._probe_cache:
+            return None
+        self._probe_cache.move_to_end(key)
+        return copy.deepcopy(self._probe_cache[key])
+
+    def _cache_put(self, key: Tuple, value: Any) -> None:
+        self._probe_cache[key] = copy.deepcopy(value)
+        self._probe_cache.move_to_end(key)
+        while len(self._probe_cache) > self.PROBE_CACHE_SIZE:
+            self._probe_cache.popitem(last=False)
+
     async def get_media_info(self, file_path: Union[str, Path]) -> Optional[MediaFileInfo]:
+        """
+        Probe a media file with ffprobe. Results are cached by file content
+        (see `_content_key`), so probing the same file again is free.
+        """
         path = Path(file_path)
         if not path.exists():
             self.logger.error(f"File not found: {path}")
             return None
 
+        key = await self._cache_key("info", path)
+        media = self._cache_get(key)
+        if media is None:
+            media = await self._probe_media_info(path)
+            if media is not None:
+                self._cache_put(key, media)
+        if media is not None:
+            media.path = path
+        return media
+
+    async def _probe_media_info(self, path: Path) -> Optional[MediaFileInfo]:
         try:
             stat = path.stat()
             cmd = [
@@ -443,11 +683,13 @@ class VideoClient:
                 pass
 
     async def extract_subtitles(self, input_path: Union[str, Path],
-                                output_dir: Union[str, Path] = None) -> List[Path]:
+                                output_dir: Union[str, Path] = None,
+                                hwaccel: Optional[str] = "auto") -> List[Path]:
         """
         Extract subtitles from a file. Handles:
          - subtitles directly in the file
          - attachments (e.g., .mka) attached in the file that contain subtitles
+        `hwaccel` is passed to ffmpeg as an input option (None disables it).
         Returns list of extracted file paths.
         """
         input_path = Path(input_path)
@@ -485,6 +727,7 @@ class VideoClient:
             self.logger.info("No subtitle streams found in top-level stream list")
 
         # Prepare extraction tasks: use stream_index for mapping (-map 0:STREAM_INDEX)
+        input_opts = ["-hwaccel", hwaccel] if hwaccel else []
         tasks = []
         for sub in media.subtitle_tracks:
             try:
@@ -500,6 +743,7 @@ class VideoClient:
                     out_path = outdir / f"{base}_{sub.language}_{stream_idx}.{out_ext}"
                     cmd = [
                         self.ffmpeg_path,
+                        *input_opts,
                         "-i", str(input_path),
                         "-map", f"0:{stream_idx}",
                         "-c:s", "srt",  # transcode text-like subs to srt when possible
@@ -511,6 +755,7 @@ class VideoClient:
                     out_path = outdir / f"{base}_{sub.language}_{stream_idx}.{out_ext}"
                     cmd = [
                         self.ffmpeg_path,
+                        *input_opts,
                         "-i", str(input_path),
                         "-map", f"0:{stream_idx}",
                         "-c:s", "copy",
@@ -559,7 +804,7 @@ class VideoClient:
                     continue
 
                 # Now call extract_subtitles on tmp_mka (recursive, but tmp_mka should contain straightforward subs)
-                found = await self.extract_subtitles(tmp_mka, outdir)
+                found = await self.extract_subtitles(tmp_mka, outdir, hwaccel=hwaccel)
                 extracted.extend(found)
             finally:
                 try:
@@ -573,7 +818,8 @@ class VideoClient:
     async def convert_audio(self, input_path: Union[str, Path],
                         output_name: str,
                         codec: AudioCodec = AudioCodec.AAC,
-                        bitrate: int = 192) -> Optional[Path]:
+                        bitrate: int = 192,
+                        stream_index: Optional[int] = None) -> Optional[Path]:
         """
         Convert audio with optimized parameters and resource usage.
         
@@ -582,6 +828,8 @@ class VideoClient:
             output_name: Name for output file (without extension)
             codec: Target audio codec (default: AAC)
             bitrate: Target bitrate in kbps (default: 192)
+            stream_index: Global ffprobe index of the audio stream to convert
+                (default: ffmpeg's pick)
             
         Returns:
             Path to converted file or None if failed
@@ -590,33 +838,66 @@ class VideoClient:
         output_path = self.output_path / f"{output_name}.{codec.extension}"
         
         command = [
-            self.ffmpeg_path,
-            "-i", str(input_path),
-            "-vn",
-            "-c:a", codec.name.lower(),
-            "-b:a", f"{bitrate}k",
-        ]
-        
-        if codec == AudioCodec.AAC:
-            command.extend(["-aac_coder", "twoloop"]) 
-        elif codec == AudioCodec.OPUS:
-            command.extend(["-application", "audio"])  
-        
-        command.extend([
-            "-threads", str(min(2, self.thread_count)),  
+            *self._convert_audio_command(input_path, codec, bitrate, stream_index),
             "-y",
             str(output_path)
-        ])
+        ]
         
         self.logger.info(f"Converting {input_path.name} to {codec} at {bitrate}kbps")
         if await self._run_ffmpeg_command(command, timeout=300):
             return output_path
         return None
 
+    async def convert_audio_to_memory(self, input_path: Union[str, Path],
+                                      output_name: str,
+                                      codec: AudioCodec = AudioCodec.AAC,
+                                      bitrate: int = 192,
+                                      stream_index: Optional[int] = None) -> Optional[io.BytesIO]:
+        """
+        Same as `convert_audio`, but ffmpeg writes to stdout and nothing
+        touches the disk. Meant for small outputs; `codec` must be in
+        PIPE_MUXERS.
+
+        Returns:
+            In-memory file named `{output_name}.{ext}` or None if failed
+        """
+        input_path = Path(input_path)
+        muxer = self.PIPE_MUXERS.get(codec)
+        if muxer is None:
+            self.logger.error(f"{codec} cannot be written to a pipe")
+            return None
+
+        command = [
+            *self._convert_audio_command(input_path, codec, bitrate, stream_index),
+            "-f", muxer,
+            "pipe:1"
+        ]
+
+        self.logger.info(f"Converting {input_path.name} to {codec} at {bitrate}kbps (in memory)")
+        data = await self._run_ffmpeg_pipe(command, timeout=300)
+        if not data:
+            return None
+        output = io.BytesIO(data)
+        output.name = f"{output_name}.{codec.extension}"
+        return output
+
+    def _convert_audio_command(self, input_path: Path, codec: AudioCodec, bitrate: int,
+                               stream_index: Optional[int]) -> List[str]:
+        """ffmpeg arguments shared by the audio conversions, up to the output."""
+        return [
+            self.ffmpeg_path,
+            "-i", str(input_path),
+            *(["-map", f"0:{stream_index}"] if stream_index is not None else []),
+            "-vn",
+            *self._audio_encoder_args(codec, bitrate),
+            "-threads", str(min(2, self.thread_count)),
+        ]
+
     async def generate_thumbnail(self, input_path: Union[str, Path],
                             output_name: str,
                             time_offset: str = "00:00:05",
-                            width: int = 640) -> Optional[Path]:
+                            width: int = 640,
+                            hwaccel: Optional[str] = None) -> Optional[Path]:
         """
         Generate optimized thumbnail with smart scaling and faster capture.
         
@@ -625,17 +906,29 @@ class VideoClient:
             output_name: Name for output image (without extension)
             time_offset: Time position to capture (HH:MM:SS)
             width: Width of thumbnail (height auto-calculated)
+            hwaccel: ffmpeg -hwaccel method for the decoded seek (None for software)
             
         Returns:
             Path to generated thumbnail or None if failed
         """
         input_path = Path(input_path)
         output_path = self.output_path / f"{output_name}.jpg"
+
+        # Input seek only: the demuxer jumps to the preceding keyframe and
+        # ffmpeg (accurate_seek) drops the frames up to `offset` before the
+        # filter graph, so only the captured frame gets scaled. An output
+        # -ss would run every discarded frame through the scaler.
+        offset = max(0.0, self.hms_to_seconds(time_offset))
         
         command = [
             self.ffmpeg_path,
-            "-ss", time_offset,  
+            *(["-hwaccel", hwaccel] if hwaccel else []),
+            # Decoder frame threads each hold full-size frames (~12 MB at 4K);
+            # one captured frame does not need one per core.
+            "-threads", str(min(4, self.thread_count)),
+            "-ss", f"{offset:.3f}",
             "-i", str(input_path),
+            "-an", "-sn",
             "-frames:v", "1",
             "-vf", f"scale={width}:-2:flags=lanczos", 
             "-q:v", "3",  
@@ -655,9 +948,13 @@ class VideoClient:
                         language: str = "eng", 
                         index: int = 0,
                         is_default: bool = True,
-                        is_forced: bool = False) -> Optional[Path]:
+                        is_forced: bool = False,
+                        replace_existing: bool = False) -> Optional[Path]:
         """
         Optimized subtitle addition with smart format detection and parallel processing.
+
+        With `replace_existing`, the input's own subtitle tracks are left out
+        in the same pass (no separate `remove_subtitles` run beforehand).
         """
         sbt_path = Path(sbt_file)
         input_path = Path(input_path)
@@ -688,11 +985,17 @@ class VideoClient:
                 'vtt': 'mov_text' if input_ext == '.mp4' else 'webvtt'
             }.get(sbt_ext, 'mov_text' if input_ext == '.mp4' else 'srt')
 
+            if replace_existing:
+                source_maps = ["-map", "0:v", "-map", "0:a?",
+                               *(["-map", "0:t?"] if input_ext == '.mkv' else [])]
+            else:
+                source_maps = ["-map", "0"]
+
             command = [
                 self.ffmpeg_path,
                 "-i", str(input_path),
                 "-i", str(sbt_path),
-                "-map", "0",
+                *source_maps,
                 "-map", "1:0",
                 "-c:v", "copy",
                 "-c:a", "copy",
@@ -723,6 +1026,7 @@ class VideoClient:
                 self.ffmpeg_path,
                 "-i", str(input_path),
                 "-vf", f"subtitles={sub_path}:force_style='Fontsize=24,Outline=1'",
+                *(["-sn"] if replace_existing else []),
                 "-c:v", "libx264",
                 "-preset", "fast",
                 "-crf", "23",
@@ -847,20 +1151,11 @@ class VideoClient:
             self.ffmpeg_path,
             "-i", str(input_path),
             "-vn",  
-            "-c:a", codec.name.lower(),
-            "-b:a", f"{bitrate}k",
-        ]
-        
-        if codec == AudioCodec.AAC:
-            command.extend(["-aac_coder", "twoloop"]) 
-        elif codec == AudioCodec.OPUS:
-            command.extend(["-application", "audio"])
-        
-        command.extend([
+            *self._audio_encoder_args(codec, bitrate),
             "-threads", "2",
             "-y",
             str(output_path)
-        ])
+        ]
         
         self.logger.info(f"Extracting audio to {codec} at {bitrate}kbps")
         if await self._run_ffmpeg_command(command, timeout=300):
@@ -920,13 +1215,15 @@ class VideoClient:
         return None
     
     async def remove_audio(self, input_path: Union[str, Path],
-                        output_name: str) -> Optional[Path]:
+                        output_name: str,
+                        hwaccel: Optional[str] = "auto") -> Optional[Path]:
         """
         Optimized audio removal with stream copy and minimal processing.
         
         Args:
             input_path: Path to input video file
             output_name: Name for output file (without extension)
+            hwaccel: ffmpeg -hwaccel method (None to decode in software)
             
         Returns:
             Path to output file without audio, or None if failed
@@ -941,6 +1238,7 @@ class VideoClient:
         
         command = [
             self.ffmpeg_path,
+            *(["-hwaccel", hwaccel] if hwaccel else []),
             "-i", str(input_path),
             "-map", "0:v", 
             "-map", "-0:a",
@@ -987,12 +1285,7 @@ class VideoClient:
             self.logger.info(f"No subtitles in {input_path.name}")
             return None
             
-        selected_sub = next(
-            (s for s in media_info.subtitle_tracks 
-            if (index is not None and s.index == index) or 
-                (language is not None and s.language.lower() == language.lower())),
-            None
-        )
+        selected_sub = self._select_track(media_info.subtitle_tracks, language, index)
         
         if not selected_sub:
             self.logger.error(f"No matching subtitle (lang={language}, idx={index})")
@@ -1022,7 +1315,8 @@ class VideoClient:
     async def choose_subtitle_burn(self, input_path: Union[str, Path],
                                 output_name: str,
                                 language: Optional[str] = None,
-                                index: Optional[int] = None) -> Optional[Path]:
+                                index: Optional[int] = None,
+                                hwaccel: Optional[str] = "auto") -> Optional[Path]:
         """
         Optimized subtitle burning with smart encoding settings.
         
@@ -1031,6 +1325,7 @@ class VideoClient:
             output_name: Name for output file (without extension)
             language: Language code to select (ISO 639)
             index: Specific subtitle track index to select
+            hwaccel: Enables CUDA decode + NVENC encode when available (None for x264)
                     
         Returns:
             Path to output file with burned subtitles, or None if failed
@@ -1048,12 +1343,7 @@ class VideoClient:
             self.logger.info(f"No subtitles in {input_path.name}")
             return None
             
-        selected_sub = next(
-            (s for s in media_info.subtitle_tracks 
-            if (index is not None and s.index == index) or 
-                (language is not None and s.language.lower() == language.lower())),
-            None
-        )
+        selected_sub = self._select_track(media_info.subtitle_tracks, language, index)
         
         if not selected_sub:
             self.logger.error(f"No matching subtitle (lang={language}, idx={index})")
@@ -1064,23 +1354,29 @@ class VideoClient:
         
         safe_path = str(input_path).replace(':', '\\:') if sys.platform == 'win32' else f"'{str(input_path)}'"
         
-        command = [
-            self.ffmpeg_path,
-            "-i", str(input_path),
-            "-vf", f"subtitles={safe_path}:si={selected_sub.index-1}",
-            "-c:v", "libx264",
-            "-preset", "fast",
-            "-crf", "23",
-            "-c:a", "copy",
-            "-movflags", "+faststart",
-            "-threads", str(min(4, self.thread_count)), 
-            "-y",
-            str(output_path)
-        ]
-        
         self.logger.info(f"Burning subtitle {selected_sub.index} into {input_path.name}")
-        if await self._run_ffmpeg_command(command, timeout=900):
-            return output_path
+        for accel in self._encoder_attempts(hwaccel):
+            # The subtitles filter needs frames in system memory, so only the
+            # decode and encode run on the GPU.
+            input_opts, upload, video_opts = self._encoder_args(accel)
+            video_filter = ",".join(f for f in (f"subtitles={safe_path}:si={selected_sub.index-1}", upload) if f)
+
+            command = [
+                self.ffmpeg_path,
+                *input_opts,
+                "-i", str(input_path),
+                "-vf", video_filter,
+                *video_opts,
+                "-c:a", "copy",
+                "-movflags", "+faststart",
+                "-threads", str(min(4, self.thread_count)), 
+                "-y",
+                str(output_path)
+            ]
+            if await self._run_ffmpeg_command(command, timeout=900):
+                return output_path
+            if accel:
+                self.logger.warning(f"{self.hw_encoder} encode failed for {output_path.name}, falling back to CPU")
         return None
 
     async def choose_audio(self, input_path: Union[str, Path],
@@ -1114,12 +1410,7 @@ class VideoClient:
             self.logger.info(f"No audio tracks in {input_path.name}")
             return None
             
-        selected_audio = next(
-            (a for a in media_info.audio_tracks 
-            if (index is not None and a.index == index) or 
-                (language is not None and a.language.lower() == language.lower())),
-            None
-        )
+        selected_audio = self._select_track(media_info.audio_tracks, language, index)
         
         if not selected_audio:
             self.logger.error(f"No matching audio (lang={language}, idx={index})")
@@ -1149,6 +1440,7 @@ class VideoClient:
     async def get_chapters(self, input_path: Union[str, Path]) -> Optional[List[Dict[str, Any]]]:
         """
         Optimized chapter extraction with efficient parsing.
+        Results are cached by file content like `get_media_info`.
         
         Args:
             input_path: Path to input media file
@@ -1162,6 +1454,15 @@ class VideoClient:
             self.logger.error(f"Input not found: {input_path}")
             return None
 
+        key = await self._cache_key("chapters", input_path)
+        chapters = self._cache_get(key)
+        if chapters is None:
+            chapters = await self._read_chapters(input_path)
+            if chapters is not None:
+                self._cache_put(key, chapters)
+        return chapters
+
+    async def _read_chapters(self, input_path: Path) -> Optional[List[Dict[str, Any]]]:
         command = [
             self.ffmpeg_path,
             "-i", str(input_path),
@@ -1257,6 +1558,17 @@ class VideoClient:
         chapters = await self.get_chapters(input_path)
         return chapters[chapter_index - 1] if chapters and chapter_index <= len(chapters) else None
 
+    @staticmethod
+    def _select_track(tracks: List[Any], language: Optional[str] = None,
+                      index: Optional[int] = None) -> Optional[Any]:
+        """First track matching `index` or `language`; the language is lowercased once."""
+        lang = language.lower() if language is not None else None
+        for track in tracks:
+            if (index is not None and track.index == index) or \
+                    (lang is not None and (track.language or "").lower() == lang):
+                return track
+        return None
+
     @staticmethod
     def hms_to_seconds(hms: str) -> float:
         """Optimized conversion from HH:MM:SS to seconds."""
@@ -1432,15 +1744,23 @@ class VideoClient:
     async def trim_video(self, input_path: Union[str, Path],
                     output_name: str,
                     start_time: float,
-                    end_time: float) -> Optional[Path]:
+                    end_time: float,
+                    hwaccel: Optional[str] = "auto",
+                    reencode: bool = False) -> Optional[Path]:
         """
         Optimized video trimming with keyframe accuracy.
+
+        By default the window is stream-copied from the keyframe at or before
+        `start_time` (no decode), and re-encoded only if the copy fails;
+        `reencode` gives a frame-accurate cut straight away.
         
         Args:
             input_path: Path to input video
             output_name: Base name for output file
             start_time: Start time in seconds
             end_time: End time in seconds
+            hwaccel: Re-encode with the detected hardware encoder (None for libx264)
+            reencode: Frame-accurate cut through a full re-encode
             
         Returns:
             Path to trimmed file or None if failed
@@ -1452,32 +1772,61 @@ class VideoClient:
 
         output_path = self.output_path / f"{output_name}{input_path.suffix}"
         
-        command = [
-            self.ffmpeg_path,
-            "-ss", str(max(0, start_time - 1)),  
-            "-i", str(input_path),
-            "-ss", str(max(0, 1 - (start_time - int(start_time)))), 
-            "-to", str(end_time - start_time),
-            "-c", "copy",
-            "-avoid_negative_ts", "make_zero",
-            "-threads", "2",  
-            "-y",
-            str(output_path)
-        ]
-
         self.logger.info(f"Trimming {input_path.name} ({start_time}s-{end_time}s)")
-        return output_path if await self._run_ffmpeg_command(command, timeout=600) else None
+        attempts = [(True, accel) for accel in self._encoder_attempts(hwaccel)]
+        if not reencode:
+            attempts.insert(0, (False, None))
+        for encode, accel in attempts:
+            if encode:
+                # Interactive job: favour encode speed, let ffmpeg size the thread pool
+                input_opts, upload, video_opts = self._encoder_args(accel, preset='veryfast')
+                codec_opts = [*(["-vf", upload] if upload else []), *video_opts, "-c:a", "aac", "-b:a", "192k"]
+            else:
+                input_opts, codec_opts = [], ["-c", "copy"]
+
+            # Input seeking: the demuxer jumps straight to the window, timestamps restart at 0
+            command = [
+                self.ffmpeg_path,
+                *input_opts,
+                "-ss", f"{max(0.0, start_time):.3f}",
+                "-i", str(input_path),
+                "-t", f"{end_time - start_time:.3f}",
+                "-map", "0:v", "-map", "0:a?",
+                *codec_opts,
+                "-avoid_negative_ts", "make_zero",
+                *(["-movflags", "+faststart"] if output_path.suffix.lower() in ('.mp4', '.mov', '.m4v') else []),
+                "-threads", "0" if encode else "2",
+                "-y",
+                str(output_path)
+            ]
+            if await self._run_ffmpeg_command(command, timeout=600):
+                return output_path
+            if not encode:
+                self.logger.info("Stream-copy trim failed, re-encoding")
+            if accel:
+                self.logger.warning(f"{self.hw_encoder} encode failed for {output_path.name}, falling back to CPU")
+        return None
 
     async def cut_video(self, input_path: Union[str, Path],
                     output_name: str,
-                    cut_ranges: List[Tuple[float, float]]) -> Optional[Path]:
+                    cut_ranges: List[Tuple[float, float]],
+                    hwaccel: Optional[str] = "auto",
+                    reencode: Optional[bool] = None) -> Optional[Path]:
         """
         Optimized video cutting with efficient filter graph.
+
+        When every kept span starts on a video keyframe, the spans are
+        stream-copied and joined with the concat demuxer; otherwise (or when
+        the copy fails) the filter graph re-encode gives frame-exact cuts.
+        `reencode` forces one path or the other.
         
         Args:
             input_path: Path to input video
             output_name: Base name for output file
             cut_ranges: List of (start,end) ranges to cut
+            hwaccel: Re-encode with the detected hardware encoder (None for libx264)
+            reencode: True to always re-encode, False to always stream-copy,
+                None to decide from the keyframe positions
             
         Returns:
             Path to cut file or None if failed
@@ -1502,6 +1851,17 @@ class VideoClient:
         media_info = await self.get_media_info(input_path)
         duration = media_info.duration if media_info else float('inf')
 
+        if reencode is None:
+            # Kept spans resume where a cut range ends (the first one starts at 0)
+            starts = [end for _, end in merged if 0 < end < duration]
+            reencode = bool(starts) and not await self._keyframe_aligned(input_path, starts)
+
+        if not reencode:
+            copied = await self._copy_cut(input_path, output_name, merged, duration)
+            if copied:
+                return copied
+            self.logger.info("Stream-copy cut failed, re-encoding")
+
         filter_parts = []
         concat_inputs = []
         last_end = 0.0
@@ -1528,27 +1888,107 @@ class VideoClient:
         )
 
         output_path = self.output_path / f"{output_name}{input_path.suffix}"
+        self.logger.info(f"Cutting {len(merged)} ranges from {input_path.name}")
+        for accel in self._encoder_attempts(hwaccel):
+            input_opts, upload, video_opts = self._encoder_args(accel)
+            graph = filter_complex
+            if upload:
+                graph = graph.replace("[vout][aout]", "[vcat][aout]") + f";[vcat]{upload}[vout]"
+
+            command = [
+                self.ffmpeg_path,
+                *input_opts,
+                "-i", str(input_path),
+                "-filter_complex", graph,
+                "-map", "[vout]",
+                "-map", "[aout]",
+                *video_opts,
+                "-c:a", "aac",
+                "-b:a", "192k",
+                "-movflags", "+faststart",
+                "-threads", str(min(4, self.thread_count)),
+                "-y",
+                str(output_path)
+            ]
+            if await self._run_ffmpeg_command(command, timeout=1800):
+                return output_path
+            if accel:
+                self.logger.warning(f"{self.hw_encoder} encode failed for {output_path.name}, falling back to CPU")
+        return None
+
+    
+    async def _keyframe_aligned(self, input_path: Path, times: List[float],
+                                tolerance: float = 0.05) -> bool:
+        """
+        True when each of `times` falls on a video keyframe.
+
+        Only packet flags around each time are read (-read_intervals), nothing
+        is decoded, so the probe costs one GOP per time whatever the duration.
+        """
+        intervals = ",".join(f"{max(0.0, t - tolerance):.3f}%{t + tolerance:.3f}" for t in times)
         command = [
-            self.ffmpeg_path,
-            "-i", str(input_path),
-            "-filter_complex", filter_complex,
-            "-map", "[vout]",
-            "-map", "[aout]",
-            "-c:v", "libx264",
-            "-preset", "fast",
-            "-crf", "23",
-            "-c:a", "aac",
-            "-b:a", "192k",
-            "-movflags", "+faststart",
-            "-threads", str(min(4, self.thread_count)),
-            "-y",
-            str(output_path)
+            self.ffprobe_path,
+            "-v", "error",
+            "-select_streams", "v:0",
+            "-read_intervals", intervals,
+            "-show_entries", "packet=pts_time,flags",
+            "-of", "csv=p=0",
+            str(input_path)
         ]
+        output = await self._run_ffmpeg_pipe(command, timeout=60)
+        if output is None:
+            return False
 
-        self.logger.info(f"Cutting {len(merged)} ranges from {input_path.name}")
-        return output_path if await self._run_ffmpeg_command(command, timeout=1800) else None
+        keyframes = []
+        for line in output.decode(errors='ignore').splitlines():
+            pts, _, flags = line.partition(",")
+            if "K" in flags:
+                try:
+                    keyframes.append(float(pts))
+                except ValueError:
+                    pass
+        return all(any(abs(k - t) <= tolerance for k in keyframes) for t in times)
+
+    async def _copy_cut(self, input_path: Path, output_name: str,
+                        merged: List[Tuple[float, float]], duration: float) -> Optional[Path]:
+        """Stream-copy the spans between the (merged) cut ranges in parallel, then concat them."""
+        keep = []
+        last_end = 0.0
+        for start, end in merged:
+            if last_end < start:
+                keep.append((last_end, start))
+            last_end = end
+        if last_end < duration:
+            keep.append((last_end, None))
+        if not keep:
+            return None
+
+        ext = input_path.suffix or '.mp4'
+        segments = [self.output_path / f"{output_name}_seg{i:03d}{ext}" for i in range(len(keep))]
+        commands = [
+            [
+                self.ffmpeg_path,
+                "-ss", f"{start:.3f}",
+                "-i", str(input_path),
+                *(["-t", f"{end - start:.3f}"] if end is not None else []),
+                "-map", "0:v", "-map", "0:a?",
+                "-c", "copy",
+                "-avoid_negative_ts", "make_zero",
+                "-y",
+                str(segment)
+            ]
+            for (start, end), segment in zip(keep, segments)
+        ]
+
+        self.logger.info(f"Stream-copy cut of {input_path.name} into {len(keep)} spans")
+        try:
+            done = await asyncio.gather(*(self._run_ffmpeg_command(c, timeout=600) for c in commands))
+            if not all(done):
+                return None
+            return await self._simple_concat(segments, self.output_path / f"{output_name}{ext}")
+        finally:
+            await self._discard(segments)
 
-    
     async def concat_video(self, input_paths: List[Union[str, Path]],
                         output_name: str,
                         output_format: MediaType = MediaType.MP4,
@@ -1612,8 +2052,11 @@ class VideoClient:
         
         if not success:
             self.logger.info("Stream copy failed, attempting re-encode")
-            command[7:7] = ["-c:v", "libx264", "-preset", "fast", "-crf", "23",
-                        "-c:a", "aac", "-b:a", "192k"]
+            # Replace the "-c copy" pair: ffmpeg keeps the last -c it sees
+            copy_at = command.index("-c")
+            command[copy_at:copy_at + 2] = ["-c:v", "libx264", "-preset", "veryfast", "-crf", "23",
+                                            "-c:a", "aac", "-b:a", "192k"]
+            command[command.index("-threads") + 1] = "0"
             success = await self._run_ffmpeg_command(command, timeout=1800)
 
         try:
@@ -1696,11 +2139,12 @@ class VideoClient:
                 "-map", final_video,
                 "-map", final_audio,
                 "-c:v", "libx264",
-                "-preset", "fast",
+                "-preset", "veryfast",
                 "-crf", "22",
                 "-c:a", "aac",
                 "-b:a", "192k",
                 "-movflags", "+faststart",
+                "-threads", "0",
                 "-y",
                 str(output_path)
             ]
@@ -1768,6 +2212,7 @@ class VideoClient:
     FORMAT_PROFILES = {
         'mp4': {
             'video_codec': 'libx264',
+            'hw_codec': 'h264',
             'audio_codec': 'aac',
             'extension': 'mp4',
             'preset': 'fast',  
@@ -1778,6 +2223,7 @@ class VideoClient:
         },
         'hevc': {
             'video_codec': 'libx265',
+            'hw_codec': 'hevc',
             'audio_codec': 'aac',
             'extension': 'mp4',
             'preset': 'fast',  
@@ -1801,7 +2247,8 @@ class VideoClient:
                         output_basename: str,
                         target_formats: List[str] = ['mp4', 'hevc'],
                         keep_original_quality: bool = False,
-                        two_pass: bool = False) -> Dict[str, List[Path]]:
+                        two_pass: bool = False,
+                        hwaccel: Optional[str] = "auto") -> Dict[str, List[Path]]:
         """
         Robust video compression with complete error handling.
         
@@ -1811,6 +2258,8 @@ class VideoClient:
             target_formats: Formats to generate
             keep_original_quality: Keep original resolution versions
             two_pass: Use two-pass encoding
+            hwaccel: ffmpeg -hwaccel method; with NVENC available, H.264/HEVC
+                are decoded, scaled and encoded on the GPU (None for CPU only)
             
         Returns:
             Dictionary of generated files by format
@@ -1843,7 +2292,7 @@ class VideoClient:
             # Process formats
             results = await self._process_all_formats(
                 input_path, output_basename,
-                target_formats, resolutions, two_pass
+                target_formats, resolutions, two_pass, hwaccel
             )
 
             return results
@@ -1885,7 +2334,7 @@ class VideoClient:
 
     async def _process_all_formats(self, input_path: Path, output_basename: str,
                                 target_formats: List[str], resolutions: List[Tuple[str, dict]],
-                                two_pass: bool) -> Dict[str, List[Path]]:
+                                two_pass: bool, hwaccel: Optional[str]) -> Dict[str, List[Path]]:
         """Process all formats in parallel."""
         results = defaultdict(list)
         tasks = []
@@ -1894,13 +2343,16 @@ class VideoClient:
             k: v for k, v in self.FORMAT_PROFILES.items()
             if k in target_formats
         }
+        # Software encodes run side by side: split the cores between them
+        jobs = max(1, len(format_profiles) * len(resolutions))
+        encoder_threads = max(1, (os.cpu_count() or 1) // jobs)
 
         for fmt, fmt_profile in format_profiles.items():
             for res_name, res_profile in resolutions:
                 task = self._process_compression(
                     input_path, output_basename,
                     fmt, fmt_profile, res_name, res_profile,
-                    two_pass, results
+                    two_pass, results, hwaccel, encoder_threads
                 )
                 tasks.append(task)
 
@@ -1910,9 +2362,12 @@ class VideoClient:
     async def _process_compression(self, input_path: Path, output_basename: str,
                                 fmt: str, fmt_profile: dict,
                                 res_name: str, res_profile: dict,
-                                two_pass: bool, results: defaultdict):
+                                two_pass: bool, results: defaultdict,
+                                hwaccel: Optional[str] = "auto",
+                                threads: Optional[int] = None):
         """
         Process a single compression task with optimized settings.
+        `threads` sizes the software encoder's thread pool (default: up to 4).
         """
         output_name = f"{output_basename}_{res_name}"
         output_path = self.output_path / f"{output_name}.{fmt_profile['extension']}"
@@ -1925,9 +2380,16 @@ class VideoClient:
         max_bitrate = res_profile['video_bitrate'][1]
         min_bitrate = res_profile['video_bitrate'][0]
 
+        if hwaccel and self.hw_encoder and 'hw_codec' in fmt_profile:
+            if await self._hw_compression(input_path, output_path, fmt_profile, res_profile):
+                results[fmt].append(output_path)
+                self._quick_quality_check(output_path, res_profile)
+                return
+            self.logger.warning(f"{self.hw_encoder} encode failed for {output_path.name}, falling back to CPU")
+
         command = [
             self.ffmpeg_path,
-            "-hwaccel", "auto",  
+            *(["-hwaccel", hwaccel] if hwaccel else []),
             "-i", str(input_path),
             "-vf", f"scale=-2:{res_profile['scale']}",
             "-c:v", fmt_profile['video_codec'],
@@ -1940,22 +2402,25 @@ class VideoClient:
             *fmt_profile.get('container_options', [])
         ]
 
+        threads = threads or min(4, self.thread_count)
         if fmt in ('mp4', 'hevc'):
             command.extend([
                 "-preset", "fast" if res_profile['scale'] <= 480 else fmt_profile['preset'],
                 "-crf", str(res_profile['crf']),
                 "-profile:v", fmt_profile['profile'],
                 "-tune", fmt_profile['tune'],
+                # x265 has no `threads` parameter, its worker pool is `pools`
                 "-x264-params" if fmt == 'mp4' else "-x265-params",
-                "log-level=error:threads={}".format(min(4, self.thread_count))
+                "log-level=error:{}={}".format('threads' if fmt == 'mp4' else 'pools', threads)
             ])
         elif fmt == 'webm':
             command.extend([
                 "-speed", "4" if res_profile['scale'] <= 480 else str(fmt_profile['speed']),
                 "-row-mt", "1",
+                "-tile-columns", "2",
                 "-quality", "good",
                 "-crf", str(res_profile['crf']),
-                "-threads", str(min(8, self.thread_count))
+                "-threads", str(threads)
             ])
 
         if two_pass and res_profile['scale'] >= 720:  
@@ -1989,6 +2454,38 @@ class VideoClient:
         if output_path.exists():
             self._quick_quality_check(output_path, res_profile)
 
+    async def _hw_compression(self, input_path: Path, output_path: Path,
+                              fmt_profile: dict, res_profile: dict) -> bool:
+        """
+        Single-pass hardware compression. With CUDA, decode, scale_cuda and
+        NVENC keep frames in video memory; VAAPI/QSV scale on the CPU and
+        upload the result to the encoder.
+        """
+        avg_bitrate = sum(res_profile['video_bitrate']) // 2
+        input_opts, upload, video_opts = self._encoder_args(
+            self.hw_encoder, res_profile['crf'], fmt_profile['hw_codec'])
+        if self.hw_encoder == 'cuda':
+            input_opts += ["-hwaccel_output_format", "cuda"]
+            video_filter = f"scale_cuda=-2:{res_profile['scale']}"
+        else:
+            video_filter = ",".join(f for f in (f"scale=-2:{res_profile['scale']}", upload) if f)
+        command = [
+            self.ffmpeg_path,
+            *input_opts,
+            "-i", str(input_path),
+            "-vf", video_filter,
+            *video_opts,
+            "-b:v", f"{avg_bitrate}k",
+            "-maxrate", f"{res_profile['video_bitrate'][1]}k",
+            "-bufsize", f"{avg_bitrate * 2}k",
+            "-profile:v", fmt_profile['profile'],
+            "-c:a", fmt_profile['audio_codec'],
+            "-b:a", res_profile['audio_bitrate'],
+            *fmt_profile.get('container_options', []),
+            "-y", str(output_path)
+        ]
+        return await self._run_ffmpeg_command(command, timeout=3600)
+
     def _quick_quality_check(self, output_path: Path, profile: dict):
         """Fast quality verification."""
         try:
@@ -2000,17 +2497,24 @@ class VideoClient:
     
     async def split_video(self, input_path: Union[str, Path],
                         output_name: str,
-                        cut_ranges: List[Tuple[float, float]]) -> Optional[List[Path]]:
+                        cut_ranges: List[Tuple[float, float]],
+                        reencode: bool = False) -> Optional[List[Tuple[Tuple[float, float], Optional[Path]]]]:
         """
         Optimized video splitting with accurate cuts and proper audio sync.
+        Segments are cut concurrently.
         
         Args:
             input_path: Path to input video file
             output_name: Base name for output files
             cut_ranges: List of (start, end) time ranges in seconds
+            reencode: Frame-accurate cuts through a full re-encode (default:
+                keyframe-aligned stream copy, re-encoding a segment only if
+                its copy fails)
             
         Returns:
-            List of output file paths or None if failed
+            One ((start, end), output path) pair per valid range, in
+            chronological order, with a None path where that segment
+            failed. None if no segment could be produced.
         """
         input_path = Path(input_path)
         if not input_path.exists():
@@ -2031,36 +2535,42 @@ class VideoClient:
             self.logger.error("No valid cut ranges after validation")
             return None
 
-        output_files = []
         output_ext = input_path.suffix or '.mp4'
+        # Stream copy is disk-bound: a few segments at once saturate the disk
+        slots = asyncio.Semaphore(4)
 
-        for i, (start, end) in enumerate(validated_ranges, 1):
+        async def split_segment(i: int, start: float, end: float) -> Optional[Path]:
             output_path = self.output_path / f"{output_name}_part{i:03d}{output_ext}"
-            
-            command = [
+            head = [
                 self.ffmpeg_path,
                 "-ss", str(start),
                 "-i", str(input_path),
                 "-to", str(end - start),
-                "-c:v", "libx264",
-                "-preset", "fast",
-                "-crf", "23",
-                "-c:a", "aac",
-                "-b:a", "192k",
+            ]
+            tail = [
                 "-movflags", "+faststart",
                 "-avoid_negative_ts", "make_zero",
                 "-y",
                 str(output_path)
             ]
+            copy = ["-map", "0:v", "-map", "0:a?", "-c", "copy"]
+            encode = ["-c:v", "libx264", "-preset", "veryfast", "-crf", "23", "-c:a", "aac", "-b:a", "192k"]
 
-            self.logger.info(f"Processing segment {i}: {start}s to {end}s")
-            if not await self._run_ffmpeg_command(command, timeout=1800):
-                self.logger.error(f"Failed to process segment {i}")
-                continue
+            async with slots:
+                self.logger.info(f"Processing segment {i}: {start}s to {end}s")
+                done = not reencode and await self._run_ffmpeg_command(head + copy + tail, timeout=600)
+                if not done:
+                    done = await self._run_ffmpeg_command(head + encode + tail, timeout=1800)
 
-            if output_path.exists():
-                output_files.append(output_path)
-            else:
+            if not done:
+                self.logger.error(f"Failed to process segment {i}")
+                return None
+            if not output_path.exists():
                 self.logger.warning(f"Output file missing: {output_path}")
+                return None
+            return output_path
 
-        return output_files if output_files else None
+        results = await asyncio.gather(*(
+            split_segment(i, start, end) for i, (start, end) in enumerate(validated_ranges, 1)
+        ))
+        return list(zip(validated_ranges, results)) if any(results) else None